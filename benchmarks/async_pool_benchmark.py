@@ -0,0 +1,73 @@
+"""Throughput of AsyncPool vs its concurrency, over simulated I/O bound tasks (e.g. fetching and analyzing the logs of a
+failed job). A part of the tasks fail or hang, to show they don't affect the others.
+
+Usage: python benchmarks/async_pool_benchmark.py [--tasks 500] [--latency 0.05] [--failure-rate 0.05]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from tabulate import tabulate
+
+from bug_master.async_pool import AsyncPool
+
+CONCURRENCY_LEVELS = (1, 2, 5, 10, 20, 50, 100)
+
+
+async def simulated_task(item: int, latency: float, failure_rate: float, hang_rate: float) -> int:
+    await asyncio.sleep(random.uniform(latency / 2, latency * 1.5))
+    draw = random.random()
+    if draw < failure_rate:
+        raise RuntimeError(f"Task {item} failed")
+    if draw < failure_rate + hang_rate:
+        await asyncio.sleep(3600)
+    return item
+
+
+async def benchmark(concurrency: int, tasks: int, latency: float, failure_rate: float, hang_rate: float) -> list:
+    pool = AsyncPool(concurrency, timeout=latency * 4)
+    succeeded = failed = timed_out = 0
+    first_result = None
+    start = time.perf_counter()
+    async for result in pool.map(lambda i: simulated_task(i, latency, failure_rate, hang_rate), range(tasks)):
+        first_result = first_result or time.perf_counter() - start
+        if result.ok:
+            succeeded += 1
+        elif result.timed_out:
+            timed_out += 1
+        else:
+            failed += 1
+
+    duration = time.perf_counter() - start
+    return [
+        concurrency,
+        f"{duration:.2f}",
+        f"{tasks / duration:.1f}",
+        f"{first_result * 1000:.0f}",
+        succeeded,
+        failed,
+        timed_out,
+    ]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.05, help="Mean task latency in seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--hang-rate", type=float, default=0.01, help="Rate of tasks that hang until their timeout")
+    args = parser.parse_args()
+
+    random.seed(0)
+    rows = [
+        await benchmark(concurrency, args.tasks, args.latency, args.failure_rate, args.hang_rate)
+        for concurrency in CONCURRENCY_LEVELS
+    ]
+    headers = ["concurrency", "duration (s)", "tasks/s", "first result (ms)", "succeeded", "failed", "timed out"]
+    print(tabulate(rows, headers=headers))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,100 @@
+"""Latency of Slack Web API calls with a session per call (the slack_sdk default) vs the pooled keep-alive session the
+bot opens on startup, against a local fake Slack API served over TLS (a self-signed certificate is created with
+openssl). Calls are sequential, as the calls of a single event are.
+
+Usage: python benchmarks/slack_session_benchmark.py [--calls 300] [--warm-up 10] [--connections-limit 20]
+"""
+
+import argparse
+import asyncio
+import os
+import ssl
+import statistics
+import subprocess
+import tempfile
+import time
+
+import aiohttp
+from aiohttp import web
+from slack_sdk.web.async_client import AsyncWebClient
+from tabulate import tabulate
+
+
+def create_certificate(directory: str) -> tuple:
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=127.0.0.1"]
+        + ["-addext", "subjectAltName=IP:127.0.0.1", "-keyout", key, "-out", cert],
+        check=True,
+        capture_output=True,
+    )
+    return cert, key
+
+
+async def conversations_info(request: web.Request) -> web.Response:
+    return web.json_response({"ok": True, "channel": {"id": "C0123456789", "name": "fake-channel"}})
+
+
+async def start_fake_slack(cert: str, key: str) -> tuple:
+    app = web.Application()
+    app.router.add_get("/api/conversations.info", conversations_info)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+
+    server_ssl = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    server_ssl.load_cert_chain(cert, key)
+    site = web.TCPSite(runner, "127.0.0.1", 0, ssl_context=server_ssl)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"https://127.0.0.1:{port}/api/"
+
+
+async def benchmark(name: str, client: AsyncWebClient, calls: int, warm_up: int) -> list:
+    latencies = []
+    for i in range(warm_up + calls):
+        start = time.perf_counter()
+        await client.conversations_info(channel="C0123456789")
+        if i >= warm_up:
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    latencies.sort()
+    return [
+        name,
+        f"{statistics.mean(latencies):.2f}",
+        f"{latencies[len(latencies) // 2]:.2f}",
+        f"{latencies[int(len(latencies) * 0.95)]:.2f}",
+        f"{sum(latencies) / 1000:.2f}",
+    ]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--warm-up", type=int, default=10, help="Calls made before measuring")
+    parser.add_argument("--connections-limit", type=int, default=20, help="Pooled session connections limit")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        cert, key = create_certificate(directory)
+        runner, base_url = await start_fake_slack(cert, key)
+        client_ssl = ssl.create_default_context(cafile=cert)
+
+        try:
+            rows = [
+                await benchmark(
+                    "session per call", AsyncWebClient("xoxb-fake", base_url, ssl=client_ssl), args.calls, args.warm_up
+                )
+            ]
+
+            connector = aiohttp.TCPConnector(limit=args.connections_limit, keepalive_timeout=60, ssl=client_ssl)
+            async with aiohttp.ClientSession(connector=connector) as session:
+                client = AsyncWebClient("xoxb-fake", base_url, ssl=client_ssl, session=session)
+                rows.append(await benchmark("pooled session", client, args.calls, args.warm_up))
+        finally:
+            await runner.cleanup()
+
+    print(tabulate(rows, headers=["client", "mean (ms)", "p50 (ms)", "p95 (ms)", "total (s)"]))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,4 +1,5 @@
 import logging
+from contextlib import asynccontextmanager
 
 import uvicorn
 from fastapi import FastAPI
@@ -7,24 +8,92 @@ from uvicorn_loguru_integration import run_uvicorn_loguru
 from bug_master import consts
 from bug_master.bug_master_bot import BugMasterBot
 from bug_master.commands import CommandHandler
+from bug_master.consts import logger
 from bug_master.events import EventHandler
+from bug_master.leader_election import LeaderElection
+from bug_master.metrics import StatsCollector, register_stats_collector
 from bug_master.middleware import SlackRoute, exceptions_middleware
+from bug_master.refresh import refresh_scheduler
+from bug_master.socket_mode import SocketModeIngestion
+from bug_master.state import get_state_backend
+from bug_master.tracing import tracer
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    from bug_master.routes import (
+        accept_event,
+        handle_command_body,
+        handle_command_task,
+        handle_event_task,
+        handle_interactive_payload,
+        handle_options_payload,
+        handle_response_task,
+    )
+
+    socket_mode = None
+    if bot.bot_id is None:
+        await bot.update_bot_info()  # Worker process, the bot wasn't started by the main process
+    await bot.open_session()
+    await bot.shards.start()
+    bot.task_queue.register("event", handle_event_task, consts.EVENT_WORKERS, consts.EVENT_QUEUE_SIZE)
+    bot.task_queue.register("command", handle_command_task, consts.COMMAND_WORKERS, consts.COMMAND_QUEUE_SIZE)
+    bot.task_queue.register("response", handle_response_task, consts.RESPONSE_WORKERS, consts.RESPONSE_QUEUE_SIZE)
+    bot.task_queue.start()
+    if consts.INGESTION_MODE == "socket_mode":
+        socket_mode = SocketModeIngestion(
+            consts.APP_TOKEN,
+            consts.SOCKET_MODE_CONNECTIONS,
+            on_event=accept_event,
+            on_command=handle_command_body,
+            on_interactive=handle_interactive_payload,
+            on_options=handle_options_payload,
+            session=bot.session,
+        )
+        await socket_mode.start()
+
+    tracer.start()
+    leader_election.start()
+    yield
+    await leader_election.stop()
+    if socket_mode is not None:
+        await socket_mode.stop()
+    await bot.task_queue.stop()
+    await bot.shards.stop()
+    await bot.close_session()
+    await tracer.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 app.router.route_class = SlackRoute
 bot = BugMasterBot(consts.BOT_USER_TOKEN, consts.APP_TOKEN, consts.SIGNING_SECRET)
 events_handler = EventHandler(bot)
 commands_handler = CommandHandler(bot)
+leader_election = LeaderElection(get_state_backend(), consts.LEADER_LEASE_TTL)
+leader_election.add_job(lambda: bot.warm_up(leader_election.owner))
+leader_election.add_job(refresh_scheduler.run)
+register_stats_collector(StatsCollector(bot.task_queue.stats, bot.work_scheduler.stats, bot.slack_scheduler.stats))
 
 
-def start_web_server(host: str, port: int):
+def create_app() -> FastAPI:
     from bug_master.routes import init_routes
 
     app.middleware("http")(exceptions_middleware)
     init_routes()
-    bot.start()
+    return app
+
+
+def start_web_server(host: str, port: int):
+    if consts.WEBSERVER_WORKERS > 1:
+        # Each worker process imports and creates its own app, the state is shared through the state backend
+        logger.info(f"Starting {consts.WEBSERVER_WORKERS} web server workers")
+        app_kwargs = {"app": "bug_master.app:create_app", "factory": True, "workers": consts.WEBSERVER_WORKERS}
+    else:
+        app_kwargs = {"app": create_app()}
+        bot.start()
+
     uvicorn_config = uvicorn.Config(
-        app=app,
+        **app_kwargs,
         loop="asyncio",
         host=host,
         port=port,
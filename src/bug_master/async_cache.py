@@ -0,0 +1,189 @@
+import asyncio
+import functools
+import json
+import sys
+import time
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass, fields, is_dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Protocol, Tuple
+
+from bug_master.consts import logger
+
+
+class CacheStats(Protocol):
+    @property
+    def name(self) -> str:
+        pass
+
+    def stats(self) -> dict:
+        pass
+
+
+_caches: List[CacheStats] = []
+
+
+def register_cache(cache: CacheStats):
+    _caches.append(cache)
+
+
+def get_caches_stats() -> Dict[str, dict]:
+    """Get the hit/miss/eviction/size metrics of all the caches"""
+    return {cache.name: cache.stats() for cache in _caches}
+
+
+def estimate_size(value: Any, _seen: set = None) -> int:
+    """Estimate the memory held by a value in bytes, including the objects it references (once)"""
+    _seen = set() if _seen is None else _seen
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+
+    size = sys.getsizeof(value)
+    if isinstance(value, (str, bytes, int, float, bool, type(None))):
+        return size
+    if isinstance(value, array):
+        return size  # Includes the array buffer
+    if isinstance(value, dict):
+        return size + sum(estimate_size(k, _seen) + estimate_size(v, _seen) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return size + sum(estimate_size(item, _seen) for item in value)
+    if is_dataclass(value):
+        return size + sum(estimate_size(getattr(value, f.name), _seen) for f in fields(value))
+    if hasattr(value, "__dict__"):
+        return size + estimate_size(vars(value), _seen)
+    if slots := getattr(type(value), "__slots__", ()):
+        return size + sum(estimate_size(getattr(value, slot, None), _seen) for slot in slots)
+    return size
+
+
+def make_key(*args, **kwargs) -> Hashable:
+    """Build a cache key from function arguments. Objects with a cache_key attribute (e.g. the instance of a cached
+    method) are identified by it, dicts and lists by their JSON representation"""
+
+    def to_key(arg: Any) -> Hashable:
+        if hasattr(arg, "cache_key"):
+            return arg.cache_key
+        if isinstance(arg, (dict, list, set)):
+            return json.dumps(arg, sort_keys=True, default=str)
+        if isinstance(arg, type):
+            return arg.__qualname__
+        hash(arg)
+        return arg
+
+    return tuple(to_key(arg) for arg in args) + tuple((k, to_key(v)) for k, v in sorted(kwargs.items()))
+
+
+@dataclass
+class _Entry:
+    value: Any
+    expires_at: float
+    size: int
+
+
+class AsyncCache:
+    """Cache of async function results with LRU and TTL eviction, bounded by its memory budget (the estimated size of
+    the cached values) and by a number of entries. Concurrent misses of the same key share a single call, that runs as
+    its own task so cancelling one of the callers doesn't cancel it for the others"""
+
+    def __init__(self, name: str, ttl: float, max_bytes: int, max_entries: int = None) -> None:
+        self._name = name
+        self._ttl = ttl
+        self._max_bytes = max_bytes
+        self._max_entries = max_entries
+        self._entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+        self._loads: Dict[Hashable, asyncio.Task] = {}
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def _pop(self, key: Hashable) -> _Entry:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        return entry
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        if (entry := self._entries.get(key)) is None:
+            return False, None
+
+        if entry.expires_at <= time.monotonic():
+            self._pop(key)
+            self._expirations += 1
+            return False, None
+
+        self._entries.move_to_end(key)
+        return True, entry.value
+
+    def set(self, key: Hashable, value: Any):
+        if key in self._entries:
+            self._pop(key)
+
+        size = estimate_size(value)
+        if size > self._max_bytes:
+            logger.debug(f"Not caching {self._name} {key}, {size} bytes exceed the cache budget")
+            return
+
+        self._entries[key] = _Entry(value, time.monotonic() + self._ttl, size)
+        self._bytes += size
+        while self._bytes > self._max_bytes or (self._max_entries and len(self._entries) > self._max_entries):
+            self._pop(next(iter(self._entries)))
+            self._evictions += 1
+
+    async def get_or_load(self, key: Hashable, load: Callable[[], Awaitable]):
+        found, value = self.get(key)
+        if found:
+            self._hits += 1
+            return value
+
+        self._misses += 1
+        if (task := self._loads.get(key)) is None:
+            task = self._loads[key] = asyncio.get_event_loop().create_task(self._load(key, load))
+        return await asyncio.shield(task)
+
+    async def _load(self, key: Hashable, load: Callable[[], Awaitable]):
+        try:
+            value = await load()
+            self.set(key, value)
+            return value
+        finally:
+            del self._loads[key]
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self._max_bytes,
+            "hits": self._hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+            "expirations": self._expirations,
+        }
+
+
+def async_cache(ttl: float, max_bytes: int, max_entries: int = None, key: Callable[..., Hashable] = make_key):
+    """Cache the results of an async function (or method) in a memory bounded cache
+    :param key: Get the cache key from the function arguments, by default arguments are converted with make_key
+    """
+
+    def decorator(func: Callable[..., Awaitable]):
+        cache = AsyncCache(func.__qualname__, ttl, max_bytes, max_entries)
+        register_cache(cache)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await cache.get_or_load(key(*args, **kwargs), lambda: func(*args, **kwargs))
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
@@ -1,29 +1,77 @@
 import asyncio
-from typing import Callable, Union
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Dict, Generic, Iterable, List, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_EMPTY = object()
+
+
+@dataclass
+class TaskResult(Generic[T, R]):
+    item: T
+    result: R | None = None
+    error: Exception | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def timed_out(self) -> bool:
+        return isinstance(self.error, asyncio.TimeoutError)
+
+    @property
+    def error_message(self) -> str:
+        return f"{self.error.__class__.__name__}: {self.error}"
 
 
 class AsyncPool:
-    def __init__(self, pool_size: int) -> None:
+    """Run a coroutine function over many items with bounded concurrency. Items are consumed lazily, at most
+    pool_size tasks are in flight and results are streamed in completion order. A task that fails or times out doesn't
+    affect the others, its error is returned in its result. Closing the stream (or cancelling the consumer) cancels
+    the tasks in flight."""
+
+    def __init__(self, pool_size: int, timeout: float | None = None) -> None:
+        if pool_size < 1:
+            raise ValueError(f"Pool size must be positive, got {pool_size}")
+
         self._pool_size = pool_size
-        self._has_done = False
-        self._tasks = asyncio.Queue()
-        self._results = asyncio.Queue()
-        self._workers = [asyncio.create_task(self._worker()) for _ in range(self._pool_size)]
+        self._timeout = timeout
 
-    async def _worker(self):
-        while self._results.qsize() < self._pool_size:
-            worker_id, coroutine, kwargs = await self._tasks.get()
-            result = await coroutine(**kwargs)
-            await self._results.put({worker_id: result})
+    async def _run(self, func: Callable[[T], Awaitable[R]], item: T) -> TaskResult[T, R]:
+        try:
+            if self._timeout is None:
+                return TaskResult(item, await func(item))
+            return TaskResult(item, await asyncio.wait_for(func(item), self._timeout))
+        except Exception as e:
+            return TaskResult(item, error=e)
 
-    async def add_worker(self, worker_id: Union[str, int], coroutine: Callable, **kwargs):
-        await self._tasks.put((worker_id, coroutine, kwargs))
+    async def map(self, func: Callable[[T], Awaitable[R]], items: Iterable[T]) -> AsyncIterator[TaskResult[T, R]]:
+        """Stream the results of func(item) for all the items, in completion order.
+        Use `contextlib.aclosing` when the stream might not be consumed until the end, so the tasks in flight are
+        cancelled as soon as it is left."""
+        items = iter(items)
+        pending: Dict[asyncio.Task, T] = {}
+        loop = asyncio.get_event_loop()
+        try:
+            while True:
+                while len(pending) < self._pool_size and (item := next(items, _EMPTY)) is not _EMPTY:
+                    pending[loop.create_task(self._run(func, item))] = item
 
-    async def start(self):
-        results = []
-        await asyncio.gather(*self._workers)
+                if not pending:
+                    return
 
-        for _ in range(self._results.qsize()):
-            results.append(await self._results.get())
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    pending.pop(task)
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
 
-        return results
+    async def run(self, func: Callable[[T], Awaitable[R]], items: Iterable[T]) -> List[TaskResult[T, R]]:
+        """Run func over all the items, the results are returned in completion order"""
+        return [result async for result in self.map(func, items)]
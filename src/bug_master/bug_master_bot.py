@@ -1,7 +1,10 @@
 import asyncio
+import time
 from asyncio import AbstractEventLoop
-from typing import Dict, List, Tuple, Union
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Dict, List, Set, Tuple, Union
 
+import aiohttp
 import slack_sdk
 from schema import SchemaError
 from slack_sdk import signature
@@ -12,8 +15,21 @@ from slack_sdk.web.async_slack_response import AsyncSlackResponse
 from yaml.scanner import ScannerError
 
 from bug_master import consts
+from bug_master.async_pool import AsyncPool
 from bug_master.channel_config_handler import ChannelFileConfig
 from bug_master.consts import logger
+from bug_master.dedup import DedupIndex
+from bug_master.job_names_index import get_channel_jobs_indexes
+from bug_master.leader_election import LeaderElection
+from bug_master.message_history import MessageHistory
+from bug_master.metadata_cache import MetadataCache
+from bug_master.prow_jobs_index import get_prow_jobs_index
+from bug_master.sharding import ShardRouter
+from bug_master.slack_scheduler import SlackScheduler
+from bug_master.state import get_state_backend
+from bug_master.task_queue import TaskQueue
+from bug_master.utils import Utils
+from bug_master.work_scheduler import WorkScheduler
 
 
 class BugMasterBot:
@@ -24,15 +40,57 @@ class BugMasterBot:
         signing_secret: str,
         loop: AbstractEventLoop = None,
     ) -> None:
-        self._sm_client = SocketModeClient(app_token=app_token, web_client=AsyncWebClient(bot_token))
+        self._sm_client = SocketModeClient(
+            app_token=app_token, web_client=AsyncWebClient(bot_token, base_url=consts.SLACK_API_URL)
+        )
+        self._session: aiohttp.ClientSession | None = None
         self._verifier = signature.SignatureVerifier(signing_secret)
         self._loop = loop or asyncio.get_event_loop()
         self._bot_token = bot_token
         self._config: Dict[str, ChannelFileConfig] = {}
+        self._config_versions: Dict[str, float] = {}
+        self._state = get_state_backend()
+        self._config_loads: Dict[str, asyncio.Task] = {}
+        self._slack = SlackScheduler()
+        self._work_scheduler = WorkScheduler(
+            consts.WORK_CONCURRENCY,
+            consts.WORK_CHANNEL_QUOTA,
+            consts.WORK_BULK_CONCURRENCY,
+            consts.WORK_THROTTLED_BULK_CONCURRENCY,
+        )
+        self._metadata = MetadataCache("slack_metadata", consts.METADATA_CACHE_TTL, consts.METADATA_CACHE_SIZE)
+        self._dedup = DedupIndex(consts.DEDUP_TTL, consts.DEDUP_MAX_KEYS, consts.DEDUP_STORE_PATH)
+        self._history = MessageHistory(
+            self.get_messages,
+            consts.MESSAGE_STORE_PATH,
+            page_size=consts.MESSAGE_HISTORY_PAGE_SIZE,
+            max_staleness=consts.MESSAGE_HISTORY_MAX_STALENESS,
+            retention=consts.MESSAGE_HISTORY_RETENTION_DAYS * 24 * 60 * 60,
+            max_messages=consts.MESSAGE_HISTORY_MAX_MESSAGES,
+        )
+        self._task_queue = TaskQueue(
+            consts.TASK_STORE_PATH,
+            visibility_timeout=consts.TASK_VISIBILITY_TIMEOUT,
+            max_attempts=consts.TASK_MAX_ATTEMPTS,
+            retry_backoff=consts.TASK_RETRY_BACKOFF,
+            stats_interval=consts.TASK_QUEUE_STATS_INTERVAL,
+            failed_retention=consts.TASK_FAILED_RETENTION_DAYS * 24 * 60 * 60,
+        )
+        self._shards = ShardRouter(
+            consts.SHARD_SELF_URL,
+            consts.SHARD_REPLICAS,
+            signing_secret,
+            consts.SHARD_MODE,
+            consts.SHARD_CHECK_INTERVAL,
+            forward_timeout=consts.SHARD_FORWARD_TIMEOUT,
+        )
+        self._shards.add_rebalance_listener(self.rebalance)
+        self._rebalance_warm_up: asyncio.Task | None = None
         self._bot_id = None
         self._user_id = None
         self._name = None
         self._org_url = None
+        self._ready = False
 
     def __str__(self):
         return f"{self._name}:{self._bot_id} {self._user_id}"
@@ -57,12 +115,51 @@ class BugMasterBot:
     def org_url(self):
         return self._org_url
 
-    def has_channel_configurations(self, channel_id: str):
-        return channel_id in self._config
+    async def is_ready(self) -> bool:
+        if not self._ready and (term := await self._state.get("bot", "warmed_up")) is not None:
+            # Warmed up by the leader process, a flag left by the leader of a previous deployment doesn't count
+            self._ready = term == await self._state.get_lease_owner(LeaderElection.LEASE_NAME)
+        return self._ready
+
+    @property
+    def session(self) -> aiohttp.ClientSession | None:
+        """The shared HTTP session, open while the web server is running"""
+        return self._session
+
+    @property
+    def slack_scheduler(self) -> SlackScheduler:
+        return self._slack
+
+    @property
+    def work_scheduler(self) -> WorkScheduler:
+        return self._work_scheduler
+
+    @property
+    def dedup(self) -> DedupIndex:
+        return self._dedup
+
+    @property
+    def history(self) -> MessageHistory:
+        return self._history
+
+    @property
+    def task_queue(self) -> TaskQueue:
+        return self._task_queue
+
+    @property
+    def shards(self) -> ShardRouter:
+        return self._shards
+
+    async def has_channel_configurations(self, channel_id: str):
+        return await self.get_configuration(channel_id) is not None
 
     async def add_reaction(self, channel: str, emoji: str, ts: str) -> AsyncSlackResponse:
         try:
-            return await self._web_client.reactions_add(channel=channel, name=emoji, timestamp=ts)
+            res = await self._slack.call(
+                "reactions.add", self._web_client.reactions_add, channel=channel, name=emoji, timestamp=ts
+            )
+            self._history.add_reaction(channel, ts, emoji, self._user_id)
+            return res
         except slack_sdk.errors.SlackApiError as e:
             if e.response.data.get("error") == "invalid_name":
                 logger.warning(f"Invalid configuration on channel {channel}. {e}, reaction={emoji}")
@@ -84,16 +181,29 @@ class BugMasterBot:
         parse: str = "none",
         attachments=None,
     ) -> AsyncSlackResponse:
-        return await self._web_client.chat_postMessage(
+        res = await self._slack.call(
+            "chat.postMessage",
+            self._web_client.chat_postMessage,
+            ordering_key=(channel, ts),
             channel=channel,
             text=comment,
             thread_ts=ts,
             parse=parse,
             attachments=attachments,
         )
+        if ts:
+            self._history.add_reply(channel, ts, self._user_id)
+        return res
 
     async def update_comment(self, channel: str, comment: str, ts: str) -> AsyncSlackResponse:
-        return await self._web_client.chat_update(channel=channel, text=comment, ts=ts)
+        return await self._slack.call(
+            "chat.update",
+            self._web_client.chat_update,
+            ordering_key=(channel, ts),
+            channel=channel,
+            text=comment,
+            ts=ts,
+        )
 
     async def add_ephemeral_comment(
         self,
@@ -104,7 +214,10 @@ class BugMasterBot:
         parse: str = "none",
         attachments=None,
     ) -> AsyncSlackResponse:
-        return await self._web_client.chat_postEphemeral(
+        return await self._slack.call(
+            "chat.postEphemeral",
+            self._web_client.chat_postEphemeral,
+            ordering_key=(channel, ts),
             channel=channel,
             user=user,
             text=comment,
@@ -113,12 +226,45 @@ class BugMasterBot:
             attachments=attachments,
         )
 
-    def get_configuration(self, channel: str) -> Union[ChannelFileConfig, None]:
+    async def get_configuration(self, channel: str) -> Union[ChannelFileConfig, None]:
+        if self._state.is_shared:
+            await self._sync_configuration(channel)
+        return self._config.get(channel, None)
+
+    def get_cached_configuration(self, channel: str) -> Union[ChannelFileConfig, None]:
+        """Get the channel configuration known to this process, without picking up the changes of other workers"""
         return self._config.get(channel, None)
 
-    def reset_configuration(self, channel: str):
+    async def reset_configuration(self, channel: str):
         if channel in self._config:
             del self._config[channel]
+        if self._state.is_shared:
+            await self._state.delete("channel_config", channel)
+            self._config_versions.pop(channel, None)
+
+    async def _sync_configuration(self, channel: str):
+        """Pick up the channel configuration published by another worker process, if it changed"""
+        if (entry := await self._state.get("channel_config", channel)) is None:
+            if self._config_versions.pop(channel, None) is not None:
+                self._config.pop(channel, None)  # Reset by another worker
+            return
+
+        if entry["version"] == self._config_versions.get(channel):
+            return
+
+        try:
+            self._config[channel] = ChannelFileConfig.from_dict(entry["config"])
+            self._config_versions[channel] = entry["version"]
+        except (SchemaError, KeyError, ValueError, TypeError) as e:
+            logger.warning(f"Ignoring invalid shared configuration of channel {channel}, {e}")
+
+    async def _publish_configuration(self, channel: str, config: ChannelFileConfig):
+        if not self._state.is_shared:
+            return
+
+        version = time.time()
+        await self._state.set("channel_config", channel, {"version": version, "config": config.to_dict()})
+        self._config_versions[channel] = version
 
     def _get_file_configuration(
         self, channel: str, files: list = None, force_create: bool = False
@@ -127,6 +273,33 @@ class BugMasterBot:
             return ChannelFileConfig(files[0] if files else [])
         return self._config[channel]
 
+    def _start_configuration_load(self, channel: str, load: Awaitable) -> asyncio.Task:
+        """Register the given load as the single in-flight configuration load of the channel.
+        A load that is already in flight is superseded (cancelled), its waiters will wait for the new load instead"""
+        if (in_flight := self._config_loads.get(channel)) is not None:
+            logger.info(f"Superseding in-flight configuration load on channel {channel}")
+            in_flight.cancel()
+
+        task = asyncio.get_event_loop().create_task(load)
+        self._config_loads[channel] = task
+
+        def _on_done(t: asyncio.Task):
+            if self._config_loads.get(channel) is t:
+                del self._config_loads[channel]
+
+        task.add_done_callback(_on_done)
+        return task
+
+    async def _wait_for_configuration_load(self, channel: str, task: asyncio.Task):
+        while True:
+            try:
+                return await asyncio.shield(task)
+            except asyncio.CancelledError:
+                if not task.cancelled():
+                    raise  # The waiter itself was cancelled
+                if (task := self._config_loads.get(channel)) is None:
+                    return None
+
     async def refresh_file_configuration(
         self,
         channel: str,
@@ -134,6 +307,22 @@ class BugMasterBot:
         from_history=False,
         force_create=False,
         user_id: str = None,
+    ) -> bool:
+        """Refresh the channel configurations from the given files. Supersedes any configuration load in flight"""
+        task = self._start_configuration_load(
+            channel,
+            self._refresh_file_configuration(channel, files, from_history, force_create, user_id),
+        )
+        return await self._wait_for_configuration_load(channel, task)
+
+    async def _refresh_file_configuration(
+        self,
+        channel: str,
+        files: List[dict],
+        from_history=False,
+        force_create=False,
+        user_id: str = None,
+        notify: bool = True,
     ) -> bool:
         res = False
         sorted_files = [
@@ -149,11 +338,16 @@ class BugMasterBot:
 
         try:
             await bmc.load(self._bot_token)
+            await self._publish_configuration(channel, bmc)
             res = True
             logger.info(f"Configuration file loaded successfully with {len(self._config.get(channel, []))} entries")
         except (SchemaError, ScannerError) as e:
             # if not from_history:
             self._config[channel] = bmc
+            if not notify:
+                logger.warning(f"BugMasterBot configuration file on channel {channel} is invalid, {e}")
+                return False
+
             await self.add_comment(channel, "BugMasterBot configuration file is invalid")
             if user_id:
                 await self.add_comment(
@@ -175,7 +369,34 @@ class BugMasterBot:
             )
         return res
 
+    async def open_session(self):
+        """Open a long-lived pooled HTTP session (keep-alive) shared by all the Slack Web API calls.
+        Without it slack_sdk opens a new session, and a new TLS connection, for each call"""
+        if self._session is not None and not self._session.closed:
+            return
+
+        connector = aiohttp.TCPConnector(
+            limit=consts.SLACK_CONNECTIONS_LIMIT, keepalive_timeout=consts.SLACK_KEEPALIVE_TIMEOUT
+        )
+        self._session = aiohttp.ClientSession(connector=connector)
+        self._web_client.session = self._session
+        logger.info(f"Slack HTTP session opened with connections limit of {consts.SLACK_CONNECTIONS_LIMIT}")
+
+    async def close_session(self):
+        if self._session is None:
+            return
+
+        self._web_client.session = None
+        await self._session.close()
+        self._session = None
+        logger.info("Slack HTTP session closed")
+
     def start(self) -> "BugMasterBot":
+        if consts.INGESTION_MODE == "socket_mode":
+            # Socket Mode connections are owned by the Socket Mode ingestion, that runs on the web server event loop
+            self._update_bot_info()
+            return self
+
         logger.info("Starting bug_master bot - attempting connect to Slack’s APIs using WebSockets ...")
         try:
             self._loop.run_until_complete(self._sm_client.connect())
@@ -188,7 +409,10 @@ class BugMasterBot:
         return self
 
     def _update_bot_info(self):
-        info = self._loop.run_until_complete(self._web_client.auth_test()).data
+        self._loop.run_until_complete(self.update_bot_info())
+
+    async def update_bot_info(self):
+        info = (await self._web_client.auth_test()).data
         if info.get("ok", False):
             self._bot_id = info.get("bot_id")
             self._user_id = info.get("user_id")
@@ -198,22 +422,35 @@ class BugMasterBot:
         else:
             logger.warning("Can't auth bot web_client")
 
-    async def try_load_configurations_from_history(self, channel: str) -> bool:
-        res = await self._web_client.files_list(channel=channel, types=ChannelFileConfig.SUPPORTED_FILETYPE)
-        is_conf_valid = await self.refresh_file_configuration(channel, res.data.get("files", []), from_history=True)
+    async def try_load_configurations_from_history(self, channel: str, notify: bool = True) -> bool:
+        res = await self._slack.call(
+            "files.list", self._web_client.files_list, channel=channel, types=ChannelFileConfig.SUPPORTED_FILETYPE
+        )
+        is_conf_valid = await self._refresh_file_configuration(
+            channel, res.data.get("files", []), from_history=True, notify=notify
+        )
         if is_conf_valid:
             logger.info(f"Configurations loaded successfully from channel history for channel {channel}")
         return is_conf_valid
 
-    async def get_file_info(self, file_id: str) -> dict:
-        res = await self._web_client.files_info(file=file_id)
-        return res.data.get("file")
+    async def get_file_info(self, file_id: str, use_cache: bool = True) -> dict:
+        if use_cache and (file_info := self._metadata.get(("file", file_id))) is not None:
+            return file_info
+
+        res = await self._slack.call("files.info", self._web_client.files_info, file=file_id)
+        if (file_info := res.data.get("file")) is not None:
+            self._metadata.set(("file", file_id), file_info)
+        return file_info
+
+    def invalidate_file_info(self, file_id: str):
+        self._metadata.invalidate(("file", file_id))
 
     async def get_channel_info(self, channel_id: str) -> dict:
-        channel_info = None
+        if (channel_info := self._metadata.get(("channel", channel_id))) is not None:
+            return channel_info
 
         try:
-            res = await self._web_client.conversations_info(channel=channel_id)
+            res = await self._slack.call("conversations.info", self._web_client.conversations_info, channel=channel_id)
             channel_info = res.get("channel", None)
         except SlackApiError as e:
             logger.error(e)
@@ -221,44 +458,187 @@ class BugMasterBot:
         if not channel_info:
             return {}
 
+        self._metadata.set(("channel", channel_id), channel_info)
         return channel_info
 
+    def invalidate_channel_info(self, channel_id: str):
+        self._metadata.invalidate(("channel", channel_id))
+
     async def get_messages(
         self,
         channel_id: str,
         messages_count: int,
         cursor: str = None,
         oldest: float = 0,
+        latest: float = None,
     ) -> Tuple[List[dict], str]:
-        res = await self._web_client.conversations_history(
-            channel=channel_id, limit=messages_count, cursor=cursor, oldest=oldest
+        res = await self._slack.call(
+            "conversations.history",
+            self._web_client.conversations_history,
+            channel=channel_id,
+            limit=messages_count,
+            cursor=cursor,
+            oldest=oldest,
+            latest=latest,
         )
         return res.data.get("messages", []), res.data.get("response_metadata", {}).get("next_cursor")
 
-    async def get_all_messages(self, channel_id: str, since: float = 0):
-        messages = []
+    async def get_all_messages(self, channel_id: str, since: float = 0) -> List[dict]:
+        """Get the channel messages since the given time, newest first, from the local channel history"""
+        return [message async for page in self._history.get_messages(channel_id, since) for message in page]
+
+    async def get_channel_configuration(
+        self, channel_id: str, channel_name: str, notify: bool = True
+    ) -> ChannelFileConfig:
+        """Get the channel configuration, loading it from the channel history if needed. Loading is single-flight,
+        concurrent callers wait for the same load and the missing configuration notice is posted only once
+        :param notify: Post the missing configuration notice on the channel if the load fails
+        """
+        if (task := self._config_loads.get(channel_id)) is None:
+            if (config := await self.get_configuration(channel_id)) is not None:
+                return config
+
+            task = self._start_configuration_load(
+                channel_id, self._load_channel_configuration(channel_id, channel_name, notify=notify)
+            )
+
+        await self._wait_for_configuration_load(channel_id, task)
+        return await self.get_configuration(channel_id)
+
+    async def _load_channel_configuration(self, channel_id: str, channel_name: str, notify: bool = True) -> bool:
+        await self.try_load_configurations_from_history(channel_id, notify=notify)
+
+        if not await self.has_channel_configurations(channel_id):
+            # The notice is posted once even if several worker processes are loading the configuration
+            if notify and await self._state.add_if_absent(
+                "notices", f"missing_configuration:{channel_id}", True, ttl=60
+            ):
+                await self.add_comment(
+                    channel_id,
+                    f"BugMaster configuration file on channel `{channel_name}` is invalid or missing. "
+                    "Please add or fix the configuration file or remove the bot.",
+                )
+            return False
+
+        return True
+
+    async def users_conversations(self, user: str = None, types: str = None, cursor: str = None):
+        return await self._slack.call(
+            "users.conversations", self._web_client.users_conversations, user=user, types=types, cursor=cursor
+        )
+
+    async def get_im_channels(self, user: str) -> List[dict]:
+        """Get the direct message channels of the given user with the bot"""
+        if (channels := self._metadata.get(("im", user))) is not None:
+            return channels
+
+        res = await self.users_conversations(user=user, types="im")
+        channels = res.data.get("channels", [])
+        self._metadata.set(("im", user), channels)
+        return channels
+
+    def invalidate_im_channels(self, user: str):
+        self._metadata.invalidate(("im", user))
+
+    async def get_member_channels(self) -> List[str]:
+        """Get the ids of all the channels the bot is a member of"""
+        channels = []
         cursor = None
         while True:
-            messages_chunk, cursor = await self.get_messages(channel_id, messages_count=20, cursor=cursor, oldest=since)
-            messages += messages_chunk
-            if cursor is None:
+            res = await self.users_conversations(types="public_channel,private_channel", cursor=cursor)
+            channels += [c.get("id") for c in res.data.get("channels", []) if c.get("id")]
+            cursor = res.data.get("response_metadata", {}).get("next_cursor")
+            if not cursor:
                 break
 
-        return messages
+        return channels
 
-    async def get_channel_configuration(self, channel_id: str, channel_name: str) -> ChannelFileConfig:
-        if not self.has_channel_configurations(channel_id):
-            await self.try_load_configurations_from_history(channel_id)
+    async def warm_up(self, term: str = None):
+        """Load the configurations, jobs and jobs history of all the channels the bot is a member of, so the first
+        event after startup doesn't pay for the cold start. The bot is marked as ready once done.
+        :param term: The leadership term of the process running the warm up, the other processes are ready only
+        once the warm up of the current leader is done
+        """
+        if not consts.ENABLE_WARM_UP:
+            await self._mark_ready(term)
+            return
 
-        if not self.has_channel_configurations(channel_id):
-            await self.add_comment(
-                channel_id,
-                f"BugMaster configuration file on channel `{channel_name}` is invalid or missing. "
-                "Please add or fix the configuration file or remove the bot.",
+        logger.info("Warming up - loading channels configurations, jobs and jobs history ...")
+        try:
+            channels = [c for c in await self.get_member_channels() if self._shards.is_owner(c)]
+            await self._warm_up_channels(channels)
+        except Exception as e:
+            logger.error(f"Warm up failed, {e.__class__.__name__}: {e}")
+        finally:
+            await self._mark_ready(term)
+
+    async def _warm_up_channels(self, channels: List[str]):
+        pool = AsyncPool(consts.WARM_UP_CONCURRENCY, timeout=consts.FAN_OUT_TASK_TIMEOUT)
+        logger.info(f"Warming up {len(channels)} channels with concurrency of {consts.WARM_UP_CONCURRENCY}")
+        jobs = set()
+        async for result in pool.map(self._warm_up_channel, channels):
+            if not result.ok:
+                logger.warning(f"Failed to warm up channel {result.item}, {result.error_message}")
+                continue
+            jobs |= result.result
+
+        # The recent runs of all the jobs are loaded at once, the job history pages are needed only for the jobs
+        # that the Prow jobs listing doesn't cover for the history window of the failure comments
+        snapshot = await get_prow_jobs_index().get_snapshot()
+        _, uncovered_jobs = snapshot.get_histories(
+            jobs, since=(datetime.now(timezone.utc) - timedelta(days=7)).timestamp()
+        )
+        async for result in pool.map(Utils.get_job_history, uncovered_jobs):
+            if not result.ok:
+                logger.warning(f"Failed to warm up job history for {result.item}, {result.error_message}")
+        logger.info(
+            f"Warm up done, loaded {len(self._config)} channels configurations and {len(jobs)} jobs "
+            f"({len(uncovered_jobs)} job history pages)"
+        )
+
+    async def rebalance(self):
+        """Drop the configurations of the channels that moved to another replica and warm up the channels that
+        moved to this one"""
+        moved_out = [channel for channel in self._config if not self._shards.is_owner(channel)]
+        for channel in moved_out:
+            self._config.pop(channel, None)
+            self._config_versions.pop(channel, None)
+            self.invalidate_channel_info(channel)
+            self._history.drop(channel)
+            get_channel_jobs_indexes().drop(channel)
+        logger.info(f"Dropped {len(moved_out)} channels configurations owned by other replicas")
+
+        if not consts.ENABLE_WARM_UP or not self._ready:
+            return  # Channels are loaded on demand, or by the warm up in progress
+
+        if self._rebalance_warm_up is not None:
+            self._rebalance_warm_up.cancel()
+        self._rebalance_warm_up = asyncio.get_event_loop().create_task(self._warm_up_moved_in_channels())
+
+    async def _warm_up_moved_in_channels(self):
+        try:
+            channels = await self.get_member_channels()
+            await self._warm_up_channels(
+                [c for c in channels if self._shards.is_owner(c) and not await self.has_channel_configurations(c)]
+            )
+        except Exception as e:
+            logger.error(f"Failed to warm up the channels moved to this replica, {e.__class__.__name__}: {e}")
+
+    async def _mark_ready(self, term: str | None):
+        self._ready = True
+        if term is not None:
+            await self._state.set("bot", "warmed_up", term)
+
+    async def _warm_up_channel(self, channel_id: str) -> Set[str]:
+        task = self._config_loads.get(channel_id)
+        if task is None and not await self.has_channel_configurations(channel_id):
+            task = self._start_configuration_load(
+                channel_id, self._load_channel_configuration(channel_id, channel_id, notify=False)
             )
-            return None
+        if task is not None:
+            await self._wait_for_configuration_load(channel_id, task)
 
-        return self.get_configuration(channel_id)
+        if (config := await self.get_configuration(channel_id)) is None or not config.prow_configurations:
+            return set()
 
-    async def users_conversations(self, user: str = None, types: str = None):
-        return await self._sm_client.web_client.users_conversations(user=user, types=types)
+        return set(await Utils.get_jobs(config.prow_configurations))
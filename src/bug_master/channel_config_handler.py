@@ -84,6 +84,7 @@ class BaseChannelConfig:
 
 class ChannelFileConfig(BaseChannelConfig):
     SUPPORTED_FILETYPE = ("yaml", "json")
+    FILE_INFO_FIELDS = ("title", "filetype", "url_private", "permalink")
 
     def __init__(self, file_info: dict) -> None:
         super().__init__()
@@ -94,11 +95,13 @@ class ChannelFileConfig(BaseChannelConfig):
         if filetype not in self.SUPPORTED_FILETYPE:
             raise TypeError(f"Invalid file type. Got {filetype} expected to be one of {self.SUPPORTED_FILETYPE}")
 
+        self._file_info = {field: file_info[field] for field in self.FILE_INFO_FIELDS}
         self._title = file_info["title"]
         self._filetype = filetype
         self._url = file_info["url_private"]
         self._permalink = file_info["permalink"]
         self._remote_url = None
+        self._content = {}
 
     def __len__(self):
         return len(self._actions)
@@ -173,10 +176,23 @@ class ChannelFileConfig(BaseChannelConfig):
         self._assignees = None
         self._prow_configurations = None
         content = await self._get_file_content(bot_token, self._url)
+        return self._set_content(content)
 
+    def _set_content(self, content: dict) -> "ChannelFileConfig":
         self.validate_configurations(content)
+        self._content = content
         self._assignees = content.get("assignees", {})
         self._actions = content.get("actions")
         self._prow_configurations = content.get("prow_configurations", {})
 
         return self
+
+    def to_dict(self) -> dict:
+        """Serialize a loaded configuration, so it can be shared with other processes without loading it again"""
+        return {"file_info": self._file_info, "remote_url": self._remote_url, "content": self._content}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ChannelFileConfig":
+        config = cls(data["file_info"])
+        config._remote_url = data.get("remote_url")
+        return config._set_content(data["content"])
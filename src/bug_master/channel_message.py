@@ -4,7 +4,9 @@ from typing import List
 from bug_master import consts
 from bug_master.channel_config_handler import ChannelFileConfig
 from bug_master.consts import logger
+from bug_master.metrics import PHASE_LATENCY
 from bug_master.prow_job import ProwJobFailure
+from bug_master.tracing import tracer
 
 
 class ChannelMessage:
@@ -51,10 +53,14 @@ class ChannelMessage:
         actions = list()
 
         for link in self._get_links():
-            if (failure := await ProwJobFailure(link, self._ts).load()) is not None:
-                if consts.ENABLE_INITIAL_REPORT:
-                    actions += [await failure.get_generic_action()]
-                actions += await failure.get_failure_actions(self._channel_id, channel_config, filter_id)
+            with PHASE_LATENCY.labels("load").time(), tracer.span("load", link=link):
+                failure = await ProwJobFailure(link, self._ts).load()
+
+            if failure is not None:
+                with PHASE_LATENCY.labels("rules").time(), tracer.span("rules", job=failure.job_name):
+                    if consts.ENABLE_INITIAL_REPORT:
+                        actions += [await failure.get_generic_action()]
+                    actions += await failure.get_failure_actions(self._channel_id, channel_config, filter_id)
             break
 
         return actions
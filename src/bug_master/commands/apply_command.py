@@ -1,22 +1,29 @@
 import asyncio
-from typing import Dict, List
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Tuple
 
 from loguru import logger
 from starlette.responses import Response
 
 from bug_master import consts
-from bug_master.bug_master_bot import BugMasterBot
+from bug_master.channel_config_handler import ChannelFileConfig
 from bug_master.commands.command import Command
 from bug_master.events.message_channel_event import MessageChannelEvent
+from bug_master.slack_scheduler import Priority, set_slack_priority
+
+_DONE = None  # Marks the end of a pipeline queue
+
+
+class HistoryMessageEvent(MessageChannelEvent):
+    """A channel history message handled by apply. It is deduplicated apart from the live message events, so messages
+    that were seen live without getting actions (e.g. before the configuration was fixed) are handled again"""
+
+    MESSAGE_KEY_PREFIX = "apply"
 
 
 class ApplyCommand(Command):
     DEFAULT_HISTORY_MESSAGES_TO_READ = 20
-    MAX_HISTORY_MESSAGES_TO_READ = 200
-
-    def __init__(self, bot: BugMasterBot, **kwargs) -> None:
-        super().__init__(bot, **kwargs)
-        self._task = None
+    MAX_HISTORY_MESSAGES_TO_READ = 5000
 
     @classmethod
     def command(cls):
@@ -26,12 +33,14 @@ class ApplyCommand(Command):
     def get_arguments_info(cls) -> Dict[str, str]:
         return {
             "<messages>": "A positive number that represent the amount of messages to apply on. "
-            f"/bugmaster apply <messages> (default={cls.DEFAULT_HISTORY_MESSAGES_TO_READ})."
+            f"/bugmaster apply <messages> (default={cls.DEFAULT_HISTORY_MESSAGES_TO_READ}, "
+            f"max={cls.MAX_HISTORY_MESSAGES_TO_READ}).",
+            "since <date>": "Apply on all the messages since the given date. /bugmaster apply since YYYY-MM-DD",
         }
 
     @classmethod
     def get_description(cls) -> str:
-        return "Apply BugMasterBot logic on n last channel messages"
+        return "Apply BugMasterBot logic on n last channel messages, or on all the messages since a given date"
 
     def _get_messages_count(self):
         if not self._command_args or not self._command_args[0]:
@@ -43,21 +52,40 @@ class ApplyCommand(Command):
 
         return min(messages_count, self.MAX_HISTORY_MESSAGES_TO_READ)
 
+    def _get_since(self) -> float | None:
+        """Get the since date timestamp, the date is split by the command parser (e.g. `2024-05-01` -> 2024 05 01)"""
+        if not self._command_args or self._command_args[0] != "since":
+            return None
+
+        year, month, day = (int(arg) for arg in self._command_args[1:4])
+        since = datetime(year, month, day, tzinfo=timezone.utc)
+        if since > datetime.now(timezone.utc):
+            raise ValueError
+        return since.timestamp()
+
     async def handle(self) -> Response:
         try:
-            messages_count = self._get_messages_count()
+            since = self._get_since()
+            messages_count = self._get_messages_count() if since is None else None
         except ValueError:
             return self.get_response_with_command(
-                f"Invalid number of messages to read, got `{self._command_args[0]}`. Positive integer is required."
+                f"Invalid arguments `{' '.join(self._command_args)}`. "
+                "A positive integer or `since YYYY-MM-DD` (a past date) is required."
             )
-        messages, _cursor = await self._bot.get_messages(self._channel_id, messages_count)
-        logger.info(f"Got {len(messages)} form channel {self._channel_id}:{self._channel_name}, creating task ...")
-        self._task = asyncio.get_event_loop().create_task(self.update_task(messages))
+
+        logger.info(f"Creating apply task on channel {self._channel_id}:{self._channel_name} ...")
+        if not await self.submit_task(messages_count=messages_count, since=since):
+            return self.get_busy_response()
+
+        since_date = datetime.fromtimestamp(since, timezone.utc).date() if since else None
+        scope = f"messages since {since_date}" if since else f"last {messages_count} messages"
         return self.get_response_with_command(
-            f"Updating process is in progress, this might take a few minutes to finish.\n"
-            f"`Messages loaded from history: {len(messages)}`"
+            f"Updating process is in progress on the {scope}, this might take a few minutes to finish."
         )
 
+    async def run_task(self, messages_count: int = None, since: float = None):
+        await self.update_task(messages_count, since)
+
     def _is_already_handled(self, message: dict) -> bool:
         for reaction in message.get("reactions", []):
             if self._bot.user_id in reaction.get("users", []):
@@ -68,48 +96,145 @@ class ApplyCommand(Command):
 
         return False
 
-    async def update_task(self, messages: List[dict]):
-        tasks = []
-
-        for message in messages:
-            if not message.get("text", "").strip().startswith(consts.EVENT_FAILURE_PREFIX):
-                logger.debug(
-                    f"Skipping message due to it's not starting with {consts.EVENT_FAILURE_PREFIX} "
-                    f"{message['text']}"
+    async def _to_event(self, message: dict) -> MessageChannelEvent | None:
+        """Prefilter the history message, and wrap it as a message event if it should be handled"""
+        if not message.get("text", "").strip().startswith(consts.EVENT_FAILURE_PREFIX):
+            logger.debug(f"Skipping message due to it's not starting with {consts.EVENT_FAILURE_PREFIX}")
+            return None
+
+        if self._is_already_handled(message):
+            logger.debug(f"Skipping message due to it was already handled {message['ts']}")
+            return None
+
+        # todo create shared base code with MessageChannelEvent and this class and not reuse the event mechanism
+        dummy_event_body = {
+            "event": {
+                "type": "not_an_event_history_apply_task",
+                "channel": self._channel_id,
+                "text": message["text"],
+                "ts": message["ts"],
+                "user": message.get("user"),
+            },
+            "event_id": f"apply:{self._channel_id}:{message['ts']}",
+        }
+        mce = HistoryMessageEvent(dummy_event_body, self._bot)
+        if await self._bot.dedup.is_duplicate(*mce.dedup_keys):
+            logger.debug(f"Skipping message due to it is already being handled {message['ts']}")
+            return None
+
+        return mce
+
+    async def _read_history(
+        self,
+        events: asyncio.Queue,
+        messages_count: int | None,
+        since: float | None,
+        stats: dict,
+        matched: List[MessageChannelEvent],
+        on_progress: Callable[[], None],
+    ):
+        """Read the channel history (newest first) from the local mirror page by page, and feed the messages that
+        should be handled"""
+        async for messages in self._bot.history.get_messages(self._channel_id, since or 0, messages_count):
+            stats["read"] += len(messages)
+            on_progress()
+            for message in messages:
+                if (mce := await self._to_event(message)) is not None:
+                    stats["matched"] += 1
+                    matched.append(mce)
+                    await events.put(mce)
+
+    async def _analyze(
+        self, events: asyncio.Queue, writes: asyncio.Queue, channel_config: ChannelFileConfig, failed: list
+    ):
+        while (mce := await events.get()) is not _DONE:
+            try:
+                actions = await self._bot.work_scheduler.run(
+                    self._channel_id, Priority.BULK, mce.get_failure_actions, channel_config
                 )
+            except Exception as e:
+                logger.warning(f"Failed to analyze message {mce}, {e.__class__.__name__}: {e}")
+                failed.append((mce, e))
                 continue
 
-            if self._is_already_handled(message):
-                logger.debug(f"Skipping message due to it was already handled\n{message}")
-                continue
+            if actions:
+                await writes.put((mce, actions))
+            else:
+                await self._bot.dedup.forget(*mce.dedup_keys)
+
+    async def _write(self, writes: asyncio.Queue, failed: list, stats: dict, on_progress: Callable[[], None]):
+        """Apply the analyzed actions one message at a time, Slack calls are rate limited by the Slack scheduler"""
+        while (item := await writes.get()) is not _DONE:
+            mce, actions = item
+            try:
+                await mce.apply_actions(actions)
+                stats["applied"] += 1
+            except Exception as e:
+                logger.warning(f"Failed to apply actions on message {mce}, {e.__class__.__name__}: {e}")
+                failed.append((mce, e))
+            on_progress()
+
+    async def update_task(self, messages_count: int = None, since: float = None):
+        set_slack_priority(Priority.BULK)
+        channel_config = await self._bot.get_channel_configuration(self._channel_id, self._channel_name)
+        if channel_config is None:
+            logger.warning(f"Can't apply on channel {self._channel_id}, missing or invalid configuration")
+            return
+
+        stats = {"read": 0, "matched": 0, "applied": 0}
+        matched: List[MessageChannelEvent] = []
+        failed: List[Tuple[MessageChannelEvent, Exception]] = []
+        reporter = await self.start_progress("Reading channel history...")
+
+        def render() -> str:
+            return (
+                f"Read {stats['read']} messages, {stats['matched']} need handling, "
+                f"actions applied on {stats['applied']} messages so far"
+            )
 
-            logger.info(f"Handling unhandled message {message}")
-
-            # todo create shared base code with MessageChannelEvent and this class and not reuse the event mechanism
-            dummy_event_body = {
-                "event": {
-                    "type": "not_an_event_history_apply_task",
-                    "channel": self._channel_id,
-                    "text": message["text"],
-                    "ts": message["ts"],
-                    "user": message["user"],
-                },
-                "event_id": message["ts"],
-            }
-            mce = MessageChannelEvent(dummy_event_body, self._bot)
-            channel_info = await mce.get_channel_info()
-
-            await asyncio.sleep(1)
-            task = asyncio.get_event_loop().create_task(mce.handle(channel_info=channel_info))
-            tasks.append(task)
-
-        logger.info(f"Waiting for {len(tasks)} background tasks to finish.")
-
-        while True:
-            if all([task.done() for task in tasks]):
-                break
-            await asyncio.sleep(2)
-
-        logger.info(
-            f"Finished background task for handling {len(messages)} messages. " f"Total actions needed {len(tasks)}."
+        def on_progress():
+            reporter.update(render)
+
+        analyzers_count = consts.WORK_BULK_CONCURRENCY
+        events = asyncio.Queue(maxsize=analyzers_count * 2)
+        writes = asyncio.Queue(maxsize=analyzers_count * 2)
+
+        loop = asyncio.get_event_loop()
+        analyzers = [
+            loop.create_task(self._analyze(events, writes, channel_config, failed)) for _ in range(analyzers_count)
+        ]
+        writer = loop.create_task(self._write(writes, failed, stats, on_progress))
+        try:
+            await self._read_history(events, messages_count, since, stats, matched, on_progress)
+            for _ in analyzers:
+                await events.put(_DONE)
+            await asyncio.gather(*analyzers)
+            await writes.put(_DONE)
+            await writer
+        except Exception as e:
+            logger.warning(f"Apply on channel {self._channel_id} failed, {e.__class__.__name__}: {e}")
+            await reporter.finish(
+                f"Failed after reading {stats['read']} messages, actions applied on {stats['applied']} messages. "
+                f"The command will be retried ({e.__class__.__name__}: {e})"
+            )
+            # The messages that were not handled yet are handled again when the command task is retried, the handled
+            # ones are skipped by their reactions
+            for mce in matched:
+                await self._bot.dedup.forget(*mce.dedup_keys)
+            raise
+        finally:
+            for task in analyzers + [writer]:
+                task.cancel()
+
+        summary = (
+            f"Finished, read {stats['read']} messages, {stats['matched']} needed handling, "
+            f"actions applied on {stats['applied']} messages"
         )
+        logger.info(f"{summary} on channel {self._channel_id}, {len(failed)} failed")
+        await reporter.finish(summary + (f", {len(failed)} failed" if failed else ""))
+
+        # Failed messages are handled again when the command task is retried
+        if failed:
+            for mce, _e in failed:
+                await self._bot.dedup.forget(*mce.dedup_keys)
+            raise RuntimeError(f"Failed to handle {len(failed)}/{stats['matched']} messages, {failed[0][1]}")
@@ -19,11 +19,11 @@ class ChannelConfigurationCommand(Command):
         return "config"
 
     async def get_configuration_link(self):
-        channel_config = self._bot.get_configuration(self._channel_id)
+        channel_config = await self._bot.get_configuration(self._channel_id)
         if not channel_config:
             logger.info(f"Attempting to load configurations for channel `{self._channel_id}:{self._channel_name}`")
             await self._bot.try_load_configurations_from_history(self._channel_id)
-            channel_config = self._bot.get_configuration(self._channel_id)
+            channel_config = await self._bot.get_configuration(self._channel_id)
 
         if channel_config is None:
             return self.get_response_with_command(
@@ -42,6 +42,12 @@ class ChannelConfigurationCommand(Command):
         json_schema = {k: v for k, v in schema.json_schema(self._channel_id).items() if not k.startswith("$")}
         return self.get_response_with_command(f"```{yaml.dump(json_schema, indent=2)}```")
 
+    def is_deferred(self) -> bool:
+        if self._command_args and self._command_args[0] in ("schema", "refresh"):
+            return self._command_args[0] == "refresh"
+
+        return self._bot.get_cached_configuration(self._channel_id) is None
+
     async def handle(self) -> Response:
         logger.info(f"Handling {self._command}")
 
@@ -4,12 +4,15 @@ from typing import Dict, List, Tuple
 
 from starlette.responses import JSONResponse, Response
 
+from bug_master import consts
 from bug_master.bug_master_bot import BugMasterBot
+from bug_master.progress import ProgressReporter
 
 
 class Command(ABC):
     def __init__(self, bot: BugMasterBot, **kwargs) -> None:
         self._bot = bot
+        self._body = kwargs
         self._channel_id = kwargs.get("channel_id")
         self._user_id = kwargs.get("user_id")
         self._user_name = kwargs.get("user_name")
@@ -57,10 +60,34 @@ class Command(ABC):
     async def handle(self) -> Response:
         pass
 
+    def is_deferred(self) -> bool:
+        """Whether handling the command might take longer than Slack waits for the response, if so the command is
+        acknowledged right away and its response is delivered through the command response_url"""
+        return False
+
+    async def submit_task(self, **kwargs) -> bool:
+        """Submit the background part of the command to the task queue, it is then run by run_task(**kwargs).
+        The command body and the kwargs are stored with the task so it can be retried or resumed after a restart.
+        :return: False if the task queue is full
+        """
+        return await self._bot.task_queue.submit("command", {"body": self._body, "kwargs": kwargs})
+
+    async def run_task(self, **kwargs):
+        raise NotImplementedError(f"Command {self.command()} doesn't have a background task")
+
+    async def start_progress(self, text: str) -> ProgressReporter:
+        """Post the progress message of the command background task, as a direct message to the user"""
+        reporter = ProgressReporter(self._bot, self._user_id, consts.PROGRESS_UPDATE_INTERVAL)
+        await reporter.start(f"`$ /bugmaster {self.command()} {' '.join(self._command_args)}` - {text}")
+        return reporter
+
     def get_response_with_command(self, text: str) -> Response:
         text = f"```$ /bugmaster {self.command()} {' '.join(self._command_args)}```\n" + text
         return JSONResponse({"response_type": "ephemeral", "text": text})
 
+    def get_busy_response(self) -> Response:
+        return self.get_response_with_command("BugMaster is too busy right now, please try again in a few minutes.")
+
     @classmethod
     def get_response(cls, text: str) -> Response:
         return JSONResponse({"response_type": "ephemeral", "text": text})
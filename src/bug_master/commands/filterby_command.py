@@ -1,16 +1,18 @@
 import asyncio
 import time
-from builtins import list
-from itertools import chain
-from typing import Dict
+from typing import Dict, List, Tuple
 
 from starlette.responses import Response
 
+from bug_master import consts
 from bug_master.async_pool import AsyncPool
 from bug_master.bug_master_bot import BugMasterBot
 from bug_master.channel_config_handler import ChannelFileConfig
 from bug_master.channel_message import ChannelMessage
 from bug_master.commands.command import Command
+from bug_master.consts import logger
+from bug_master.progress import ProgressReporter
+from bug_master.slack_scheduler import Priority, set_slack_priority
 
 
 class FilterByCommand(Command):
@@ -33,51 +35,83 @@ class FilterByCommand(Command):
             "action_id": "A unique ID from the channel configuration file /bugmaster filterby <days> <action_id>",
         }
 
+    def is_deferred(self) -> bool:
+        return True
+
     async def handle(self) -> Response:
         channel_info = await self._bot.get_channel_info(self._channel_id) if self._channel_id else {}
         channel_name = channel_info.get("name", self._channel_id)
 
-        if (channel_config := await self._bot.get_channel_configuration(self._channel_id, channel_name)) is None:
+        if await self._bot.get_channel_configuration(self._channel_id, channel_name) is None:
             return self.get_response_with_command(
                 "Can't find channel configurations or that the configurations are not valid"
             )
 
-        asyncio.get_event_loop().create_task(self._handle_messages(channel_config))
+        if not await self.submit_task():
+            return self.get_busy_response()
 
         return self.get_response_with_command(
             "Task is being executed in the background and it might take some time to finish the report. The result will"
             "be sent as a private message."
         )
 
+    async def run_task(self):
+        channel_info = await self._bot.get_channel_info(self._channel_id) if self._channel_id else {}
+        channel_name = channel_info.get("name", self._channel_id)
+        if (channel_config := await self._bot.get_channel_configuration(self._channel_id, channel_name)) is not None:
+            await self._handle_messages(channel_config)
+
     async def _handle_messages(self, channel_config: ChannelFileConfig):
+        set_slack_priority(Priority.BULK)
+        reporter = await self.start_progress("Loading channel messages...")
         since = int(time.time()) - (int(self._days) * 24 * 60 * 60)
-        actions = await self._get_actions(since, channel_config)
+        actions, skipped = await self._get_actions(since, channel_config, reporter)
 
         # Create report
         message = (
             f"Hi {self._user_name},\n The error with `action_id={self._action_id}` has appeared {len(actions)} "
             f"times in the last {self._days} days"
         )
+        if skipped:
+            message += f" ({skipped} messages couldn't be scanned and are not counted)"
 
-        await self._bot.add_comment(channel=self._user_id, comment=message)
+        await reporter.finish(message)
 
-    async def _get_actions(self, since: float, channel_config: ChannelFileConfig):
+    async def _get_actions(
+        self, since: float, channel_config: ChannelFileConfig, reporter: ProgressReporter
+    ) -> Tuple[List[dict], int]:
+        """Get the actions of the channel messages since the given time
+        :return: The actions, and the number of messages that couldn't be scanned
+        """
         messages_data = await self._bot.get_all_messages(self._channel_id, since)
+        progress = {"scanned": 0, "found": 0, "skipped": 0}
 
-        pool = AsyncPool(10)
-        messages = list()
-        for message_data in messages_data:
-            message = ChannelMessage(**message_data)
-            await pool.add_worker(
-                message.id,
-                message.get_message_actions,
-                channel_config=channel_config,
-                filter_id=self._action_id,
+        def render() -> str:
+            return (
+                f"Scanned {progress['scanned']}/{len(messages_data)} messages, the error with "
+                f"`action_id={self._action_id}` has appeared {progress['found']} times so far"
             )
-            messages.append(message)
 
-        actions_map = await pool.start()
-        return list(chain(*[action for action in actions_map for ts, action in action.items() if action]))
+        async def scan(message: ChannelMessage):
+            # The timeout covers the scan only, not the time waiting for a slot behind the live work
+            return await asyncio.wait_for(
+                message.get_message_actions(channel_config, self._action_id), consts.FAN_OUT_TASK_TIMEOUT
+            )
 
-    async def _get_message_actions(self, message: ChannelMessage, channel_config: ChannelFileConfig):
-        return await message.get_message_actions(channel_config, self._action_id)
+        async def get_message_actions(message: ChannelMessage):
+            return await self._bot.work_scheduler.run(self._channel_id, Priority.BULK, scan, message)
+
+        actions = []
+        pool = AsyncPool(consts.WORK_BULK_CONCURRENCY)
+        messages = (ChannelMessage(**message_data) for message_data in messages_data)
+        async for result in pool.map(get_message_actions, messages):
+            progress["scanned"] += 1
+            if not result.ok:
+                progress["skipped"] += 1
+                logger.warning(f"Failed to get actions of message {result.item.id}, {result.error_message}")
+            elif result.result:
+                progress["found"] += len(result.result)
+                actions += result.result
+            reporter.update(render)
+
+        return actions, progress["skipped"]
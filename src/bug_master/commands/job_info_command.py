@@ -38,7 +38,7 @@ class JobInfoCommand(Command):
             f"user={self.user_id} channel={self._channel_id}:{self._channel_name}"
         )
 
-        if (config := self._bot.get_configuration(self._channel_id)) is None:
+        if (config := await self._bot.get_configuration(self._channel_id)) is None:
             logger.info(
                 f"Cannot find configurations, loading for "
                 f"user={self.user_id} channel={self._channel_id}:{self._channel_name}"
@@ -76,14 +76,14 @@ class JobInfoCommand(Command):
         )
 
         drop_down = JobsDropDown(self._bot)
-        attachments = await drop_down.get_drop_down(channel_config=config, next_id=DaysRangeDropDown.callback_id())
+        attachments = await drop_down.get_drop_down(
+            channel_config=config, channel_id=self._channel_id, next_id=DaysRangeDropDown.callback_id()
+        )
         drop_down_comment = await self._bot.add_comment(
             self._user_id, "Select job from the drop down menu", attachments=attachments
         )
-        user_bot_conversations = await self._bot.users_conversations(user=self._user_id, types="im")
-
         permlink = "on the user-bot conversation under `Apps` section (below `Direct Messages`."
-        for c in user_bot_conversations.data.get("channels", []):
+        for c in await self._bot.get_im_channels(self._user_id):
             if (c_id := c.get("id")) and c_id.startswith("D"):
                 permlink = f"<{self._bot.org_url}archives/{c_id} | here>"
                 break
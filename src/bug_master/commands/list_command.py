@@ -6,9 +6,15 @@ from typing import Dict, List, Tuple
 from starlette.responses import Response
 from tabulate import tabulate
 
+from bug_master import consts
+from bug_master.async_pool import AsyncPool
 from bug_master.bug_master_bot import BugMasterBot
 from bug_master.commands.command import Command
 from bug_master.commands.exceptions import NotSupportedCommandError
+from bug_master.consts import logger
+from bug_master.job_history import JobHistories
+from bug_master.prow_jobs_index import get_prow_jobs_index
+from bug_master.slack_scheduler import Priority
 from bug_master.utils import Utils
 
 
@@ -18,6 +24,7 @@ class ListCommands(Enum):
 
 class ListCommand(Command):
     DEFAULT_TESTS_AMOUNT = 7
+    TABLE_LEGEND = "* Last job failed, *N - last N jobs failed"
 
     def __init__(self, bot: BugMasterBot, **kwargs) -> None:
         super().__init__(bot, **kwargs)
@@ -43,11 +50,14 @@ class ListCommand(Command):
     def get_description(cls) -> str:
         return "List elements - currently only `/bugmaster list jobs` is supported"
 
+    def is_deferred(self) -> bool:
+        return self._bot.get_cached_configuration(self._channel_id) is None
+
     async def handle(self) -> Response:
         if self._list_command != ListCommands.LIST_JOBS.value:
             return self.get_response_with_command(f"Invalid list command. {self._list_command}: command not found...")
 
-        if (config := self._bot.get_configuration(self._channel_id)) is None:
+        if (config := await self._bot.get_configuration(self._channel_id)) is None:
             config = await self._bot.get_channel_configuration(self._channel_id, self._channel_name)
             if config is None:
                 return self.get_response_with_command("Invalid or missing channel configuration")
@@ -68,24 +78,64 @@ class ListCommand(Command):
                 "Invalid tests amount. Expected positive int between 1 to 20," f"got {self._tests_amount}"
             )
 
-        asyncio.get_event_loop().create_task(self._handle_jobs_history_report(config, tests_amount))
+        if not await self.submit_task(tests_amount=tests_amount):
+            return self.get_busy_response()
+
         return self.get_response_with_command("Loading jobs list...")
 
+    async def run_task(self, tests_amount: int):
+        if (config := await self._bot.get_channel_configuration(self._channel_id, self._channel_name)) is not None:
+            await self._handle_jobs_history_report(config, tests_amount)
+
     async def _handle_jobs_history_report(self, config, tests_amount: int = DEFAULT_TESTS_AMOUNT):
-        tasks = []
-        results = []
+        reporter = await self.start_progress("Loading jobs list...")
+        jobs = await Utils.get_jobs(config.prow_configurations)
+
+        # All the jobs covered by the Prow jobs listing are aggregated at once, the others are loaded one by one
+        snapshot = await get_prow_jobs_index().get_snapshot()
+        histories, uncovered_jobs = snapshot.get_histories(jobs, runs=tests_amount)
 
-        for job in await Utils.get_jobs(config.prow_configurations):
-            tasks.append(asyncio.get_event_loop().create_task(self._load_job_history_data(results, job, tests_amount)))
+        def get_table() -> str:
+            return self._get_list_jobs_success_rate_table(self._get_jobs_results(histories, tests_amount), config)
 
-        while True:
-            if all([task.done() for task in tasks]):
-                break
-            await asyncio.sleep(2)
+        def render() -> str:
+            return (
+                f"Loading jobs list... {len(histories)}/{len(jobs)} jobs loaded, a summary of the {tests_amount} "
+                f"most recent jobs:\n```{get_table()}\n{self.TABLE_LEGEND}```"
+            )
+
+        async def fetch_job_history(job: str):
+            # The timeout covers the fetch only, not the time waiting for a slot behind the other work
+            return await asyncio.wait_for(
+                get_prow_jobs_index().get_job_history(job, runs=tests_amount), consts.FAN_OUT_TASK_TIMEOUT
+            )
 
-        table = self._get_list_jobs_success_rate_table(results, config)
-        comment = f"A summary of the {tests_amount} most recent jobs:\n```{table}\n* Last job failed```"
-        await self._bot.add_ephemeral_comment(self._channel_id, self._user_id, comment)
+        async def load_job_history(job: str):
+            histories[job] = await self._bot.work_scheduler.run(
+                self._channel_id, Priority.INTERACTIVE, fetch_job_history, job
+            )
+
+        skipped = 0
+        pool = AsyncPool(consts.WORK_CHANNEL_QUOTA)
+        async for result in pool.map(load_job_history, uncovered_jobs):
+            if not result.ok:
+                skipped += 1
+                logger.warning(f"Failed to load job {result.item} history, {result.error_message}")
+            reporter.update(render)
+
+        skipped_message = f"\n{skipped} jobs couldn't be loaded and are not listed" if skipped else ""
+        await reporter.finish(
+            f"A summary of the {tests_amount} most recent jobs:\n```{get_table()}\n{self.TABLE_LEGEND}```"
+            + skipped_message
+        )
+
+    @classmethod
+    def _get_jobs_results(cls, histories: JobHistories, tests_amount: int) -> List[Tuple[str, int, int, int]]:
+        return [
+            (job_name, stats.total, stats.succeeded, stats.streak if stats.last_failed else 0)
+            for job_name, stats in histories.stats(runs=tests_amount).items()
+            if stats.total > 0
+        ]
 
     @classmethod
     def _get_job_issue_data(cls, config):
@@ -100,13 +150,13 @@ class ListCommand(Command):
         return issues_data
 
     @classmethod
-    def _get_list_jobs_success_rate_table(cls, results: List[Tuple[str, int, int, bool]], config) -> str:
+    def _get_list_jobs_success_rate_table(cls, results: List[Tuple[str, int, int, int]], config) -> str:
         jobs_data = []
         if not results:
             return "Can't find any jobs"
 
         issue_data = cls._get_job_issue_data(config)
-        for job_name, total_jobs, succeeded_jobs, is_last_failed in results:
+        for job_name, total_jobs, succeeded_jobs, failure_streak in results:
             if total_jobs == 0 or total_jobs == succeeded_jobs:
                 continue
 
@@ -122,7 +172,7 @@ class ListCommand(Command):
                 issue_placeholder = len(jobs_with_issues[0].split("/")[-1]) * "@"
 
             success_rate = 100 * (succeeded_jobs / total_jobs)
-            last_failed = " *" if is_last_failed else ""
+            last_failed = f" *{failure_streak if failure_streak > 1 else ''}" if failure_streak else ""
             jobs_data.append(
                 (
                     short_job_name,
@@ -171,11 +221,3 @@ class ListCommand(Command):
             jobs_data_index += 1
 
         return "\n".join(headers + rows_data)
-
-    @classmethod
-    async def _load_job_history_data(cls, result: List[Tuple[str, int, int, bool]], job_name: str, tests_amount: int):
-        jobs = await Utils.get_job_history(job_name)
-
-        jobs = jobs[: min(tests_amount, len(jobs))]
-        succeeded_jobs = [j for j in jobs if j.succeeded]
-        result.append((job_name, len(jobs), len(succeeded_jobs), not jobs[0].succeeded))
@@ -25,9 +25,18 @@ def strtobool(val):
 APP_TOKEN = os.getenv("APP_TOKEN")
 SIGNING_SECRET = os.getenv("SIGNING_SECRET")
 BOT_USER_TOKEN = os.getenv("BOT_USER_TOKEN")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # Bearer token of the metrics endpoint, metrics are disabled if not set
 SSL_KEYFILE_PASSWORD = os.getenv("SSL_KEYFILE_PASSWORD")
 WEBSERVER_PORT = int(os.getenv("WEBSERVER_PORT", 8080))
 WEBSERVER_HOST = os.getenv("WEBSERVER_HOST", default="0.0.0.0")
+WEBSERVER_WORKERS = int(os.getenv("WEBSERVER_WORKERS", default=1))
+STATE_STORE_PATH = os.getenv("STATE_STORE_PATH")
+LEADER_LEASE_TTL = int(os.getenv("LEADER_LEASE_TTL", default=30))
+SHARD_REPLICAS = [url.strip() for url in os.getenv("SHARD_REPLICAS", default="").split(",") if url.strip()]
+SHARD_SELF_URL = os.getenv("SHARD_SELF_URL", default="")
+SHARD_MODE = os.getenv("SHARD_MODE", default="forward")
+SHARD_CHECK_INTERVAL = int(os.getenv("SHARD_CHECK_INTERVAL", default=10))
+SHARD_FORWARD_TIMEOUT = float(os.getenv("SHARD_FORWARD_TIMEOUT", default=1.5))
 CONFIGURATION_FILE_NAME = os.getenv("CONFIGURATION_FILE_NAME", default="bug_master_configuration.yaml")
 LOG_LEVEL = int(os.getenv("LOG_LEVEL", logging.DEBUG))
 EVENT_FAILURE_PREFIX = ":red_jenkins_circle:"
@@ -35,10 +44,64 @@ DISABLE_AUTO_ASSIGN_DEFAULT = False
 HTTP_PROTOCOL_TYPE: HTTPProtocolType = os.getenv("HTTP_PROTOCOL_TYPE", default="auto")
 DOWNLOAD_FILE_TIMEOUT = int(os.getenv("DOWNLOAD_FILE_TIMEOUT", default=10))
 ENABLE_INITIAL_REPORT = strtobool(os.getenv("ENABLE_INITIAL_REPORT", default="True"))
+COALESCE_COMMENTS = strtobool(os.getenv("COALESCE_COMMENTS", default="False"))
 CI_BUCKET_NAME = os.getenv("CI_BUCKET_NAME", "test-platform-results")
+PROW_JOBS_URL = os.getenv(
+    "PROW_JOBS_URL", "https://prow.ci.openshift.org/prowjobs.js?omit=annotations,labels,decoration_config,pod_spec"
+)
+PROW_JOBS_TTL = int(os.getenv("PROW_JOBS_TTL", default=300))
+PROW_JOBS_TIMEOUT = int(os.getenv("PROW_JOBS_TIMEOUT", default=60))
+REFRESH_INTERVAL = int(os.getenv("REFRESH_INTERVAL", default=30))
+REFRESH_CONCURRENCY = int(os.getenv("REFRESH_CONCURRENCY", default=4))
+REFRESH_JITTER = float(os.getenv("REFRESH_JITTER", default=0.2))
+REFRESH_IDLE_TTL = int(os.getenv("REFRESH_IDLE_TTL", default=24 * 60 * 60))
+ENABLE_WARM_UP = strtobool(os.getenv("ENABLE_WARM_UP", default="True"))
+WARM_UP_CONCURRENCY = int(os.getenv("WARM_UP_CONCURRENCY", default=5))
+PROGRESS_UPDATE_INTERVAL = float(os.getenv("PROGRESS_UPDATE_INTERVAL", default=3))
+TRACE_SLOW_THRESHOLD = float(os.getenv("TRACE_SLOW_THRESHOLD", default=30))
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH")  # OTLP/JSON file the traces are appended to, if set
+TRACE_EXPORT_INTERVAL = float(os.getenv("TRACE_EXPORT_INTERVAL", default=5))
+TRACE_EXPORT_BUFFER_SIZE = int(os.getenv("TRACE_EXPORT_BUFFER_SIZE", default=1000))
+SLACK_API_URL = os.getenv("SLACK_API_URL", default="https://slack.com/api/")
+SLACK_CONNECTIONS_LIMIT = int(os.getenv("SLACK_CONNECTIONS_LIMIT", default=20))
+SLACK_KEEPALIVE_TIMEOUT = int(os.getenv("SLACK_KEEPALIVE_TIMEOUT", default=60))
+INGESTION_MODE = os.getenv("INGESTION_MODE", default="webhook")
+SOCKET_MODE_CONNECTIONS = int(os.getenv("SOCKET_MODE_CONNECTIONS", default=2))
+EVENT_WORKERS = int(os.getenv("EVENT_WORKERS", default=10))
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", default=1000))
+COMMAND_WORKERS = int(os.getenv("COMMAND_WORKERS", default=4))
+COMMAND_QUEUE_SIZE = int(os.getenv("COMMAND_QUEUE_SIZE", default=100))
+RESPONSE_WORKERS = int(os.getenv("RESPONSE_WORKERS", default=4))
+RESPONSE_QUEUE_SIZE = int(os.getenv("RESPONSE_QUEUE_SIZE", default=100))
+TASK_STORE_PATH = os.getenv("TASK_STORE_PATH", default=STATE_STORE_PATH)
+TASK_VISIBILITY_TIMEOUT = int(os.getenv("TASK_VISIBILITY_TIMEOUT", default=300))
+TASK_MAX_ATTEMPTS = int(os.getenv("TASK_MAX_ATTEMPTS", default=5))
+TASK_RETRY_BACKOFF = int(os.getenv("TASK_RETRY_BACKOFF", default=5))
+TASK_QUEUE_STATS_INTERVAL = int(os.getenv("TASK_QUEUE_STATS_INTERVAL", default=60))
+TASK_FAILED_RETENTION_DAYS = int(os.getenv("TASK_FAILED_RETENTION_DAYS", default=7))
+WORK_CONCURRENCY = int(os.getenv("WORK_CONCURRENCY", default=20))
+WORK_CHANNEL_QUOTA = int(os.getenv("WORK_CHANNEL_QUOTA", default=5))
+WORK_BULK_CONCURRENCY = int(os.getenv("WORK_BULK_CONCURRENCY", default=10))
+WORK_THROTTLED_BULK_CONCURRENCY = int(os.getenv("WORK_THROTTLED_BULK_CONCURRENCY", default=1))
+FAN_OUT_TASK_TIMEOUT = float(os.getenv("FAN_OUT_TASK_TIMEOUT", default=120))
+METADATA_CACHE_TTL = int(os.getenv("METADATA_CACHE_TTL", default=3600))
+METADATA_CACHE_SIZE = int(os.getenv("METADATA_CACHE_SIZE", default=1000))
+DEDUP_TTL = int(os.getenv("DEDUP_TTL", default=3600))
+DEDUP_MAX_KEYS = int(os.getenv("DEDUP_MAX_KEYS", default=10000))
+DEDUP_STORE_PATH = os.getenv("DEDUP_STORE_PATH", default=STATE_STORE_PATH)
+DEDUP_ACK_TIMEOUT = float(os.getenv("DEDUP_ACK_TIMEOUT", default=0.5))
+MESSAGE_STORE_PATH = os.getenv("MESSAGE_STORE_PATH", default=STATE_STORE_PATH)
+MESSAGE_HISTORY_PAGE_SIZE = int(os.getenv("MESSAGE_HISTORY_PAGE_SIZE", default=1000))
+MESSAGE_HISTORY_MAX_STALENESS = int(os.getenv("MESSAGE_HISTORY_MAX_STALENESS", default=60))
+MESSAGE_HISTORY_RETENTION_DAYS = int(os.getenv("MESSAGE_HISTORY_RETENTION_DAYS", default=90))
+MESSAGE_HISTORY_MAX_MESSAGES = int(os.getenv("MESSAGE_HISTORY_MAX_MESSAGES", default=10000))
 
 MB = 1000000
 MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", default=30 * MB))
+FILES_GRID_CACHE_MAX_BYTES = int(os.getenv("FILES_GRID_CACHE_MAX_BYTES", default=20 * MB))
+GLOB_CACHE_MAX_BYTES = int(os.getenv("GLOB_CACHE_MAX_BYTES", default=5 * MB))
+JOB_HISTORY_CACHE_MAX_BYTES = int(os.getenv("JOB_HISTORY_CACHE_MAX_BYTES", default=50 * MB))
+JOBS_CACHE_MAX_BYTES = int(os.getenv("JOBS_CACHE_MAX_BYTES", default=10 * MB))
 
 if APP_TOKEN is None:
     raise EnvironmentError("Missing app token (APP_TOKEN) environment variable")
@@ -46,12 +109,17 @@ if SIGNING_SECRET is None:
     raise EnvironmentError("Missing signing secret (SIGNING_SECRET) environment variable")
 if BOT_USER_TOKEN is None:
     raise EnvironmentError("Missing bot user token (BOT_USER_TOKEN) environment variable")
+if SHARD_REPLICAS and SHARD_SELF_URL not in SHARD_REPLICAS:
+    raise EnvironmentError("This replica url (SHARD_SELF_URL) must be one of the shard replicas (SHARD_REPLICAS)")
+if WEBSERVER_WORKERS > 1 and not STATE_STORE_PATH:
+    raise EnvironmentError("Running multiple web server workers requires a state store (STATE_STORE_PATH)")
 
 logger.remove()
+logger.configure(extra={"trace_id": "-"})  # Set while handling an event or a command, see tracing.Tracer
 logger.add(
     sys.stdout,
     colorize=True,
-    format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | {level} | <level>{message}</level>",
+    format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | {level} | {extra[trace_id]} | <level>{message}</level>",
     level=LOG_LEVEL,
 )
 
@@ -0,0 +1,147 @@
+import asyncio
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable
+
+from bug_master.consts import logger
+
+
+class DedupStore(ABC):
+    def __init__(self, ttl: int, max_keys: int) -> None:
+        self._ttl = ttl
+        self._max_keys = max_keys
+
+    @abstractmethod
+    def add_if_absent(self, keys: Iterable[str]) -> bool:
+        """Atomically add all the given keys unless one of them is already stored.
+        :return: True if the keys were added, False if one of them was already stored and not expired
+        """
+        pass
+
+    @abstractmethod
+    def discard(self, keys: Iterable[str]):
+        pass
+
+
+class MemoryDedupStore(DedupStore):
+    """Process local store, keys are kept by insertion order (which is also their expiration order)"""
+
+    def __init__(self, ttl: int, max_keys: int) -> None:
+        super().__init__(ttl, max_keys)
+        self._keys: OrderedDict[str, float] = OrderedDict()
+
+    def _evict(self, now: float):
+        while self._keys and (next(iter(self._keys.values())) <= now or len(self._keys) > self._max_keys):
+            self._keys.popitem(last=False)
+
+    def add_if_absent(self, keys: Iterable[str]) -> bool:
+        now = time.time()
+        self._evict(now)
+        keys = list(keys)
+        if any(key in self._keys for key in keys):
+            return False
+
+        for key in keys:
+            self._keys[key] = now + self._ttl
+        self._evict(now)
+        return True
+
+    def discard(self, keys: Iterable[str]):
+        for key in keys:
+            self._keys.pop(key, None)
+
+
+class SqliteDedupStore(DedupStore):
+    """File based store that can be shared by several processes on the same host"""
+
+    PRUNE_INTERVAL = 100
+
+    def __init__(self, ttl: int, max_keys: int, path: str) -> None:
+        super().__init__(ttl, max_keys)
+        if directory := os.path.dirname(path):
+            os.makedirs(directory, exist_ok=True)
+
+        self._connection = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS dedup (key TEXT PRIMARY KEY, expires_at REAL NOT NULL)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS dedup_expires_at ON dedup (expires_at)")
+        self._inserts = 0
+
+    def _prune(self, now: float):
+        self._connection.execute("DELETE FROM dedup WHERE expires_at <= ?", (now,))
+        self._connection.execute(
+            "DELETE FROM dedup WHERE key IN (SELECT key FROM dedup ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self._max_keys,),
+        )
+
+    def add_if_absent(self, keys: Iterable[str]) -> bool:
+        now = time.time()
+        keys = list(keys)
+        cursor = self._connection.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            placeholders = ",".join("?" * len(keys))
+            cursor.execute(
+                f"SELECT COUNT(*) FROM dedup WHERE key IN ({placeholders}) AND expires_at > ?",
+                (*keys, now),
+            )
+            if cursor.fetchone()[0] > 0:
+                cursor.execute("COMMIT")
+                return False
+
+            cursor.executemany(
+                "INSERT OR REPLACE INTO dedup (key, expires_at) VALUES (?, ?)", [(key, now + self._ttl) for key in keys]
+            )
+            self._inserts += 1
+            if self._inserts % self.PRUNE_INTERVAL == 0:
+                self._prune(now)
+            cursor.execute("COMMIT")
+            return True
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+
+    def discard(self, keys: Iterable[str]):
+        self._connection.executemany("DELETE FROM dedup WHERE key = ?", [(key,) for key in keys])
+
+
+class DedupIndex:
+    """Bounded and time expiring index of the events that were already accepted for handling.
+    Keys are kept in memory, or in a local SQLite file that can be shared between worker processes if a store path is
+    given. The file store calls might wait for the file lock of another process, so they run in a dedicated thread
+    instead of blocking the event loop (and the events acknowledgement)"""
+
+    def __init__(self, ttl: int, max_keys: int, store_path: str = None) -> None:
+        self._executor: ThreadPoolExecutor | None = None
+        if store_path:
+            logger.info(f"Using local dedup store {store_path}")
+            self._store = SqliteDedupStore(ttl, max_keys, store_path)
+            # A single thread, the store connection is used by one call at a time
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dedup-store")
+        else:
+            self._store = MemoryDedupStore(ttl, max_keys)
+
+    async def _call_store(self, method: Callable, *args):
+        if self._executor is None:
+            return method(*args)
+        return await asyncio.get_event_loop().run_in_executor(self._executor, method, *args)
+
+    async def is_duplicate(self, *keys: str, timeout: float = None) -> bool:
+        """Check if one of the given keys was already seen, and if not mark all of them as seen
+        :param timeout: Seconds to wait for the store, the keys are considered new if it doesn't answer in time
+        """
+        if not keys:
+            return False
+
+        try:
+            return not await asyncio.wait_for(self._call_store(self._store.add_if_absent, keys), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Dedup store didn't answer within {timeout} seconds, considering {keys[0]} as new")
+            return False
+
+    async def forget(self, *keys: str):
+        await self._call_store(self._store.discard, keys)
@@ -0,0 +1,43 @@
+from loguru import logger
+from starlette.responses import JSONResponse, Response
+
+from bug_master.bug_master_bot import BugMasterBot
+from bug_master.events.event import Event
+
+
+class ChannelMetadataEvent(Event):
+    """Event that changes the channel metadata, the cached channel info is refreshed once the event arrives"""
+
+    async def get_channel_info(self):
+        if self._channel_id:
+            self._bot.invalidate_channel_info(self._channel_id)
+
+        return await super().get_channel_info()
+
+    async def handle(self, **kwargs) -> Response:
+        logger.info(f"Handling {self.type}, {self._subtype} event on channel {self._channel_id}")
+        return JSONResponse({"msg": "Success", "Code": 200})
+
+
+class ChannelRenameEvent(ChannelMetadataEvent):
+    def __init__(self, body: dict, bot: BugMasterBot) -> None:
+        super().__init__(body, bot)
+        self._channel_id = self._data.get("channel", {}).get("id")
+
+
+class ChannelMemberEvent(ChannelMetadataEvent):
+    """A user joined or left the channel, the cached direct message channels of the user are refreshed as well"""
+
+    async def get_channel_info(self):
+        if self._user_id:
+            self._bot.invalidate_im_channels(self._user_id)
+
+        return await super().get_channel_info()
+
+
+class ImCreatedEvent(ChannelMemberEvent):
+    """A direct message channel was opened with the bot"""
+
+    def __init__(self, body: dict, bot: BugMasterBot) -> None:
+        super().__init__(body, bot)
+        self._channel_id = self._data.get("channel", {}).get("id")
@@ -2,10 +2,10 @@ from loguru import logger
 from starlette.responses import JSONResponse, Response
 
 from bug_master.bug_master_bot import BugMasterBot
-from bug_master.events import Event
+from bug_master.events.channel_events import ChannelMetadataEvent
 
 
-class ChannelJoinEvent(Event):
+class ChannelJoinEvent(ChannelMetadataEvent):
     def __init__(self, body: dict, bot: BugMasterBot) -> None:
         super().__init__(body, bot)
         self._channel_name = self._data.get("name")
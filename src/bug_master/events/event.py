@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import List
 
 from starlette.responses import Response
 
@@ -24,6 +25,11 @@ class BaseEvent(ABC):
     def is_command_message(self):
         return False
 
+    @property
+    def dedup_keys(self) -> List[str]:
+        """Keys that identify the event, an event is handled only if none of its keys was already handled"""
+        return [f"event:{self._event_id}"] if self._event_id else []
+
 
 class Event(BaseEvent, ABC):
     def __init__(self, body: dict, bot: BugMasterBot) -> None:
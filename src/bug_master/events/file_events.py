@@ -32,7 +32,7 @@ class FileChangeEvent(Event):
     async def get_file_info(self):
         if self._file_info:
             return self._file_info
-        self._file_info = await self._bot.get_file_info(self._file_id)
+        self._file_info = await self._bot.get_file_info(self._file_id, use_cache=False)
         return self._file_info
 
     async def _update_channel_info(self):
@@ -65,7 +65,8 @@ class FileDeletedEvent(Event):
         self._file_id = self._data.get("file_id")
 
     async def handle(self, **kwargs) -> Response:
+        self._bot.invalidate_file_info(self._file_id)
         for channel_id in self._channels:
-            self._bot.reset_configuration(channel_id)
+            await self._bot.reset_configuration(channel_id)
 
         return JSONResponse({"msg": "Success", "Code": 200})
@@ -1,3 +1,5 @@
+import asyncio
+import time
 from contextlib import suppress
 from typing import List
 
@@ -10,9 +12,14 @@ from bug_master.channel_message import ChannelMessage
 from bug_master.consts import logger
 from bug_master.entities import Action
 from bug_master.events.event import Event
+from bug_master.metrics import ANALYSIS_LATENCY, PHASE_LATENCY
+from bug_master.prow_job import ProwJobFailure
+from bug_master.tracing import tracer
 
 
 class MessageChannelEvent(Event):
+    MESSAGE_KEY_PREFIX = "message"
+
     def __init__(self, body: dict, bot: BugMasterBot) -> None:
         super().__init__(body, bot)
         self._user = self._data.get("user")
@@ -34,6 +41,19 @@ class MessageChannelEvent(Event):
     def user(self) -> str:
         return self._user
 
+    @property
+    def message_dedup_key(self) -> str | None:
+        return f"{self.MESSAGE_KEY_PREFIX}:{self._channel_id}:{self._ts}" if self._ts else None
+
+    @property
+    def dedup_keys(self) -> List[str]:
+        return super().dedup_keys + ([self.message_dedup_key] if self._ts else [])
+
+    async def forget_message(self):
+        """Let the message be handled again, e.g. when it got no actions because the configuration is missing"""
+        if self._ts:
+            await self._bot.dedup.forget(self.message_dedup_key)
+
     @property
     def is_self_event(self) -> bool:
         if "bot_id" in self._data:
@@ -76,6 +96,7 @@ class MessageChannelEvent(Event):
     async def handle(self, **kwargs) -> Response:
         logger.info(f"Handling {self.type}, {self._subtype} event")
         channel_name = kwargs.get("channel_info", {}).get("name", self.channel_id)
+        self._bot.history.add_message(self._channel_id, self._data)
 
         if await self.skip_event(channel_name):
             return JSONResponse({"msg": "Success", "Code": 200})
@@ -86,26 +107,60 @@ class MessageChannelEvent(Event):
 
         logger.info(f"Handling event {self}")
         if (channel_config := await self._bot.get_channel_configuration(self._channel_id, channel_name)) is None:
+            await self.forget_message()
             return JSONResponse({"msg": "Failure", "Code": 401})
 
         await self._handle_failure_actions(channel_config)
         return JSONResponse({"msg": "Success", "Code": 200})
 
     async def _handle_failure_actions(self, channel_config: ChannelFileConfig):
+        if actions := await self.get_failure_actions(channel_config):
+            with PHASE_LATENCY.labels("report").time(), tracer.span("report", actions=len(actions)):
+                await self.apply_actions(actions)
+        else:
+            await self.forget_message()
+
+        if self._ts:
+            ANALYSIS_LATENCY.labels(self._channel_id).observe(time.time() - float(self._ts))
+
+    async def get_failure_actions(self, channel_config: ChannelFileConfig) -> List[Action]:
+        """Analyze the failure reported by the message, without writing anything to Slack"""
         with suppress(IndexError):
-            actions = await self._message.get_message_actions(channel_config)
-            ignore_others = len([action for action in actions if action.ignore_others]) > 0
-            logger.debug(f"Adding comments={[action.comment for action in actions]}")
-            logger.debug(f"Adding reactions={[action.reaction for action in actions]}")
-            await self.add_reactions([action for action in actions if action.reaction], ignore_others)
-            await self.add_comments([action for action in actions if action.comment], ignore_others)
+            return await self._message.get_message_actions(channel_config)
+        return []
+
+    async def apply_actions(self, actions: List[Action]):
+        """Add the reactions and the comments of the given actions to the message"""
+        ignore_others = len([action for action in actions if action.ignore_others]) > 0
+        logger.debug(f"Adding comments={[action.comment for action in actions]}")
+        logger.debug(f"Adding reactions={[action.reaction for action in actions]}")
+        reactions = [action for action in actions if action.reaction]
+        comments = [action for action in actions if action.comment]
+
+        if consts.COALESCE_COMMENTS:
+            await asyncio.gather(
+                self.add_reactions(reactions, ignore_others, concurrently=True),
+                self.add_coalesced_comments(comments, ignore_others),
+            )
+            return
+
+        await self.add_reactions(reactions, ignore_others)
+        await self.add_comments(comments, ignore_others)
 
     @classmethod
     def filter_ignore_others(cls, actions: List[Action], ignore_others: bool = False):
         prioritized = [action for action in actions if action.ignore_others]
         return prioritized if ignore_others else actions
 
-    async def add_reactions(self, actions: List[Action], ignore_others: bool = False):
+    async def add_reactions(self, actions: List[Action], ignore_others: bool = False, concurrently: bool = False):
+        if concurrently:
+            emojis = dict.fromkeys(
+                action.reaction.emoji for action in self.filter_ignore_others(actions, ignore_others)
+            )
+            logger.debug(f"Adding {len(emojis)} reactions to channel {self._channel_id} for ts {self._ts}")
+            await asyncio.gather(*[self._bot.add_reaction(self._channel_id, emoji, self._ts) for emoji in emojis])
+            return
+
         for action in self.filter_ignore_others(actions, ignore_others):
             logger.debug(f"Adding reactions to channel {self._channel_id} for ts {self._ts}")
             await self._bot.add_reaction(self._channel_id, action.reaction.emoji, self._ts)
@@ -118,3 +173,12 @@ class MessageChannelEvent(Event):
         ):
             logger.debug(f"Adding comment in channel {self._channel_id} for ts {self._ts}")
             await self._bot.add_comment(self._channel_id, action.comment.text, self._ts, action.comment.parse)
+
+    async def add_coalesced_comments(self, actions: List[Action], ignore_others: bool = False):
+        """Post all the comments of the message in a single threaded reply (a reply per parse mode)"""
+        comments = ProwJobFailure.join_comments(
+            [action.comment for action in self.filter_ignore_others(actions, ignore_others)]
+        )
+        for comment in comments:
+            logger.debug(f"Adding coalesced comment in channel {self._channel_id} for ts {self._ts}")
+            await self._bot.add_comment(self._channel_id, comment.text, self._ts, comment.parse)
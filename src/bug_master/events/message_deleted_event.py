@@ -0,0 +1,14 @@
+from loguru import logger
+from starlette.responses import JSONResponse, Response
+
+from bug_master.events.event import Event
+
+
+class MessageDeletedEvent(Event):
+    """A channel message was deleted, it is removed from the local channel history"""
+
+    async def handle(self, **kwargs) -> Response:
+        logger.info(f"Handling {self.type}, {self._subtype} event on channel {self._channel_id}")
+        if deleted_ts := self._data.get("deleted_ts"):
+            self._bot.history.delete_message(self._channel_id, deleted_ts)
+        return JSONResponse({"msg": "Success", "Code": 200})
@@ -1,6 +1,8 @@
+from bug_master.events.channel_events import ChannelMemberEvent, ChannelRenameEvent, ImCreatedEvent
 from bug_master.events.channel_join_event import ChannelJoinEvent
 from bug_master.events.file_events import FileChangeEvent, FileDeletedEvent, FileShareEvent
 from bug_master.events.message_channel_event import MessageChannelEvent
+from bug_master.events.message_deleted_event import MessageDeletedEvent
 from bug_master.events.url_verification_event import UrlVerificationEvent
 
 
@@ -12,6 +14,11 @@ class SupportedEvents:
     FILE_CHANGED_EVENT = "file_change"
     MESSAGE_DELETED_SUBTYPE = "message_deleted"
     FILE_DELETED = "file_deleted"
+    CHANNEL_RENAME = "channel_rename"
+    GROUP_RENAME = "group_rename"
+    MEMBER_JOINED_CHANNEL = "member_joined_channel"
+    MEMBER_LEFT_CHANNEL = "member_left_channel"
+    IM_CREATED = "im_created"
 
     @classmethod
     def get_events_map(cls):
@@ -20,8 +27,14 @@ class SupportedEvents:
             (cls.URL_VERIFICATION, ""): UrlVerificationEvent,
             (cls.MESSAGE_TYPE, cls.FILE_SHARE_SUBTYPE): FileShareEvent,
             (cls.MESSAGE_TYPE, cls.CHANNEL_JOIN_SUBTYPE): ChannelJoinEvent,
+            (cls.MESSAGE_TYPE, cls.MESSAGE_DELETED_SUBTYPE): MessageDeletedEvent,
             (cls.FILE_CHANGED_EVENT, ""): FileChangeEvent,
             (cls.FILE_DELETED, ""): FileDeletedEvent,
+            (cls.CHANNEL_RENAME, ""): ChannelRenameEvent,
+            (cls.GROUP_RENAME, ""): ChannelRenameEvent,
+            (cls.MEMBER_JOINED_CHANNEL, ""): ChannelMemberEvent,
+            (cls.MEMBER_LEFT_CHANNEL, ""): ChannelMemberEvent,
+            (cls.IM_CREATED, ""): ImCreatedEvent,
         }
 
 
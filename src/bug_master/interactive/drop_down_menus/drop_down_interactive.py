@@ -56,17 +56,19 @@ class DropDownInteractive(InteractiveMessage, ABC):
                 "color": cls.color(),
                 "attachment_type": cls.attachment_type(),
                 "callback_id": cls.callback_id() + next_id,
-                "actions": [
-                    {
-                        "name": cls.list_name(),
-                        "text": cls.text_box_info_text(),
-                        "type": cls.action_type(),
-                        "options": await cls._get_options(**kwargs),
-                    }
-                ],
+                "actions": [await cls._get_action(**kwargs)],
             }
         ]
 
+    @classmethod
+    async def _get_action(cls, **kwargs) -> dict:
+        return {
+            "name": cls.list_name(),
+            "text": cls.text_box_info_text(),
+            "type": cls.action_type(),
+            "options": await cls._get_options(**kwargs),
+        }
+
     @classmethod
     def get_new_action(cls, name: str, text: str, type_: str = "select", options: List[str] = None):
         return {
@@ -76,6 +78,11 @@ class DropDownInteractive(InteractiveMessage, ABC):
             "options": options if options is not None else [],
         }
 
+    @classmethod
+    async def get_options(cls, **kwargs) -> List[dict]:
+        """Get the options of the drop down, for menus that load them from an external data source"""
+        return await cls._get_options(**kwargs)
+
     @classmethod
     @abstractmethod
     async def _get_options(cls, **kwargs) -> List[dict]:
@@ -4,10 +4,12 @@ from typing import List
 from bug_master.channel_config_handler import ChannelFileConfig
 from bug_master.consts import logger
 from bug_master.interactive.drop_down_menus.drop_down_interactive import DropDownInteractive
-from bug_master.utils import Utils
+from bug_master.job_names_index import get_channel_jobs_indexes
 
 
 class JobsDropDown(DropDownInteractive):
+    MAX_OPTIONS = 100  # Slack limit for a menu loaded from an external data source
+
     @classmethod
     def list_name(cls) -> str:
         return "jobs_list"
@@ -25,11 +27,28 @@ class JobsDropDown(DropDownInteractive):
         return "jobs_interactive_menu"
 
     @classmethod
-    async def _get_options(cls, channel_config: ChannelFileConfig) -> List[dict]:
-        options = []
-        logger.info(f"Attempting to get jobs prow_configurations: {channel_config.prow_configurations}")
-        for job in await Utils.get_jobs(channel_config.prow_configurations):
-            text = re.split("(?=e2e)", job).pop()
-            options.append({"text": text, "value": job})
-
-        return options
+    def get_channel_id(cls, action_name: str) -> str | None:
+        """Get the channel whose jobs are listed by the menu, from the name of the menu action"""
+        name, _, channel_id = action_name.partition("|")
+        return channel_id if name == cls.list_name() and channel_id else None
+
+    @classmethod
+    async def _get_action(cls, channel_config: ChannelFileConfig, channel_id: str) -> dict:
+        # The menu is posted on the user-bot conversation, so the action name carries the channel the jobs belong to.
+        # Its index is built right away, typing in the menu loads the matching options from it
+        logger.info(f"Indexing jobs prow_configurations: {channel_config.prow_configurations}")
+        await get_channel_jobs_indexes().get_index(channel_id, channel_config.prow_configurations)
+        return {
+            "name": f"{cls.list_name()}|{channel_id}",
+            "text": cls.text_box_info_text(),
+            "type": cls.action_type(),
+            "data_source": "external",
+            "min_query_length": 0,
+        }
+
+    @classmethod
+    async def _get_options(cls, channel_id: str, query: str = "") -> List[dict]:
+        # Options are answered from the index only, within the Slack 3 seconds deadline
+        if (index := get_channel_jobs_indexes().get_loaded_index(channel_id)) is None:
+            return []
+        return [{"text": re.split("(?=e2e)", job).pop(), "value": job} for job in index.search(query, cls.MAX_OPTIONS)]
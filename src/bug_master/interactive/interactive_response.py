@@ -6,6 +6,7 @@ from starlette.responses import JSONResponse
 from bug_master.bug_master_bot import BugMasterBot
 from bug_master.consts import logger
 from bug_master.interactive.interactive_flow_handler import InteractiveFlowHandler
+from bug_master.prow_jobs_index import get_prow_jobs_index
 from bug_master.utils import Utils
 
 
@@ -29,6 +30,10 @@ class InteractiveResponse:
     def actions(self):
         return self._actions
 
+    def is_deferred(self) -> bool:
+        """The final response loads the job history, which might take longer than Slack waits for the response"""
+        return len(self._callback_id.split("-")) <= 1
+
     async def get_next_response(self) -> JSONResponse:
         callback_ids = self._callback_id.split("-")
         next_message = self._original_message
@@ -52,23 +57,18 @@ class InteractiveResponse:
         days, job_name = int(selected_items[0]), selected_items[1]
 
         logger.info(f"Getting job history {self._channel_id} job_name={job_name}")
-        jobs_history = await Utils.get_job_history(job_name)
         date = (datetime.datetime.now() - datetime.timedelta(days=days)).date()
+        since = datetime.datetime.combine(date, datetime.time.min, tzinfo=datetime.timezone.utc).timestamp()
+        jobs_history = await get_prow_jobs_index().get_job_history(job_name, since=since)
+        stats = jobs_history.stats(since=since)
 
-        jobs = []
-        for job in jobs_history:
-            if date <= job.started.date():
-                jobs.append(job)
-
-        succeeded_jobs = [j for j in jobs if j.succeeded]
-        success_rate = 100 * len(succeeded_jobs) / (len(jobs))
         msg = "```"
         msg += ("=" * 8) + f" {re.split('(?=e2e)', job_name).pop()} " + ("=" * 8) + "\n"
         msg += (
-            f" {u'•'} Total jobs failed since {date}: {len(jobs) - len(succeeded_jobs)}\n"
-            f" {u'•'} Total jobs succeeded since {date}: {len(succeeded_jobs)}\n"
-            f" {u'•'} Success rate: {success_rate:.2f}%\n\n"
-            f" Job history can be found here - <{Utils.SPYGLASS_JOB_HISTORY_URL_FMT.format(JOB_NAME=job_name)} | link>"
+            f" {u'•'} Total jobs failed since {date}: {stats.failed}\n"
+            f" {u'•'} Total jobs succeeded since {date}: {stats.succeeded}\n"
+            f" {u'•'} Success rate: {stats.success_rate:.2f}%\n\n"
+            f" Job history can be found here - <{Utils.get_job_history_link(job_name)} | link>"
         )
         msg += "```"
 
@@ -0,0 +1,111 @@
+import bisect
+from array import array
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from itertools import accumulate
+from typing import Dict, Iterable, List, Tuple
+
+from bug_master.utils import JobStatus
+
+
+@dataclass(frozen=True)
+class WindowStats:
+    total: int
+    succeeded: int
+    last_succeeded: bool | None
+    streak: int  # Number of consecutive runs, up to the most recent one, with the same result
+
+    @property
+    def failed(self) -> int:
+        return self.total - self.succeeded
+
+    @property
+    def success_rate(self) -> float:
+        return 100 * self.succeeded / self.total if self.total else 0.0
+
+    @property
+    def last_failed(self) -> bool:
+        return self.last_succeeded is False
+
+
+class JobHistory:
+    """The runs of a job stored in columns, oldest first: build ids, start times (epoch seconds) and results.
+    The running count of the succeeded runs turns every window aggregate (by start time or by last N runs) into a
+    bisect and two lookups, instead of filtering the runs"""
+
+    __slots__ = ("_build_ids", "_started", "_succeeded", "_succeeded_count", "_streak")
+
+    def __init__(self, runs: Iterable[Tuple[str, float, bool]] = ()) -> None:
+        runs = sorted(runs, key=lambda run: run[1])
+        build_ids = [run[0] for run in runs]
+        try:
+            self._build_ids = array("q", map(int, build_ids))
+        except (TypeError, ValueError, OverflowError):
+            self._build_ids = tuple(build_ids)
+
+        self._started = array("d", (run[1] for run in runs))
+        self._succeeded = array("b", (run[2] for run in runs))
+        self._succeeded_count = array("l", accumulate(self._succeeded, initial=0))
+        self._streak = self._get_streak(self._succeeded)
+
+    @classmethod
+    def _get_streak(cls, succeeded: array) -> int:
+        """The number of consecutive runs, up to the most recent one, with the same result"""
+        streak = 0
+        for result in reversed(succeeded):
+            if result != succeeded[-1]:
+                break
+            streak += 1
+        return streak
+
+    @classmethod
+    def from_statuses(cls, statuses: Iterable[JobStatus]) -> "JobHistory":
+        return cls((job.job_id, job.started.timestamp(), job.succeeded) for job in statuses)
+
+    def to_statuses(self) -> List[JobStatus]:
+        """Get the runs newest first"""
+        return [
+            JobStatus(str(build_id), datetime.fromtimestamp(started, timezone.utc), bool(succeeded))
+            for build_id, started, succeeded in zip(
+                reversed(self._build_ids), reversed(self._started), reversed(self._succeeded)
+            )
+        ]
+
+    def __len__(self) -> int:
+        return len(self._started)
+
+    @property
+    def oldest(self) -> float | None:
+        return self._started[0] if self._started else None
+
+    def _window_start(self, since: float = None, runs: int = None) -> int:
+        start = 0
+        if since is not None:
+            start = bisect.bisect_left(self._started, since)
+        if runs is not None:
+            start = max(start, len(self._started) - runs)
+        return start
+
+    def stats(self, since: float = None, runs: int = None) -> WindowStats:
+        """Aggregate the runs that started after since, or the last runs (or both)"""
+        end = len(self._started)
+        start = self._window_start(since, runs)
+        if start >= end:
+            return WindowStats(0, 0, None, 0)
+
+        return WindowStats(
+            total=end - start,
+            succeeded=self._succeeded_count[end] - self._succeeded_count[start],
+            last_succeeded=bool(self._succeeded[-1]),
+            streak=min(self._streak, end - start),
+        )
+
+    def failures(self, since: float = None, runs: int = None) -> int:
+        return self.stats(since, runs).failed
+
+
+class JobHistories(dict):
+    """The histories of many jobs by job name, aggregated together"""
+
+    def stats(self, since: float = None, runs: int = None) -> Dict[str, WindowStats]:
+        return {job_name: history.stats(since, runs) for job_name, history in self.items()}
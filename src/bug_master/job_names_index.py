@@ -0,0 +1,100 @@
+import asyncio
+import re
+from typing import Awaitable, Callable, Dict, Iterable, List, Set, Tuple
+
+from bug_master.consts import logger
+from bug_master.utils import Utils
+
+
+class JobNamesIndex:
+    """Typeahead index of job names. Every prefix of the names tokens maps to the jobs having such token, and every
+    trigram of the names to the jobs containing it, so a query is answered by a lookup (and an intersection of the
+    query trigrams for substring matches) instead of scanning all the jobs"""
+
+    def __init__(self, jobs: Iterable[str]) -> None:
+        self._jobs = sorted(set(jobs))
+        self._names = [job.lower() for job in self._jobs]
+        self._prefixes: Dict[str, List[int]] = {}
+        self._trigrams: Dict[str, Set[int]] = {}
+
+        for i, name in enumerate(self._names):
+            prefixes = {token[:end] for token in re.split(r"[^a-z0-9]+", name) for end in range(1, len(token) + 1)}
+            for prefix in prefixes:
+                self._prefixes.setdefault(prefix, []).append(i)
+            for start in range(len(name) - 2):
+                self._trigrams.setdefault(name[start : start + 3], set()).add(i)
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def search(self, query: str, limit: int) -> List[str]:
+        """Get the jobs having a token that starts with the query, followed by the jobs containing it"""
+        if not (query := query.strip().lower()):
+            return self._jobs[:limit]
+
+        matches = list(self._prefixes.get(query, []))
+        if len(matches) < limit and len(query) >= 3:
+            candidates = set.intersection(
+                *(self._trigrams.get(query[start : start + 3], set()) for start in range(len(query) - 2))
+            )
+            prefix_matches = set(matches)
+            matches += sorted(i for i in candidates if i not in prefix_matches and query in self._names[i])
+
+        return [self._jobs[i] for i in matches[:limit]]
+
+
+class ChannelJobsIndexes:
+    """The job names index of each channel, built from the channel prow configurations jobs. An index is rebuilt only
+    when the jobs of its channel change"""
+
+    def __init__(self) -> None:
+        self._indexes: Dict[str, Tuple[List[str], JobNamesIndex]] = {}
+        self._loads: Dict[str, asyncio.Task] = {}
+
+    def get_loaded_index(self, channel: str) -> JobNamesIndex | None:
+        """Get the index of the channel without building it, None if it wasn't built yet"""
+        if (indexed := self._indexes.get(channel)) is None:
+            return None
+        return indexed[1]
+
+    async def get_index(self, channel: str, prow_configurations: dict) -> JobNamesIndex:
+        jobs = await Utils.get_jobs(prow_configurations)
+        if (indexed := self._indexes.get(channel)) is not None and (indexed[0] is jobs or indexed[0] == jobs):
+            return indexed[1]
+
+        index = JobNamesIndex(jobs)
+        self._indexes[channel] = (jobs, index)
+        logger.info(f"Indexed {len(index)} job names of channel {channel}")
+        return index
+
+    def load_in_background(self, channel: str, get_prow_configurations: Callable[[], Awaitable[dict | None]]):
+        """Build the index of the channel in a background task, once the channel prow configurations are loaded.
+        There is a single load in flight per channel"""
+        if channel in self._loads:
+            return
+
+        async def _load():
+            if prow_configurations := await get_prow_configurations():
+                await self.get_index(channel, prow_configurations)
+
+        def _on_done(task: asyncio.Task):
+            del self._loads[channel]
+            if not task.cancelled() and (e := task.exception()) is not None:
+                logger.error(f"Failed to index job names of channel {channel}, {e.__class__.__name__}: {e}")
+
+        self._loads[channel] = asyncio.get_event_loop().create_task(_load())
+        self._loads[channel].add_done_callback(_on_done)
+
+    def drop(self, channel: str):
+        self._indexes.pop(channel, None)
+
+
+_channel_jobs_indexes: ChannelJobsIndexes | None = None
+
+
+def get_channel_jobs_indexes() -> ChannelJobsIndexes:
+    global _channel_jobs_indexes
+    if _channel_jobs_indexes is None:
+        _channel_jobs_indexes = ChannelJobsIndexes()
+
+    return _channel_jobs_indexes
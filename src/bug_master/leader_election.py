@@ -0,0 +1,75 @@
+import asyncio
+import os
+import socket
+import uuid
+from typing import Awaitable, Callable, List
+
+from bug_master.consts import logger
+from bug_master.state import StateBackend
+
+
+class LeaderElection:
+    """Elect a single process, among all the processes sharing the state backend, to run the background jobs.
+    The leader holds a lease that it renews periodically, if it stops renewing it another process takes over"""
+
+    LEASE_NAME = "leader"
+
+    def __init__(self, backend: StateBackend, lease_ttl: int) -> None:
+        self._backend = backend
+        self._lease_ttl = lease_ttl
+        self._owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._is_leader = False
+        self._jobs: List[Callable[[], Awaitable]] = []
+        self._job_tasks: List[asyncio.Task] = []
+        self._task: asyncio.Task | None = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._is_leader
+
+    @property
+    def owner(self) -> str:
+        """The id of this process in the election, the term of its leadership when it is elected"""
+        return self._owner
+
+    def add_job(self, job: Callable[[], Awaitable]):
+        """Register a background job, started when this process is elected and cancelled if it loses the lease"""
+        self._jobs.append(job)
+
+    def start(self):
+        self._task = asyncio.get_event_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        await self._stop_jobs()
+        if self._is_leader:
+            await self._backend.release_lease(self.LEASE_NAME, self._owner)
+            self._is_leader = False
+
+    async def _stop_jobs(self):
+        for task in self._job_tasks:
+            task.cancel()
+        await asyncio.gather(*self._job_tasks, return_exceptions=True)
+        self._job_tasks = []
+
+    async def _run(self):
+        while True:
+            try:
+                is_leader = await self._backend.acquire_lease(self.LEASE_NAME, self._owner, self._lease_ttl)
+            except Exception as e:
+                logger.error(f"Failed to acquire leader lease, {e.__class__.__name__}: {e}")
+                is_leader = False
+
+            if is_leader and not self._is_leader:
+                logger.info(f"Elected as leader ({self._owner}), starting {len(self._jobs)} background jobs")
+                self._job_tasks = [asyncio.get_event_loop().create_task(job()) for job in self._jobs]
+            elif self._is_leader and not is_leader:
+                logger.warning(f"Lost leadership ({self._owner}), stopping background jobs")
+                await self._stop_jobs()
+
+            self._is_leader = is_leader
+            await asyncio.sleep(self._lease_ttl / 3)
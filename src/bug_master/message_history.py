@@ -0,0 +1,349 @@
+import asyncio
+import bisect
+import json
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Tuple
+
+from bug_master.consts import logger
+
+# (channel, limit, cursor, oldest, latest) -> (messages, next cursor)
+FetchMessages = Callable[[str, int, str | None, float, float | None], Awaitable[Tuple[List[dict], str | None]]]
+
+
+@dataclass
+class SyncState:
+    """The range of the channel history that is mirrored, all the messages with oldest <= ts <= latest are stored"""
+
+    oldest: float
+    latest: float
+    synced_at: float
+
+
+class MessageStore(ABC):
+    @abstractmethod
+    def get_sync(self, channel: str) -> SyncState | None:
+        pass
+
+    @abstractmethod
+    def set_sync(self, channel: str, sync: SyncState):
+        pass
+
+    @abstractmethod
+    def add(self, channel: str, messages: Iterable[dict], sync: SyncState = None):
+        """Add or replace the given messages, and set the channel sync state along with them if given"""
+        pass
+
+    @abstractmethod
+    def get(self, channel: str, ts: str) -> dict | None:
+        pass
+
+    @abstractmethod
+    def delete(self, channel: str, ts: str):
+        pass
+
+    @abstractmethod
+    def list(self, channel: str, since: float = 0, limit: int = None, before: float = None) -> List[dict]:
+        """Get the messages newer than since and older than before, newest first"""
+        pass
+
+    @abstractmethod
+    def prune(self, channel: str, before: float) -> int:
+        """Delete the messages older than before
+        :return: The number of deleted messages
+        """
+        pass
+
+    @abstractmethod
+    def drop(self, channel: str):
+        pass
+
+
+class MemoryMessageStore(MessageStore):
+    """Process local store, the messages of each channel are indexed by ts in a sorted list. Each channel keeps at
+    most max_messages messages, the oldest are dropped (and the mirrored range shrinks) when a message is added"""
+
+    def __init__(self, max_messages: int = None) -> None:
+        self._max_messages = max_messages
+        self._syncs: Dict[str, SyncState] = {}
+        self._messages: Dict[str, Dict[str, dict]] = {}
+        self._index: Dict[str, List[Tuple[float, str]]] = {}
+
+    def get_sync(self, channel: str) -> SyncState | None:
+        return self._syncs.get(channel)
+
+    def set_sync(self, channel: str, sync: SyncState):
+        self._syncs[channel] = sync
+
+    def add(self, channel: str, messages: Iterable[dict], sync: SyncState = None):
+        if sync is not None:
+            self._syncs[channel] = sync
+
+        stored = self._messages.setdefault(channel, {})
+        index = self._index.setdefault(channel, [])
+        for message in messages:
+            if message["ts"] not in stored:
+                bisect.insort(index, (float(message["ts"]), message["ts"]))
+            stored[message["ts"]] = message
+
+        if self._max_messages is not None and (excess := len(index) - self._max_messages) > 0:
+            for _, ts in index[:excess]:
+                del stored[ts]
+            del index[:excess]
+            if (channel_sync := self._syncs.get(channel)) is not None:
+                channel_sync.oldest = max(channel_sync.oldest, index[0][0])
+
+    def get(self, channel: str, ts: str) -> dict | None:
+        return self._messages.get(channel, {}).get(ts)
+
+    def delete(self, channel: str, ts: str):
+        if self._messages.get(channel, {}).pop(ts, None) is not None:
+            self._index[channel].remove((float(ts), ts))
+
+    def list(self, channel: str, since: float = 0, limit: int = None, before: float = None) -> List[dict]:
+        index = self._index.get(channel, [])
+        start = bisect.bisect_right(index, since, key=lambda item: item[0])
+        end = len(index) if before is None else bisect.bisect_left(index, before, key=lambda item: item[0])
+        if limit is not None:
+            start = max(start, end - limit)
+        return [self._messages[channel][ts] for _, ts in reversed(index[start:end])]
+
+    def prune(self, channel: str, before: float) -> int:
+        index = self._index.get(channel, [])
+        end = bisect.bisect_left(index, before, key=lambda item: item[0])
+        for _, ts in index[:end]:
+            self._messages[channel].pop(ts, None)
+        del index[:end]
+        return end
+
+    def drop(self, channel: str):
+        self._syncs.pop(channel, None)
+        self._messages.pop(channel, None)
+        self._index.pop(channel, None)
+
+
+class SqliteMessageStore(MessageStore):
+    """File based store that can be shared by several processes on the same host"""
+
+    def __init__(self, path: str) -> None:
+        if directory := os.path.dirname(path):
+            os.makedirs(directory, exist_ok=True)
+
+        self._connection = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS messages "
+            "(channel TEXT NOT NULL, ts TEXT NOT NULL, ts_num REAL NOT NULL, message TEXT NOT NULL, "
+            "PRIMARY KEY (channel, ts))"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS messages_channel_ts ON messages (channel, ts_num)")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS message_syncs "
+            "(channel TEXT PRIMARY KEY, oldest REAL NOT NULL, latest REAL NOT NULL, synced_at REAL NOT NULL)"
+        )
+
+    def get_sync(self, channel: str) -> SyncState | None:
+        row = self._connection.execute(
+            "SELECT oldest, latest, synced_at FROM message_syncs WHERE channel = ?", (channel,)
+        ).fetchone()
+        return SyncState(*row) if row else None
+
+    def set_sync(self, channel: str, sync: SyncState):
+        self._connection.execute(
+            "INSERT OR REPLACE INTO message_syncs (channel, oldest, latest, synced_at) VALUES (?, ?, ?, ?)",
+            (channel, sync.oldest, sync.latest, sync.synced_at),
+        )
+
+    def add(self, channel: str, messages: Iterable[dict], sync: SyncState = None):
+        cursor = self._connection.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            cursor.executemany(
+                "INSERT OR REPLACE INTO messages (channel, ts, ts_num, message) VALUES (?, ?, ?, ?)",
+                [(channel, m["ts"], float(m["ts"]), json.dumps(m)) for m in messages],
+            )
+            if sync is not None:
+                cursor.execute(
+                    "INSERT OR REPLACE INTO message_syncs (channel, oldest, latest, synced_at) VALUES (?, ?, ?, ?)",
+                    (channel, sync.oldest, sync.latest, sync.synced_at),
+                )
+            cursor.execute("COMMIT")
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+
+    def get(self, channel: str, ts: str) -> dict | None:
+        row = self._connection.execute(
+            "SELECT message FROM messages WHERE channel = ? AND ts = ?", (channel, ts)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def delete(self, channel: str, ts: str):
+        self._connection.execute("DELETE FROM messages WHERE channel = ? AND ts = ?", (channel, ts))
+
+    def list(self, channel: str, since: float = 0, limit: int = None, before: float = None) -> List[dict]:
+        rows = self._connection.execute(
+            "SELECT message FROM messages WHERE channel = ? AND ts_num > ? AND ts_num < ? "
+            "ORDER BY ts_num DESC LIMIT ?",
+            (channel, since, float("inf") if before is None else before, -1 if limit is None else limit),
+        )
+        return [json.loads(message) for message, in rows]
+
+    def prune(self, channel: str, before: float) -> int:
+        return self._connection.execute(
+            "DELETE FROM messages WHERE channel = ? AND ts_num < ?", (channel, before)
+        ).rowcount
+
+    def drop(self, channel: str):
+        self._connection.execute("DELETE FROM messages WHERE channel = ?", (channel,))
+        self._connection.execute("DELETE FROM message_syncs WHERE channel = ?", (channel,))
+
+
+class MessageHistory:
+    """Local mirror of the channels history. A channel is mirrored the first time its history is read, and then kept
+    up to date by the live message events and by fetching only the messages newer than the last sync. Reading older
+    messages than the mirrored range backfills it page by page, as the read reaches them.
+    Messages are kept in memory (at most max_messages per channel), or in a local SQLite file that can be shared
+    between worker processes if a store path is given"""
+
+    def __init__(
+        self,
+        fetch: FetchMessages,
+        store_path: str = None,
+        page_size: int = 1000,
+        max_staleness: int = 60,
+        retention: int = 90 * 24 * 60 * 60,
+        max_messages: int = 10000,
+    ) -> None:
+        if store_path:
+            logger.info(f"Using local message history store {store_path}")
+            self._store = SqliteMessageStore(store_path)
+        else:
+            self._store = MemoryMessageStore(max_messages)
+
+        self._fetch_page = fetch
+        self._page_size = page_size
+        self._max_staleness = max_staleness
+        self._retention = retention
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def _lock(self, channel: str) -> asyncio.Lock:
+        return self._locks.setdefault(channel, asyncio.Lock())
+
+    async def get_messages(self, channel: str, since: float = 0, limit: int = None) -> AsyncIterator[List[dict]]:
+        """Iterate over the channel messages newer than since (or the newest limit messages) in pages, newest first.
+        The pages are read from the mirror one at a time, older messages than the mirrored range are fetched when
+        the iteration reaches them"""
+        since = max(since, time.time() - self._retention)
+        async with self._lock(channel):
+            await self._sync(channel)
+
+        before = None
+        done = False
+        while limit is None or limit > 0:
+            size = self._page_size if limit is None else min(self._page_size, limit)
+            if not (page := self._store.list(channel, since, size, before)):
+                if done:
+                    return
+                async with self._lock(channel):
+                    page, done = await self._backfill(channel, since, size, before)
+                if not page:
+                    return
+
+            yield page
+            before = float(page[-1]["ts"])
+            if limit is not None:
+                limit -= len(page)
+
+    async def _fetch(self, channel: str, oldest: float) -> List[dict]:
+        """Fetch all the messages newer than oldest, newest first"""
+        messages = []
+        cursor = None
+        while True:
+            page, cursor = await self._fetch_page(channel, self._page_size, cursor, oldest, None)
+            messages += page
+            if not cursor or not page:
+                return messages
+
+    async def _sync(self, channel: str):
+        """Mirror the newest page of a channel that is read for the first time, or fetch the messages newer than the
+        last sync if the mirror is stale"""
+        now = time.time()
+        cutoff = now - self._retention
+        if (sync := self._store.get_sync(channel)) is None:
+            messages, cursor = await self._fetch_page(channel, self._page_size, None, cutoff, None)
+            timestamps = [float(m["ts"]) for m in messages]
+            sync = SyncState(
+                oldest=cutoff if not cursor or not messages else min(timestamps),
+                latest=max(timestamps, default=cutoff),
+                synced_at=now,
+            )
+            self._store.add(channel, messages, sync)
+            logger.debug(f"Mirrored {len(messages)} messages of channel {channel}")
+        elif now - sync.synced_at >= self._max_staleness:
+            messages = await self._fetch(channel, sync.latest)
+            sync.latest = max([sync.latest] + [float(m["ts"]) for m in messages])
+            sync.synced_at = now
+            self._store.add(channel, messages, sync)
+            logger.debug(f"Synced {len(messages)} new messages of channel {channel}")
+
+        if sync.oldest < cutoff and self._store.prune(channel, cutoff) > 0:
+            sync.oldest = cutoff
+            self._store.set_sync(channel, sync)
+
+    async def _backfill(self, channel: str, since: float, limit: int, before: float | None) -> Tuple[List[dict], bool]:
+        """Get the next page of messages older than before that aren't mirrored yet. Another read might have
+        backfilled them meanwhile, otherwise the page is fetched and mirrored if it extends the mirrored range
+        :return: The page, and whether there are no older messages to read
+        """
+        if page := self._store.list(channel, since, limit, before):
+            return page, False
+
+        if (sync := self._store.get_sync(channel)) is None or sync.oldest <= since:
+            return [], True  # All mirrored, or the channel was dropped meanwhile
+
+        latest = sync.oldest if before is None else min(before, sync.oldest)
+        page, cursor = await self._fetch_page(channel, limit, None, since, latest)
+        if (sync := self._store.get_sync(channel)) is not None and sync.oldest == latest:
+            sync.oldest = since if not cursor or not page else min(float(m["ts"]) for m in page)
+            self._store.add(channel, page, sync)
+            logger.debug(f"Backfilled {len(page)} messages of channel {channel}")
+        return page, not cursor or not page
+
+    def _update(self, channel: str, ts: str, update: Callable[[dict], None]):
+        if (message := self._store.get(channel, ts)) is not None:
+            update(message)
+            self._store.add(channel, [message])
+
+    def add_message(self, channel: str, message: dict):
+        """Add a message that arrived by a live event, only mirrored channels are updated"""
+        if message.get("ts") and self._store.get_sync(channel) is not None:
+            self._store.add(channel, [message])
+
+    def delete_message(self, channel: str, ts: str):
+        self._store.delete(channel, ts)
+
+    def add_reaction(self, channel: str, ts: str, emoji: str, user: str):
+        def update(message: dict):
+            reactions = message.setdefault("reactions", [])
+            if (reaction := next((r for r in reactions if r.get("name") == emoji), None)) is None:
+                reactions.append(reaction := {"name": emoji, "users": [], "count": 0})
+            if user not in reaction["users"]:
+                reaction["users"].append(user)
+                reaction["count"] = reaction.get("count", 0) + 1
+
+        self._update(channel, ts, update)
+
+    def add_reply(self, channel: str, ts: str, user: str):
+        def update(message: dict):
+            message["reply_count"] = message.get("reply_count", 0) + 1
+            if user not in (reply_users := message.setdefault("reply_users", [])):
+                reply_users.append(user)
+
+        self._update(channel, ts, update)
+
+    def drop(self, channel: str):
+        self._store.drop(channel)
@@ -0,0 +1,55 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Tuple
+
+from bug_master.async_cache import register_cache
+
+
+class MetadataCache:
+    """Bounded, time expiring cache of Slack metadata that rarely changes (channels info, files info, users DM
+    channels). Entries are invalidated by the Slack events that change them"""
+
+    def __init__(self, name: str, ttl: int, max_size: int) -> None:
+        self._name = name
+        self._ttl = ttl
+        self._max_size = max_size
+        self._entries: OrderedDict[Hashable, Tuple[float, Any]] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        register_cache(self)
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def get(self, key: Hashable) -> Any:
+        if (entry := self._entries.get(key)) is None or entry[0] <= time.monotonic():
+            if self._entries.pop(key, None) is not None:
+                self._expirations += 1
+            self._misses += 1
+            return None
+
+        self._hits += 1
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic() + self._ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def invalidate(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self._hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+            "expirations": self._expirations,
+        }
@@ -0,0 +1,110 @@
+from typing import Callable, Dict, Iterator
+
+from prometheus_client import REGISTRY, Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, Metric
+from prometheus_client.registry import Collector
+
+from bug_master.async_cache import get_caches_stats
+
+FAST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SLOW_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+EVENT_ACK_LATENCY = Histogram(
+    "bugmaster_event_ack_seconds", "Time to acknowledge a Slack event", ["ingestion"], buckets=FAST_BUCKETS
+)
+SOCKET_MODE_ACK_LATENCY = Histogram(
+    "bugmaster_socket_mode_ack_seconds", "Time to acknowledge a Socket Mode envelope", ["type"], buckets=FAST_BUCKETS
+)
+OPTIONS_LATENCY = Histogram(
+    "bugmaster_options_seconds", "Time to answer a menu options request", ["ingestion"], buckets=FAST_BUCKETS
+)
+ANALYSIS_LATENCY = Histogram(
+    "bugmaster_analysis_seconds",
+    "Time from a job failure message being posted to its reactions and comments being added",
+    ["channel"],
+    buckets=SLOW_BUCKETS,
+)
+PHASE_LATENCY = Histogram(
+    "bugmaster_analysis_phase_seconds",
+    "Duration of the job failure analysis phases (load, set_job_steps, rules, report)",
+    ["phase"],
+    buckets=SLOW_BUCKETS,
+)
+ARTIFACT_FETCH_LATENCY = Histogram(
+    "bugmaster_artifact_fetch_seconds", "Duration of the artifacts and files downloads", ["host"], buckets=FAST_BUCKETS
+)
+ARTIFACT_FETCH_BYTES = Counter("bugmaster_artifact_fetch_bytes", "Size of the downloaded artifacts and files", ["host"])
+SLACK_API_LATENCY = Histogram(
+    "bugmaster_slack_api_seconds", "Duration of the Slack Web API calls", ["method"], buckets=FAST_BUCKETS
+)
+SLACK_API_RATE_LIMITED = Counter("bugmaster_slack_api_rate_limited", "Rate limited Slack Web API calls", ["method"])
+
+
+class StatsCollector(Collector):
+    """Export the stats the components already keep (caches, task queue and schedulers) when metrics are scraped"""
+
+    def __init__(
+        self,
+        task_queue_stats: Callable[[], Dict[str, dict]],
+        work_scheduler_stats: Callable[[], dict],
+        slack_scheduler_stats: Callable[[], dict],
+    ) -> None:
+        self._task_queue_stats = task_queue_stats
+        self._work_scheduler_stats = work_scheduler_stats
+        self._slack_scheduler_stats = slack_scheduler_stats
+
+    @classmethod
+    def _collect_caches(cls) -> Iterator[Metric]:
+        gauges = {
+            key: GaugeMetricFamily(f"bugmaster_cache_{key}", f"Cache {key.replace('_', ' ')}", labels=["cache"])
+            for key in ("entries", "bytes", "max_bytes", "hit_ratio")
+        }
+        counters = {
+            key: CounterMetricFamily(f"bugmaster_cache_{key}", f"Cache {key.replace('_', ' ')}", labels=["cache"])
+            for key in ("hits", "stale_hits", "misses", "evictions", "expirations")
+        }
+
+        for name, stats in get_caches_stats().items():
+            for key, counter in counters.items():
+                counter.add_metric([name], stats.get(key, 0))
+            for key in ("entries", "bytes", "max_bytes"):
+                if stats.get(key) is not None:
+                    gauges[key].add_metric([name], stats[key])
+
+            hits = stats["hits"] + stats.get("stale_hits", 0)
+            gauges["hit_ratio"].add_metric([name], hits / (hits + stats["misses"]) if hits + stats["misses"] else 0.0)
+
+        yield from gauges.values()
+        yield from counters.values()
+
+    def _collect_tasks(self) -> Iterator[Metric]:
+        depth = GaugeMetricFamily("bugmaster_task_queue_depth", "Tasks waiting in the queue", labels=["kind"])
+        busy = GaugeMetricFamily("bugmaster_task_queue_in_flight", "Tasks being handled", labels=["kind"])
+        for kind, stats in self._task_queue_stats().items():
+            depth.add_metric([kind], stats["depth"])
+            busy.add_metric([kind], stats["busy_workers"])
+        yield from (depth, busy)
+
+        work_stats = self._work_scheduler_stats()
+        queued = GaugeMetricFamily("bugmaster_work_queued", "Channel work waiting to run", labels=["priority"])
+        running = GaugeMetricFamily("bugmaster_work_in_flight", "Channel work running", labels=["priority"])
+        for priority, count in work_stats["queued"].items():
+            queued.add_metric([priority], count)
+        for priority, count in work_stats["running"].items():
+            running.add_metric([priority], count)
+        yield from (queued, running)
+
+        slack_queued = GaugeMetricFamily(
+            "bugmaster_slack_api_queued", "Slack Web API calls waiting for their rate limit", labels=["priority"]
+        )
+        for priority, count in self._slack_scheduler_stats()["queued"].items():
+            slack_queued.add_metric([priority], count)
+        yield slack_queued
+
+    def collect(self) -> Iterator[Metric]:
+        yield from self._collect_caches()
+        yield from self._collect_tasks()
+
+
+def register_stats_collector(collector: StatsCollector):
+    REGISTRY.register(collector)
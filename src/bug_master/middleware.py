@@ -1,3 +1,4 @@
+import time
 from typing import Callable
 
 from fastapi.routing import APIRoute
@@ -10,6 +11,9 @@ from bug_master import consts
 
 _signature_verifier = SignatureVerifier(consts.SIGNING_SECRET)
 
+# Routes that are not called by Slack (e.g. probes, metrics scraping) and therefore are not signed
+UNSIGNED_ROUTES = ("/live", "/ready", "/metrics")
+
 
 class SlackRequest(Request):
     async def body(self) -> bytes:
@@ -45,8 +49,17 @@ async def validate_request(request):
     return body, headers
 
 
+def get_received_at(request: Request) -> float:
+    """The monotonic time the request was received at, before its signature was verified"""
+    return request.scope.get("received_at", time.monotonic())
+
+
 async def exceptions_middleware(request: Request, call_next: RequestResponseEndpoint) -> Response:
+    request.scope["received_at"] = time.monotonic()
     try:
+        if request.url.path in UNSIGNED_ROUTES:
+            return await call_next(request)
+
         body, headers = await validate_request(request)
 
         if headers is None:
@@ -0,0 +1,70 @@
+import asyncio
+import time
+from typing import Callable
+
+from bug_master.bug_master_bot import BugMasterBot
+from bug_master.consts import logger
+from bug_master.slack_scheduler import Priority, slack_priority
+
+
+class ProgressReporter:
+    """Post a single message and keep it updated with the partial results of a long running command.
+    Updates are throttled to one chat.update call per interval, intermediate progress is skipped and only the latest
+    one is rendered and sent"""
+
+    def __init__(self, bot: BugMasterBot, channel: str, interval: float = 3) -> None:
+        self._bot = bot
+        self._channel = channel
+        self._interval = interval
+        self._ts = None
+        self._render: Callable[[], str] | None = None
+        self._last_update = 0.0
+        self._flush_task: asyncio.Task | None = None
+
+    async def start(self, text: str):
+        try:
+            with slack_priority(Priority.INTERACTIVE):
+                res = await self._bot.add_comment(self._channel, text)
+        except Exception as e:
+            logger.warning(f"Failed to post progress message on {self._channel}, {e}")
+            return
+
+        # Posting to a user id opens a direct message, updates must target the actual channel
+        self._channel = res.get("channel", self._channel)
+        self._ts = res.get("ts")
+        self._last_update = time.monotonic()
+
+    def update(self, render: Callable[[], str]):
+        """Report progress, render is called to get the message text only when the update is sent"""
+        self._render = render
+        if self._flush_task is None and self._ts is not None:
+            self._flush_task = asyncio.get_event_loop().create_task(self._flush())
+
+    async def _flush(self):
+        await asyncio.sleep(max(self._last_update + self._interval - time.monotonic(), 0))
+        self._flush_task = None
+        render, self._render = self._render, None
+        if render is not None:
+            await self._send(render())
+
+    async def finish(self, text: str):
+        """Send the final message, the pending progress update (if any) is dropped"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        self._render = None
+
+        if self._ts is None:
+            with slack_priority(Priority.INTERACTIVE):
+                await self._bot.add_comment(self._channel, text)
+            return
+
+        await self._send(text)
+
+    async def _send(self, text: str):
+        self._last_update = time.monotonic()
+        try:
+            with slack_priority(Priority.INTERACTIVE):
+                await self._bot.update_comment(self._channel, text, self._ts)
+        except Exception as e:
+            logger.warning(f"Failed to update progress message {self._ts} on {self._channel}, {e}")
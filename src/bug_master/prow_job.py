@@ -1,16 +1,20 @@
 import json
 from dataclasses import dataclass
-from datetime import datetime, timedelta
-from typing import List, Optional, Set, Tuple, Union
+from datetime import datetime, time, timedelta, timezone
+from typing import Iterable, List, Optional, Tuple, Union
 from urllib.parse import urljoin
 
 from bs4 import BeautifulSoup
-from cache import AsyncTTL
 
 from bug_master import consts
+from bug_master.async_cache import async_cache
 from bug_master.channel_config_handler import ChannelFileConfig
 from bug_master.consts import logger
 from bug_master.entities import Action, Comment, CommentType, Reaction
+from bug_master.metrics import PHASE_LATENCY
+from bug_master.prow_jobs_index import get_prow_jobs_index
+from bug_master.state import shared_cache
+from bug_master.tracing import tracer
 from bug_master.utils import Utils
 
 
@@ -98,7 +102,11 @@ class ProwJobFailure:
     def build_id(self):
         return self._resource.build_id
 
-    # @AsyncTTL(time_to_live=86400, maxsize=1024, skip_args=1)
+    @property
+    def cache_key(self) -> str:
+        """Identify the job run in the cached methods arguments"""
+        return self._raw_link
+
     async def get_content(self, file_path: str, storage_link: str) -> Union[str, None]:
         if not file_path:
             return None
@@ -112,7 +120,7 @@ class ProwJobFailure:
 
         return None
 
-    @AsyncTTL(time_to_live=86400, maxsize=1024, skip_args=1)
+    @async_cache(ttl=86400, max_bytes=consts.FILES_GRID_CACHE_MAX_BYTES, max_entries=1024)
     async def _parse_files_grid(self, dir_path: str, build_id: str) -> List[Tuple[str, int]] | None:
         dir_content = await self.get_content(
             dir_path,
@@ -147,8 +155,18 @@ class ProwJobFailure:
 
         return files
 
-    @AsyncTTL(time_to_live=86400, maxsize=1024, skip_args=1)
+    @async_cache(ttl=86400, max_bytes=consts.GLOB_CACHE_MAX_BYTES, max_entries=1024)
+    @shared_cache(
+        "glob_results",
+        ttl=86400,
+        key=lambda self, dir_path, result: json.dumps([self.job_name, self.build_id, dir_path, result], sort_keys=True),
+        decode=tuple,
+    )
     async def glob(self, dir_path: str, result: dict) -> Tuple[Optional[str], Optional[str]]:
+        with tracer.span("glob", dir_path=dir_path):
+            return await self._glob(dir_path, result)
+
+    async def _glob(self, dir_path: str, result: dict) -> Tuple[Optional[str], Optional[str]]:
         if dir_path.endswith("*"):
             dir_path = dir_path[:-1]
 
@@ -282,9 +300,21 @@ class ProwJobFailure:
             actions.append(action)
 
     @classmethod
-    def _join_comments(cls, comments: Set[Comment]) -> Comment:
-        comment_text = "\n".join([comment.text for comment in sorted(comments, key=lambda c: c.type.value)])
-        return Comment(text=comment_text, type=CommentType.ERROR_INFO, parse="all")
+    def join_comments(cls, comments: Iterable[Comment]) -> List[Comment]:
+        """Join the given comments, ordered by their type, into as few comments as possible.
+        Slack parses each message with a single parse mode, so only consecutive comments that share the same parse
+        mode are joined together"""
+        groups: List[List[Comment]] = []
+        for comment in sorted(dict.fromkeys(comments), key=lambda c: c.type.value, reverse=True):
+            if groups and groups[-1][-1].parse == comment.parse:
+                groups[-1].append(comment)
+            else:
+                groups.append([comment])
+
+        return [
+            Comment(text="\n".join([comment.text for comment in group]), type=group[0].type, parse=group[0].parse)
+            for group in groups
+        ]
 
     async def _get_job_actions(self, channel_config: ChannelFileConfig, filter_id: str = None) -> List[Action]:
         """
@@ -362,7 +392,8 @@ class ProwJobFailure:
             f"{resource.build_id}/",
         )
         self._resource = resource
-        await self._set_job_steps()
+        with PHASE_LATENCY.labels("set_job_steps").time(), tracer.span("set_job_steps"):
+            await self._set_job_steps()
         return self
 
     async def _set_job_steps(self):
@@ -383,9 +414,11 @@ class ProwJobFailure:
         self._job_steps = {t[0]: t[1] for t in sorted(job_steps.items(), key=lambda tup: tup[1].get("timestamp"))}
 
     async def get_generic_action(self):
-        jobs_history = await Utils.get_job_history(self._resource.full_name)
-        last_seven_jobs = [j for j in jobs_history if (datetime.now() - timedelta(days=7)).date() <= j.started.date()]
-        last_three_jobs = [j for j in jobs_history if (datetime.now() - timedelta(days=3)).date() <= j.started.date()]
+        last_seven_days, last_three_days = (
+            datetime.combine((datetime.now() - timedelta(days=days)).date(), time.min, tzinfo=timezone.utc).timestamp()
+            for days in (7, 3)
+        )
+        jobs_history = await get_prow_jobs_index().get_job_history(self._resource.full_name, since=last_seven_days)
 
         msg = f"<{self._raw_link} | {('=' * 3)} {self._resource.name} {('=' * 3)}>\n"
         msg += (
@@ -394,9 +427,9 @@ class ProwJobFailure:
             f"{await self.get_cluster_formatted_links()}"
             f" \n*History:*\n"
             f"``` {u'•'} Number of job failures in the last 3 days: "
-            f"{len([j for j in last_three_jobs if not j.succeeded])}\n"
+            f"{jobs_history.failures(since=last_three_days)}\n"
             f" {u'•'} Number of job failures in the last 7 days: "
-            f"{len([j for j in last_seven_jobs if not j.succeeded])}```\n"
+            f"{jobs_history.failures(since=last_seven_days)}```\n"
             f" Job history can be found <{Utils.get_job_history_link(self._resource.full_name)} | *_here_*>\n"
         )
         msg += "\n"
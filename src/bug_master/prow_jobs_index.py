@@ -0,0 +1,124 @@
+import asyncio
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+import aiohttp
+from aiohttp import ClientTimeout
+
+from bug_master import consts
+from bug_master.consts import logger
+from bug_master.job_history import JobHistories, JobHistory
+from bug_master.refresh import RefreshingCache, refresh_scheduler
+from bug_master.utils import Utils
+
+FINISHED_STATES = ("success", "failure", "aborted", "error")
+
+
+@dataclass
+class ProwJobsSnapshot:
+    """The recent runs of all the periodic jobs. Prow garbage collects old runs, so the snapshot only covers the runs
+    that started after oldest (epoch seconds)"""
+
+    jobs: Dict[str, JobHistory] = field(default_factory=dict)
+    oldest: float | None = None
+
+    def get_history(self, job_name: str, runs: int = None, since: float = None) -> JobHistory | None:
+        """Get the job history if the snapshot covers its last runs, or its runs that started after since.
+        :return: The job history, or None if the snapshot doesn't cover the requested window
+        """
+        if self.oldest is None:
+            return None
+
+        history = self.jobs.get(job_name, JobHistory())
+        if since is not None:
+            return history if since >= self.oldest else None
+
+        return history if runs is None or len(history) >= runs else None
+
+    def get_histories(
+        self, job_names: Iterable[str], runs: int = None, since: float = None
+    ) -> Tuple[JobHistories, List[str]]:
+        """Get the histories of all the jobs the snapshot covers for the requested window.
+        :return: The covered jobs histories, and the names of the jobs that aren't covered
+        """
+        histories, uncovered = JobHistories(), []
+        for job_name in job_names:
+            if (history := self.get_history(job_name, runs, since)) is None:
+                uncovered.append(job_name)
+            else:
+                histories[job_name] = history
+        return histories, uncovered
+
+
+class ProwJobsIndex:
+    """Index of the recent periodic jobs runs by job name, built from a single fetch of the Prow jobs listing
+    (prowjobs.js) instead of a job history page per job. The listing is reloaded in the background once it is older
+    than the ttl"""
+
+    def __init__(self, url: str, ttl: int, timeout: int) -> None:
+        self._url = url
+        self._timeout = timeout
+        self._snapshots = RefreshingCache("prow_jobs", self._fetch, ttl, key=lambda: self._url)
+        refresh_scheduler.register(self._snapshots)
+
+    @classmethod
+    def _parse(cls, data: dict) -> ProwJobsSnapshot:
+        oldest = None
+        runs: Dict[str, List[Tuple[str, float, bool]]] = {}
+        for prow_job in data.get("items", []):
+            spec, status = prow_job.get("spec", {}), prow_job.get("status", {})
+            if spec.get("type") != "periodic" or not status.get("startTime"):
+                continue
+
+            started = datetime.fromisoformat(status["startTime"]).timestamp()
+            oldest = min(oldest or started, started)
+            if status.get("state") in FINISHED_STATES:
+                runs.setdefault(spec.get("job"), []).append(
+                    (status.get("build_id"), started, status["state"] == "success")
+                )
+
+        return ProwJobsSnapshot({job_name: JobHistory(job_runs) for job_name, job_runs in runs.items()}, oldest)
+
+    @classmethod
+    def _load(cls, raw: bytes) -> ProwJobsSnapshot:
+        return cls._parse(json.loads(raw))
+
+    async def _fetch(self) -> ProwJobsSnapshot:
+        logger.info(f"Loading Prow jobs listing {self._url}")
+        async with aiohttp.ClientSession(timeout=ClientTimeout(total=self._timeout)) as session:
+            async with session.get(self._url) as resp:
+                resp.raise_for_status()
+                raw = await resp.read()
+
+        # The listing is several MBs, it is decoded and parsed in a thread so the event loop keeps serving requests
+        snapshot = await asyncio.get_event_loop().run_in_executor(None, self._load, raw)
+
+        logger.info(f"Loaded {sum(map(len, snapshot.jobs.values()))} runs of {len(snapshot.jobs)} periodic jobs")
+        return snapshot
+
+    async def get_snapshot(self) -> ProwJobsSnapshot:
+        try:
+            return await self._snapshots.get()
+        except Exception:
+            return ProwJobsSnapshot()  # Failure was logged, the job history pages are used until it's loaded
+
+    async def get_job_history(self, job_name: str, runs: int = None, since: float = None) -> JobHistory:
+        """Get the job history covering its last runs, or its runs that started after since (epoch seconds). Falls back
+        to the job history page if the window isn't covered by the Prow jobs listing"""
+        if (history := (await self.get_snapshot()).get_history(job_name, runs, since)) is not None:
+            return history
+
+        return JobHistory.from_statuses(await Utils.get_job_history(job_name))
+
+
+_prow_jobs_index: ProwJobsIndex | None = None
+
+
+def get_prow_jobs_index() -> ProwJobsIndex:
+    global _prow_jobs_index
+    if _prow_jobs_index is None:
+        _prow_jobs_index = ProwJobsIndex(consts.PROW_JOBS_URL, consts.PROW_JOBS_TTL, consts.PROW_JOBS_TIMEOUT)
+
+    return _prow_jobs_index
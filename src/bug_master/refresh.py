@@ -0,0 +1,223 @@
+import asyncio
+import functools
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+
+from bug_master import consts
+from bug_master.async_cache import estimate_size, get_caches_stats, make_key, register_cache
+from bug_master.async_pool import AsyncPool
+from bug_master.consts import logger
+
+
+@dataclass
+class _Entry:
+    key: Hashable
+    args: tuple
+    kwargs: dict
+    value: Any = None
+    loaded_at: float | None = None
+    accessed_at: float = field(default_factory=time.monotonic)
+    failed_at: float | None = None
+    error: Exception | None = None
+    load: asyncio.Task | None = None
+    size: int = 0
+
+
+class RefreshingCache:
+    """Stale-while-revalidate cache of an async function. A value older than the ttl is still returned right away
+    while it is reloaded in the background, readers wait for a load only if there is no value or it is older than
+    max_stale. Loads are single-flight, and a failed load is retried only after retry_interval, until then readers get
+    the last good value (or the load error if there is none). If max_bytes is set, the least recently read values are
+    evicted once the cached values size exceeds it"""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[..., Awaitable],
+        ttl: float,
+        max_stale: float = None,
+        key: Callable[..., Hashable] = None,
+        retry_interval: float = 30,
+        max_bytes: int = None,
+    ) -> None:
+        self._name = name
+        self._func = func
+        self._ttl = ttl
+        self._max_stale = max_stale if max_stale is not None else 4 * ttl
+        self._key = key or make_key
+        self._retry_interval = retry_interval
+        self._max_bytes = max_bytes
+        self._entries: Dict[Hashable, _Entry] = {}
+        self._bytes = 0
+        self._hits = 0
+        self._stale_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        register_cache(self)
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def ttl(self) -> float:
+        return self._ttl
+
+    def _is_usable(self, entry: _Entry, now: float) -> bool:
+        return entry.loaded_at is not None and now - entry.loaded_at < self._max_stale
+
+    async def _load(self, entry: _Entry):
+        try:
+            entry.value = await self._func(*entry.args, **entry.kwargs)
+            entry.loaded_at = time.monotonic()
+            entry.failed_at, entry.error = None, None
+            self._resize(entry, estimate_size(entry.value))
+        except Exception as e:
+            logger.warning(f"Failed to load {self._name} {entry.key}, {e.__class__.__name__}: {e}")
+            entry.failed_at, entry.error = time.monotonic(), e
+        finally:
+            entry.load = None
+
+    def _resize(self, entry: _Entry, size: int):
+        self._bytes += size - entry.size
+        entry.size = size
+        if self._max_bytes is None or self._bytes <= self._max_bytes:
+            return
+
+        # The value that was just loaded is kept even if it doesn't fit by itself
+        for evicted in sorted(self._entries.values(), key=lambda e: e.accessed_at):
+            if self._bytes <= self._max_bytes:
+                break
+            if evicted is not entry and evicted.load is None:
+                self._drop(evicted)
+                self._evictions += 1
+
+    def _drop(self, entry: _Entry):
+        del self._entries[entry.key]
+        self._bytes -= entry.size
+
+    def _start_load(self, entry: _Entry) -> asyncio.Task:
+        if entry.load is None:
+            entry.load = asyncio.get_event_loop().create_task(self._load(entry))
+        return entry.load
+
+    def _can_retry(self, entry: _Entry, now: float) -> bool:
+        return entry.failed_at is None or now - entry.failed_at >= self._retry_interval
+
+    async def get(self, *args, **kwargs):
+        now = time.monotonic()
+        key = self._key(*args, **kwargs)
+        if (entry := self._entries.get(key)) is None:
+            entry = self._entries[key] = _Entry(key, args, kwargs)
+        entry.accessed_at = now
+
+        if self._is_usable(entry, now):
+            if now - entry.loaded_at >= self._ttl:
+                self._stale_hits += 1
+                if self._can_retry(entry, now):
+                    self._start_load(entry)
+            else:
+                self._hits += 1
+            return entry.value
+
+        if entry.load is not None or self._can_retry(entry, now):
+            self._misses += 1
+            await asyncio.shield(self._start_load(entry))
+            if self._is_usable(entry, time.monotonic()):
+                return entry.value
+
+        raise entry.error
+
+    def get_due(self, now: float, jitter: float, idle_ttl: float) -> List[_Entry]:
+        """Get the entries that should be refreshed ahead of their expiration (jittered, so the refreshes are spread),
+        entries that weren't read for idle_ttl are dropped instead"""
+        for entry in [entry for entry in self._entries.values() if now - entry.accessed_at >= idle_ttl]:
+            if entry.load is None:
+                self._drop(entry)
+                self._expirations += 1
+
+        return [
+            entry
+            for entry in self._entries.values()
+            if entry.load is None
+            and self._can_retry(entry, now)
+            and (entry.loaded_at is None or now - entry.loaded_at >= self._ttl * (1 - jitter * random.random()))
+        ]
+
+    async def refresh(self, entry: _Entry):
+        await asyncio.shield(self._start_load(entry))
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self._max_bytes,
+            "hits": self._hits,
+            "stale_hits": self._stale_hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+            "expirations": self._expirations,
+        }
+
+
+class RefreshScheduler:
+    """Refresh the cached values that are still being read before they expire, so readers rarely get a stale value and
+    never wait for a load. Refreshes run every interval (jittered) with a bounded concurrency, by the elected leader
+    process only. The other processes reload their stale values on read, from the shared state the leader refreshed"""
+
+    def __init__(self, interval: float, concurrency: int, jitter: float, idle_ttl: float) -> None:
+        self._interval = interval
+        self._concurrency = concurrency
+        self._jitter = jitter
+        self._idle_ttl = idle_ttl
+        self._caches: List[RefreshingCache] = []
+
+    def register(self, cache: RefreshingCache):
+        self._caches.append(cache)
+
+    async def refresh_due(self):
+        now = time.monotonic()
+        due = [(cache, entry) for cache in self._caches for entry in cache.get_due(now, self._jitter, self._idle_ttl)]
+        if not due:
+            return
+
+        pool = AsyncPool(self._concurrency)
+        await pool.run(lambda item: item[0].refresh(item[1]), due)
+        logger.debug(f"Refreshed {len(due)} cached values, caches stats: {get_caches_stats()}")
+
+    async def run(self):
+        """Refresh the due values every interval, until cancelled"""
+        while True:
+            await asyncio.sleep(self._interval * (1 + self._jitter * random.uniform(-1, 1)))
+            try:
+                await self.refresh_due()
+            except Exception as e:
+                logger.error(f"Failed to refresh cached values, {e.__class__.__name__}: {e}")
+
+
+refresh_scheduler = RefreshScheduler(
+    consts.REFRESH_INTERVAL, consts.REFRESH_CONCURRENCY, consts.REFRESH_JITTER, consts.REFRESH_IDLE_TTL
+)
+
+
+def refreshing_cache(ttl: float, max_stale: float = None, key: Callable[..., Hashable] = None, max_bytes: int = None):
+    """Cache the results of an async function with stale-while-revalidate, and keep them warm with the refresh
+    scheduler while they are being read
+    :param key: Get the cache key from the function arguments, by default arguments are converted with make_key
+    """
+
+    def decorator(func: Callable[..., Awaitable]):
+        cache = RefreshingCache(func.__qualname__, func, ttl, max_stale, key, max_bytes=max_bytes)
+        refresh_scheduler.register(cache)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await cache.get(*args, **kwargs)
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
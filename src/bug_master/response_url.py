@@ -0,0 +1,29 @@
+import json
+
+import aiohttp
+from starlette.responses import Response
+
+from bug_master.consts import logger
+
+
+async def respond(
+    session: aiohttp.ClientSession, response_url: str, response: Response, replace_original: bool = False
+):
+    """Deliver the response of a request that was already acknowledged using the request response_url. The response
+    type (ephemeral or in_channel) of the response body is kept, empty responses are not delivered
+    :param session: The bot shared HTTP session, the response is posted over one of its pooled connections
+    """
+    if not response.body:
+        return
+
+    if not response_url:
+        logger.warning("Can't respond, missing response url")
+        return
+
+    body = json.loads(response.body)
+    if replace_original:
+        body["replace_original"] = True
+
+    async with session.post(response_url, json=body) as resp:
+        if resp.status != 200:
+            logger.error(f"Failed to respond to {response_url}, status {resp.status}")
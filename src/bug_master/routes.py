@@ -1,33 +1,42 @@
-import asyncio
+import hmac
 import json
+import time
 from typing import Tuple, Union
-from urllib.parse import parse_qs
+from urllib.parse import parse_qs, urlencode
 
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from starlette.requests import Request
 from starlette.responses import JSONResponse, Response
 
+from bug_master import consts
 from bug_master.app import app, bot, commands_handler, events_handler
 from bug_master.commands import Command, NotSupportedCommandError
 from bug_master.consts import logger
 from bug_master.events import Event, UrlVerificationEvent
-from bug_master.interactive import InteractiveResponse
+from bug_master.interactive import InteractiveResponse, JobsDropDown
+from bug_master.job_names_index import get_channel_jobs_indexes
+from bug_master.metrics import EVENT_ACK_LATENCY, OPTIONS_LATENCY
+from bug_master.middleware import get_received_at
+from bug_master.response_url import respond
+from bug_master.sharding import FORWARDED_HEADER
+from bug_master.slack_scheduler import Priority, slack_priority
+from bug_master.task_queue import Task
+from bug_master.tracing import tracer
 
 
 class RouteValidator:
     @classmethod
-    async def validate_event_request(cls, request) -> Tuple[Union[Event, None], Union[Response, None]]:
-        body = await request.body()
+    async def validate_event_body(cls, body: dict, is_retry: bool) -> Tuple[Union[Event, None], Union[Response, None]]:
+        event = await events_handler.get_event(body)
 
-        event = await events_handler.get_event(await request.json())  # json.loads(body)
-
-        if event is None or request.headers.get("x-slack-retry-num", False):
+        if event is None or is_retry:
             logger.info(f"Skipping duplicate or unsupported event: {event}")
             return None, JSONResponse({"msg": "Success", "Code": 200})
 
         if isinstance(event, UrlVerificationEvent):
             logger.info("Url verification event - success")
             return None, JSONResponse(
-                content=json.dumps({"challenge": json.loads(body).get("challenge", "")}),
+                content=json.dumps({"challenge": body.get("challenge", "")}),
                 status_code=200,
                 media_type="application/json",
             )
@@ -36,23 +45,187 @@ class RouteValidator:
             logger.info(f"Skipping command message event {event}")
             return None, JSONResponse({"msg": "Success", "Code": 200})
 
+        if await bot.dedup.is_duplicate(*event.dedup_keys, timeout=consts.DEDUP_ACK_TIMEOUT):
+            logger.info(f"Skipping already handled event {event}")
+            return None, JSONResponse({"msg": "Success", "Code": 200})
+
         return event, None
 
 
-async def handle_event_exception(event: Event, **kwargs):
+async def handle_event_exception(event: Event, is_last_attempt: bool = True, **kwargs):
     try:
         await event.handle(**kwargs)
     except Exception as e:
         base_err = "Got error while handled event: "
         logger.error(f"{{{event}}} {base_err}, {e.__class__.__name__} {e}")
+        if not is_last_attempt:
+            raise  # The event task is retried, the user is notified only if the last attempt fails
+
         if event.user_id:
             err = f"{base_err}\n```{{{event}}}```\n" f"Error:\n```{e.__class__.__name__}: {e}```"
             await bot.add_comment(event.user_id, err)
 
 
+async def handle_event_task(task: Task):
+    if (event := await events_handler.get_event(task.payload)) is None:
+        return
+
+    if not (channel_info := await event.get_channel_info()):
+        logger.error(f"Invalid event {event}, {event._data}")
+        return
+
+    with tracer.trace("event", type=event.type, channel=event.channel_id, attempt=task.attempts):
+        await bot.work_scheduler.run(
+            event.channel_id,
+            Priority.LIVE,
+            handle_event_exception,
+            event,
+            is_last_attempt=task.is_last_attempt,
+            channel_info=channel_info,
+        )
+
+
+async def handle_command_task(task: Task):
+    """Run the background part of a long running command"""
+    command = await commands_handler.get_command(task.payload["body"])
+    with tracer.trace("command_task", command=command.command(), channel=task.payload["body"].get("channel_id")):
+        await command.run_task(**task.payload["kwargs"])
+
+
+async def handle_response_task(task: Task):
+    """Build the response of a deferred request and deliver it through the request response_url"""
+    payload = task.payload["payload"]
+    if task.payload["type"] == "command":
+        response = await handle_command_exception(await commands_handler.get_command(payload))
+        await respond(bot.session, payload.get("response_url"), response)
+    else:
+        with slack_priority(Priority.INTERACTIVE), tracer.trace("interactive", callback_id=payload.get("callback_id")):
+            response = await InteractiveResponse(bot, payload).get_next_response()
+        await respond(bot.session, payload.get("response_url"), response, replace_original=True)
+
+
+async def defer_response(type_: str, payload: dict) -> Response | None:
+    """Acknowledge the request right away, its response is built by a worker and delivered through its response_url.
+    :return: The acknowledgement, or None if the request can't be deferred and should be answered directly
+    """
+    if not payload.get("response_url"):
+        return None
+
+    if not await bot.task_queue.submit("response", {"type": type_, "payload": payload}):
+        return Command.get_response("BugMaster is too busy right now, please try again in a few minutes.")
+
+    return Response(status_code=200)
+
+
+async def route_to_owner(channel: str, path: str, body: bytes, content_type: str) -> Response | None:
+    """Forward, or drop, work of a channel owned by another replica.
+    :return: The response to return, or None if the work should be done by this replica
+    """
+    if bot.shards.is_owner(channel):
+        return None
+
+    if bot.shards.drop_not_owned:
+        bot.shards.drop(channel)
+        return JSONResponse({"msg": "Success", "Code": 200})
+
+    return await bot.shards.forward(channel, path, body, content_type)
+
+
+async def accept_event(body: dict, is_retry: bool = False, forwarded: bool = False) -> Response:
+    """Validate the event and enqueue it for handling"""
+    event, response = await RouteValidator.validate_event_body(body, is_retry)
+    if event is None:
+        return response
+
+    if not forwarded and (
+        response := await route_to_owner(
+            event.channel_id, "/slack/events", json.dumps(body).encode(), "application/json"
+        )
+    ):
+        return response
+
+    logger.debug(f"Got new event - {event}")
+    if not await bot.task_queue.submit("event", body):
+        await bot.dedup.forget(*event.dedup_keys)
+        return JSONResponse({"msg": "Failure", "Code": 503}, status_code=503)
+
+    return JSONResponse({"msg": "Success", "Code": 200})
+
+
+async def handle_command_body(body: dict, forwarded: bool = False) -> Response:
+    if not forwarded and (
+        response := await route_to_owner(
+            body.get("channel_id"), "/slack/commands", urlencode(body).encode(), "application/x-www-form-urlencoded"
+        )
+    ):
+        return response
+
+    try:
+        command = await commands_handler.get_command(body)
+    except NotSupportedCommandError as e:
+        logger.warning(f"Failed to get command, {e.command}")
+        return Command.get_response(f"{e.message}")
+
+    if command.is_deferred() and (response := await defer_response("command", body)):
+        return response
+
+    return await handle_command_exception(command)
+
+
+async def handle_interactive_payload(payload: dict, forwarded: bool = False) -> Response:
+    if not forwarded and (
+        response := await route_to_owner(
+            (payload.get("channel") or {}).get("id"),
+            "/slack/interactive",
+            urlencode({"payload": json.dumps(payload)}).encode(),
+            "application/x-www-form-urlencoded",
+        )
+    ):
+        return response
+
+    logger.debug(f"Getting next response {payload}")
+    interactive_response = InteractiveResponse(bot, payload)
+    if interactive_response.is_deferred() and (response := await defer_response("interactive", payload)):
+        return response
+
+    with slack_priority(Priority.INTERACTIVE), tracer.trace("interactive", callback_id=payload.get("callback_id")):
+        return await interactive_response.get_next_response()
+
+
+async def handle_options_payload(payload: dict, forwarded: bool = False) -> Response:
+    """Get the options of a drop down that loads them from an external data source, matching the typed value"""
+    if (channel := JobsDropDown.get_channel_id(payload.get("name", ""))) is None:
+        logger.warning(f"Unsupported options request for {payload.get('name')}")
+        return JSONResponse({"options": []})
+
+    if not forwarded and (
+        response := await route_to_owner(
+            channel,
+            "/slack/options",
+            urlencode({"payload": json.dumps(payload)}).encode(),
+            "application/x-www-form-urlencoded",
+        )
+    ):
+        return response
+
+    if get_channel_jobs_indexes().get_loaded_index(channel) is None:
+        # E.g. the menu was posted before a restart, the index is built in the background for the next requests
+        get_channel_jobs_indexes().load_in_background(channel, lambda: get_prow_configurations(channel))
+        return JSONResponse({"options": []})
+
+    options = await JobsDropDown.get_options(channel_id=channel, query=payload.get("value", ""))
+    return JSONResponse({"options": options})
+
+
+async def get_prow_configurations(channel: str) -> dict | None:
+    config = await bot.get_channel_configuration(channel, channel, notify=False)
+    return config.prow_configurations if config else None
+
+
 async def handle_command_exception(command: Command) -> Response:
     try:
-        return await command.handle()
+        with slack_priority(Priority.INTERACTIVE), tracer.trace("command", command=command.command()):
+            return await command.handle()
     except Exception as e:
         err = f"Got error while handled command {{{command}}}, {e.__class__.__name__} {e}"
         logger.error(err)
@@ -61,19 +234,42 @@ async def handle_command_exception(command: Command) -> Response:
     return command.get_response_with_command("Internal server error. See BugMaster private chat for more information.")
 
 
-@app.post("/slack/events")
-async def events(request: Request):
-    event, response = await RouteValidator.validate_event_request(request)
-    if event is None:
-        return response
+@app.get("/live")
+async def live():
+    return JSONResponse({"msg": "Alive", "Code": 200})
 
-    logger.debug(f"Got new event - {event}")
-    if not (channel_info := await event.get_channel_info()):
-        logger.error(f"Invalid event {event}, {event._data}")
-        return JSONResponse({"msg": "Failure", "Code": 401})
 
-    asyncio.get_event_loop().create_task(handle_event_exception(event, channel_info=channel_info))
-    return JSONResponse({"msg": "Success", "Code": 200})
+@app.get("/ready")
+async def ready():
+    if not await bot.is_ready():
+        return JSONResponse({"msg": "Warming up", "Code": 503}, status_code=503)
+
+    return JSONResponse({"msg": "Ready", "Code": 200})
+
+
+@app.get("/metrics")
+async def metrics(request: Request):
+    """Prometheus metrics, the route isn't signed by Slack so it is protected by the METRICS_TOKEN bearer token"""
+    if not consts.METRICS_TOKEN:
+        return JSONResponse({"msg": "Metrics are disabled", "Code": 404}, status_code=404)
+
+    authorization = request.headers.get("authorization", "").encode()
+    if not hmac.compare_digest(authorization, f"Bearer {consts.METRICS_TOKEN}".encode()):
+        return JSONResponse({"msg": "Unauthorized", "Code": 401}, status_code=401)
+
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.post("/slack/events")
+async def events(request: Request):
+    received_at = get_received_at(request)
+    response = await accept_event(
+        await request.json(),
+        bool(request.headers.get("x-slack-retry-num")),
+        forwarded=bool(request.headers.get(FORWARDED_HEADER)),
+    )
+    EVENT_ACK_LATENCY.labels("webhook").observe(time.monotonic() - received_at)
+    return response
 
 
 @app.post("/slack/commands/{command}")
@@ -85,13 +281,8 @@ async def commands(request: Request, command: str = None):
     body = {k.decode(): v.pop().decode() for k, v in parse_qs(raw_body).items()}
     if command:
         body["text"] = command
-    try:
-        command = await commands_handler.get_command(body)
-    except NotSupportedCommandError as e:
-        logger.warning(f"Failed to get command, {e.command}")
-        return Command.get_response(f"{e.message}")
 
-    return await handle_command_exception(command)
+    return await handle_command_body(body, forwarded=bool(request.headers.get(FORWARDED_HEADER)))
 
 
 @app.post("/slack/interactive")
@@ -101,8 +292,18 @@ async def interactive(request: Request):
     raw_body = await request.body()
     payload = {k.decode(): json.loads(v.pop().decode()) for k, v in parse_qs(raw_body).items()}.get("payload")
 
-    logger.debug(f"Getting next response {payload}")
-    return await InteractiveResponse(bot, payload).get_next_response()
+    return await handle_interactive_payload(payload, forwarded=bool(request.headers.get(FORWARDED_HEADER)))
+
+
+@app.post("/slack/options")
+async def options(request: Request):
+    received_at = get_received_at(request)
+    raw_body = await request.body()
+    payload = {k.decode(): json.loads(v.pop().decode()) for k, v in parse_qs(raw_body).items()}.get("payload")
+
+    response = await handle_options_payload(payload, forwarded=bool(request.headers.get(FORWARDED_HEADER)))
+    OPTIONS_LATENCY.labels("webhook").observe(time.monotonic() - received_at)
+    return response
 
 
 def init_routes():
@@ -0,0 +1,180 @@
+import asyncio
+import bisect
+import hashlib
+import time
+from typing import Awaitable, Callable, List, Set, Tuple
+
+import aiohttp
+from aiohttp import ClientTimeout
+from slack_sdk.signature import SignatureVerifier
+from starlette.responses import Response
+
+from bug_master.consts import logger
+
+FORWARDED_HEADER = "x-bug-master-forwarded"
+
+
+class HashRing:
+    """Consistent hash ring, each member is placed on the ring several times (virtual nodes) so the keys are spread
+    evenly and only the keys of a member that joins or leaves move to another member"""
+
+    def __init__(self, members: Set[str], vnodes: int = 100) -> None:
+        self._members = frozenset(members)
+        self._ring: List[Tuple[int, str]] = sorted(
+            (self._hash(f"{member}#{i}"), member) for member in members for i in range(vnodes)
+        )
+        self._hashes = [h for h, _ in self._ring]
+
+    @property
+    def members(self) -> frozenset:
+        return self._members
+
+    @classmethod
+    def _hash(cls, key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+    def owner(self, key: str) -> str | None:
+        if not self._ring:
+            return None
+
+        index = bisect.bisect(self._hashes, self._hash(key)) % len(self._ring)
+        return self._ring[index][1]
+
+
+class ShardRouter:
+    """Shard the channels between the bot replicas. Each channel is owned by one live replica, the owner handles its
+    events and commands and keeps its configuration and caches hot, the other replicas forward (or drop) its work.
+    Replicas are health checked (liveness, a warming up replica keeps its channels) periodically, the ring is rebuilt
+    when a replica joins or leaves. Forwarding is bounded by forward_timeout, so the request can still be handled
+    locally within the Slack 3 seconds acknowledgement deadline if the owner doesn't answer in time"""
+
+    def __init__(
+        self,
+        self_url: str,
+        replicas: List[str],
+        signing_secret: str,
+        mode: str = "forward",
+        check_interval: int = 10,
+        check_timeout: float = 5,
+        forward_timeout: float = 1.5,
+    ) -> None:
+        self._self_url = self_url
+        self._replicas = set(replicas) | {self_url} if replicas else {self_url}
+        self._verifier = SignatureVerifier(signing_secret)
+        self._mode = mode
+        self._check_interval = check_interval
+        self._check_timeout = ClientTimeout(total=check_timeout)
+        self._forward_timeout = ClientTimeout(total=forward_timeout)
+        self._ring = HashRing(self._replicas)
+        self._listeners: List[Callable[[], Awaitable]] = []
+        self._session: aiohttp.ClientSession | None = None
+        self._task: asyncio.Task | None = None
+        self._forwarded = 0
+        self._dropped = 0
+        self._forward_failures = 0
+
+    @property
+    def is_sharded(self) -> bool:
+        return len(self._replicas) > 1
+
+    @property
+    def drop_not_owned(self) -> bool:
+        return self._mode == "drop"
+
+    def add_rebalance_listener(self, listener: Callable[[], Awaitable]):
+        """Called after the ring was rebuilt, when the live replicas changed"""
+        self._listeners.append(listener)
+
+    def owner(self, channel: str) -> str:
+        return self._ring.owner(channel) or self._self_url
+
+    def is_owner(self, channel: str | None) -> bool:
+        return not channel or not self.is_sharded or self.owner(channel) == self._self_url
+
+    async def start(self):
+        if not self.is_sharded:
+            return
+
+        self._session = aiohttp.ClientSession()
+        self._ring = HashRing(await self._get_alive_replicas())
+        self._task = asyncio.get_event_loop().create_task(self._check_members())
+        logger.info(f"Sharding channels between replicas {sorted(self._ring.members)} ({self._self_url} is this one)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        if self._session is not None:
+            await self._session.close()
+
+    async def _is_alive(self, url: str) -> bool:
+        if url == self._self_url:
+            return True
+
+        try:
+            async with self._session.get(f"{url}/live", timeout=self._check_timeout) as resp:
+                return resp.status == 200
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return False
+
+    async def _get_alive_replicas(self) -> Set[str]:
+        replicas = sorted(self._replicas)
+        alive = await asyncio.gather(*[self._is_alive(url) for url in replicas])
+        return {url for url, is_alive in zip(replicas, alive) if is_alive}
+
+    async def _update_members(self):
+        if (members := await self._get_alive_replicas()) == self._ring.members:
+            return
+
+        logger.info(f"Replicas changed from {sorted(self._ring.members)} to {sorted(members)}, rebalancing channels")
+        self._ring = HashRing(members)
+        for listener in self._listeners:
+            try:
+                await listener()
+            except Exception as e:
+                logger.error(f"Failed to rebalance, {e.__class__.__name__}: {e}")
+
+    async def _check_members(self):
+        while True:
+            await asyncio.sleep(self._check_interval)
+            await self._update_members()
+
+    def drop(self, channel: str):
+        self._dropped += 1
+        logger.debug(f"Dropping work of channel {channel} owned by {self.owner(channel)}")
+
+    async def forward(self, channel: str, path: str, body: bytes, content_type: str) -> Response | None:
+        """Forward a request to the owner of the channel, signed like Slack does so the owner can verify it.
+        :return: The owner response, or None if the owner couldn't be reached and the work should be done locally
+        """
+        url = self.owner(channel)
+        timestamp = str(int(time.time()))
+        headers = {
+            "Content-Type": content_type,
+            "X-Slack-Request-Timestamp": timestamp,
+            "X-Slack-Signature": self._verifier.generate_signature(timestamp=timestamp, body=body),
+            FORWARDED_HEADER: self._self_url,
+        }
+        try:
+            async with self._session.post(
+                f"{url}{path}", data=body, headers=headers, timeout=self._forward_timeout
+            ) as resp:
+                content = await resp.read()
+                if resp.status >= 500:
+                    raise aiohttp.ClientResponseError(resp.request_info, resp.history, status=resp.status)
+
+                self._forwarded += 1
+                return Response(content, status_code=resp.status, media_type=resp.content_type)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self._forward_failures += 1
+            logger.warning(f"Failed to forward {path} of channel {channel} to {url}, handling locally. {e}")
+            return None
+
+    def stats(self) -> dict:
+        return {
+            "replicas": len(self._replicas),
+            "members": len(self._ring.members),
+            "forwarded": self._forwarded,
+            "dropped": self._dropped,
+            "forward_failures": self._forward_failures,
+        }
@@ -0,0 +1,211 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Awaitable, Callable, Dict, Hashable, List, Tuple
+
+from slack_sdk.errors import SlackApiError
+
+from bug_master.consts import logger
+from bug_master.metrics import SLACK_API_LATENCY, SLACK_API_RATE_LIMITED
+from bug_master.stats import LatencyStats
+from bug_master.tracing import tracer
+
+
+class Priority(IntEnum):
+    """Outbound Slack calls priority lanes, lower value is served first"""
+
+    LIVE = 0
+    INTERACTIVE = 1
+    BULK = 2
+
+
+_priority: ContextVar[Priority] = ContextVar("slack_priority", default=Priority.LIVE)
+
+
+@contextmanager
+def slack_priority(priority: Priority):
+    """Set the priority of all the Slack calls made in the current context (and tasks created from it)"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def set_slack_priority(priority: Priority):
+    """Set the priority of all the Slack calls made by the current task from now on"""
+    _priority.set(priority)
+
+
+class TokenBucket:
+    """Token bucket that hands its tokens to the waiters by priority (FIFO within the same priority)"""
+
+    def __init__(self, rate_per_minute: int, burst: int) -> None:
+        self._rate = rate_per_minute / 60
+        self._capacity = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+        self._timer: asyncio.TimerHandle | None = None
+
+    def pause(self, seconds: float):
+        """Stop handing tokens for the given amount of seconds (e.g. after getting Retry-After from Slack)"""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+    async def acquire(self, priority: Priority):
+        future = asyncio.get_event_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        self._dispatch()
+        await future
+
+    def _refill(self, now: float):
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        now = time.monotonic()
+        self._refill(now)
+
+        while self._waiters and now >= self._blocked_until:
+            if self._waiters[0][2].done():  # Cancelled waiter
+                heapq.heappop(self._waiters)
+                continue
+
+            if self._tokens < 1:
+                break
+
+            self._tokens -= 1
+            heapq.heappop(self._waiters)[2].set_result(None)
+
+        if self._waiters:
+            delay = max(self._blocked_until - now, (1 - self._tokens) / self._rate, 0)
+            self._timer = asyncio.get_event_loop().call_later(delay, self._dispatch)
+
+
+class SlackScheduler:
+    """Schedule outbound Slack Web API calls.
+    Each Slack method has its own token bucket sized by its rate limit tier, calls are served by priority lanes and
+    calls that share the same ordering key (e.g. a thread) are sent in the order they were submitted.
+    See https://api.slack.com/docs/rate-limits
+    """
+
+    MAX_RATE_LIMITED_RETRIES = 5
+    DEFAULT_RETRY_AFTER = 1
+
+    # Requests per minute allowed for each method of a tier, "special" tier methods are limited per channel
+    TIERS_RATE = {"tier1": 1, "tier2": 20, "tier3": 50, "tier4": 100, "special": 60}
+    METHODS_TIER = {
+        "auth.test": "tier4",
+        "chat.postMessage": "special",
+        "chat.postEphemeral": "tier4",
+        "chat.update": "tier3",
+        "conversations.history": "tier3",
+        "conversations.info": "tier3",
+        "files.info": "tier4",
+        "files.list": "tier3",
+        "reactions.add": "tier3",
+        "users.conversations": "tier3",
+    }
+    DEFAULT_TIER = "tier3"
+
+    def __init__(self) -> None:
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._last_ordered_call: Dict[Hashable, asyncio.Future] = {}
+        self._queued = {p: 0 for p in Priority}
+        self._wait_time = {p: LatencyStats() for p in Priority}
+        self._rate_limited: Dict[str, int] = {}
+
+    def _get_bucket(self, method: str, channel: str = None) -> TokenBucket:
+        """Slack rate limits apply per method (and per channel for the special tier), sized by the method tier"""
+        tier = self.METHODS_TIER.get(method, self.DEFAULT_TIER)
+        key = f"{method}:{channel}" if tier == "special" else method
+        if (bucket := self._buckets.get(key)) is None:
+            rate = self.TIERS_RATE[tier]
+            bucket = self._buckets[key] = TokenBucket(rate, burst=max(1, rate // 6))
+        return bucket
+
+    @classmethod
+    def _get_retry_after(cls, e: SlackApiError) -> float:
+        headers = {k.lower(): v for k, v in (getattr(e.response, "headers", None) or {}).items()}
+        try:
+            return float(headers.get("retry-after", cls.DEFAULT_RETRY_AFTER))
+        except (TypeError, ValueError):
+            return cls.DEFAULT_RETRY_AFTER
+
+    async def call(
+        self,
+        method: str,
+        func: Callable[..., Awaitable],
+        ordering_key: Hashable = None,
+        **kwargs,
+    ):
+        """Call func(**kwargs), a Slack Web API method, once its method bucket allows it.
+        :param method: Slack API method name, e.g. chat.postMessage
+        :param func: The web client method to call
+        :param ordering_key: Calls with the same key are sent by their submission order
+        """
+        priority = _priority.get()
+        enqueued_at = time.monotonic()
+        previous = None
+        done = None
+
+        if ordering_key is not None:
+            previous = self._last_ordered_call.get(ordering_key)
+            done = self._last_ordered_call[ordering_key] = asyncio.get_event_loop().create_future()
+
+        self._queued[priority] += 1
+        dispatched = False
+        with tracer.span("slack", method=method) as span:
+            try:
+                if previous is not None:
+                    await asyncio.wait({previous})
+
+                bucket = self._get_bucket(method, kwargs.get("channel"))
+                for attempt in range(self.MAX_RATE_LIMITED_RETRIES + 1):
+                    await bucket.acquire(priority)
+                    if not dispatched:
+                        dispatched = True
+                        self._queued[priority] -= 1
+                        self._wait_time[priority].record(wait_time := time.monotonic() - enqueued_at)
+                        if span is not None:
+                            span.set_attribute("wait", f"{wait_time * 1000:.0f}ms")
+
+                    try:
+                        with SLACK_API_LATENCY.labels(method).time():
+                            return await func(**kwargs)
+                    except SlackApiError as e:
+                        if e.response.get("error") != "ratelimited" or attempt == self.MAX_RATE_LIMITED_RETRIES:
+                            raise
+
+                        retry_after = self._get_retry_after(e)
+                        self._rate_limited[method] = self._rate_limited.get(method, 0) + 1
+                        SLACK_API_RATE_LIMITED.labels(method).inc()
+                        logger.warning(f"Slack method {method} is rate limited, retrying after {retry_after} seconds")
+                        bucket.pause(retry_after)
+            finally:
+                if not dispatched:
+                    self._queued[priority] -= 1
+
+                if done is not None:
+                    done.set_result(None)
+                    if self._last_ordered_call.get(ordering_key) is done:
+                        del self._last_ordered_call[ordering_key]
+
+    def stats(self) -> dict:
+        """Queue depth and wait time (seconds) of each priority lane and the number of rate limited calls"""
+        return {
+            "queued": {p.name.lower(): self._queued[p] for p in Priority},
+            "wait_time": {p.name.lower(): s.as_dict() for p, s in self._wait_time.items()},
+            "rate_limited": dict(self._rate_limited),
+        }
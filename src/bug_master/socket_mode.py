@@ -0,0 +1,92 @@
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable, List
+
+import aiohttp
+from slack_sdk.socket_mode.aiohttp import SocketModeClient
+from slack_sdk.socket_mode.request import SocketModeRequest
+from slack_sdk.socket_mode.response import SocketModeResponse
+from slack_sdk.web.async_client import AsyncWebClient
+from starlette.responses import Response
+
+from bug_master import consts
+from bug_master.consts import logger
+from bug_master.metrics import EVENT_ACK_LATENCY, OPTIONS_LATENCY, SOCKET_MODE_ACK_LATENCY
+from bug_master.response_url import respond
+
+
+class SocketModeIngestion:
+    """Receive Slack events, commands and interactive payloads through Socket Mode WebSocket connections.
+    Envelopes are acknowledged as soon as they arrive and then fed to the same handlers used by the HTTP routes.
+    Responses are delivered through the response urls using the given (shared) HTTP session"""
+
+    def __init__(
+        self,
+        app_token: str,
+        connections: int,
+        on_event: Callable[[dict, bool], Awaitable[Response]],
+        on_command: Callable[[dict], Awaitable[Response]],
+        on_interactive: Callable[[dict], Awaitable[Response]],
+        on_options: Callable[[dict], Awaitable[Response]],
+        session: aiohttp.ClientSession,
+    ) -> None:
+        self._app_token = app_token
+        self._connections = connections
+        self._on_event = on_event
+        self._on_command = on_command
+        self._on_interactive = on_interactive
+        self._on_options = on_options
+        self._session = session
+        self._clients: List[SocketModeClient] = []
+
+    async def start(self):
+        logger.info(f"Starting Socket Mode ingestion with {self._connections} connections ...")
+        for _ in range(self._connections):
+            client = SocketModeClient(
+                app_token=self._app_token, web_client=AsyncWebClient(base_url=consts.SLACK_API_URL)
+            )
+            client.socket_mode_request_listeners.append(self._handle_request)
+            await client.connect()
+            self._clients.append(client)
+        logger.info("Socket Mode connections established")
+
+    async def stop(self):
+        await asyncio.gather(*[client.close() for client in self._clients], return_exceptions=True)
+        self._clients = []
+
+    @classmethod
+    def _is_options_request(cls, request: SocketModeRequest) -> bool:
+        """Options requests of external data source menus are interactive payloads without actions"""
+        return request.type == "interactive" and "actions" not in request.payload and "value" in request.payload
+
+    async def _handle_request(self, client: SocketModeClient, request: SocketModeRequest):
+        received_at = time.monotonic()
+        if self._is_options_request(request):
+            # The options are sent with the acknowledgement, there is no response url for them
+            response = await self._on_options(request.payload)
+            await client.send_socket_mode_response(
+                SocketModeResponse(envelope_id=request.envelope_id, payload=json.loads(response.body))
+            )
+            OPTIONS_LATENCY.labels("socket_mode").observe(ack_latency := time.monotonic() - received_at)
+            SOCKET_MODE_ACK_LATENCY.labels("options").observe(ack_latency)
+            return
+
+        await client.send_socket_mode_response(SocketModeResponse(envelope_id=request.envelope_id))
+        SOCKET_MODE_ACK_LATENCY.labels(request.type).observe(ack_latency := time.monotonic() - received_at)
+        if request.type == "events_api":
+            EVENT_ACK_LATENCY.labels("socket_mode").observe(ack_latency)
+
+        payload = request.payload
+        if request.type == "events_api":
+            await self._on_event(payload, bool(request.retry_attempt))
+        elif request.type == "slash_commands":
+            await respond(self._session, payload.get("response_url"), await self._on_command(payload))
+        elif request.type == "interactive":
+            response = await self._on_interactive(payload)
+            await respond(self._session, payload.get("response_url"), response, replace_original=True)
+        else:
+            logger.warning(f"Unsupported Socket Mode request type {request.type}")
+
+    def stats(self) -> dict:
+        return {"connections": len(self._clients)}
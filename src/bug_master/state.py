@@ -0,0 +1,261 @@
+import asyncio
+import functools
+import json
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from bug_master import consts
+from bug_master.consts import logger
+
+
+class StateBackend(ABC):
+    """Key-value store of the bot state (channels configurations, analysis results, caches and leases).
+    Values must be JSON serializable. Keys are grouped in namespaces and can expire after a time to live"""
+
+    is_shared = False
+
+    @abstractmethod
+    async def get(self, namespace: str, key: str) -> Any:
+        pass
+
+    @abstractmethod
+    async def set(self, namespace: str, key: str, value: Any, ttl: int = None):
+        pass
+
+    @abstractmethod
+    async def delete(self, namespace: str, key: str):
+        pass
+
+    @abstractmethod
+    async def add_if_absent(self, namespace: str, key: str, value: Any, ttl: int = None) -> bool:
+        """Atomically set the key unless it is already stored and not expired.
+        :return: True if the key was set
+        """
+        pass
+
+    @abstractmethod
+    async def acquire_lease(self, name: str, owner: str, ttl: int) -> bool:
+        """Acquire the named lease for ttl seconds, or renew it if the owner already holds it.
+        :return: True if the owner holds the lease
+        """
+        pass
+
+    @abstractmethod
+    async def release_lease(self, name: str, owner: str):
+        pass
+
+    @abstractmethod
+    async def get_lease_owner(self, name: str) -> str | None:
+        """Get the current owner of the named lease, None if it isn't held"""
+        pass
+
+
+class MemoryStateBackend(StateBackend):
+    """Process local backend, used when running a single worker"""
+
+    def __init__(self) -> None:
+        self._values: Dict[Tuple[str, str], Tuple[Any, float | None]] = {}
+        self._leases: Dict[str, Tuple[str, float]] = {}
+
+    async def get(self, namespace: str, key: str) -> Any:
+        if (entry := self._values.get((namespace, key))) is None:
+            return None
+
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self._values[(namespace, key)]
+            return None
+        return value
+
+    async def set(self, namespace: str, key: str, value: Any, ttl: int = None):
+        self._values[(namespace, key)] = (value, time.time() + ttl if ttl else None)
+
+    async def delete(self, namespace: str, key: str):
+        self._values.pop((namespace, key), None)
+
+    async def add_if_absent(self, namespace: str, key: str, value: Any, ttl: int = None) -> bool:
+        if await self.get(namespace, key) is not None:
+            return False
+
+        await self.set(namespace, key, value, ttl)
+        return True
+
+    async def acquire_lease(self, name: str, owner: str, ttl: int) -> bool:
+        now = time.time()
+        if (lease := self._leases.get(name)) is not None and lease[0] != owner and lease[1] > now:
+            return False
+
+        self._leases[name] = (owner, now + ttl)
+        return True
+
+    async def release_lease(self, name: str, owner: str):
+        if (lease := self._leases.get(name)) is not None and lease[0] == owner:
+            del self._leases[name]
+
+    async def get_lease_owner(self, name: str) -> str | None:
+        if (lease := self._leases.get(name)) is not None and lease[1] > time.time():
+            return lease[0]
+        return None
+
+
+class SqliteStateBackend(StateBackend):
+    """Local SQLite file backend, shared by all the worker processes of the same host. The queries might wait for the
+    file lock of another process, so they run in a dedicated thread instead of blocking the event loop"""
+
+    is_shared = True
+    PRUNE_INTERVAL = 100
+
+    def __init__(self, path: str) -> None:
+        if directory := os.path.dirname(path):
+            os.makedirs(directory, exist_ok=True)
+
+        self._connection = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS state "
+            "(namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._writes = 0
+        # A single thread, the connection is used by one query at a time
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="state-store")
+
+    async def _call(self, func: Callable, *args):
+        return await asyncio.get_event_loop().run_in_executor(self._executor, func, *args)
+
+    def _get(self, namespace: str, key: str) -> Any:
+        row = self._connection.execute(
+            "SELECT value FROM state WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, key, time.time()),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    async def get(self, namespace: str, key: str) -> Any:
+        return await self._call(self._get, namespace, key)
+
+    def _write(self, cursor: sqlite3.Cursor, namespace: str, key: str, value: Any, ttl: int | None, now: float):
+        cursor.execute(
+            "INSERT OR REPLACE INTO state (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (namespace, key, json.dumps(value), now + ttl if ttl else None),
+        )
+        self._writes += 1
+        if self._writes % self.PRUNE_INTERVAL == 0:
+            cursor.execute("DELETE FROM state WHERE expires_at <= ?", (now,))
+
+    def _set(self, namespace: str, key: str, value: Any, ttl: int | None):
+        self._write(self._connection.cursor(), namespace, key, value, ttl, time.time())
+
+    async def set(self, namespace: str, key: str, value: Any, ttl: int = None):
+        await self._call(self._set, namespace, key, value, ttl)
+
+    async def delete(self, namespace: str, key: str):
+        await self._call(
+            self._connection.execute, "DELETE FROM state WHERE namespace = ? AND key = ?", (namespace, key)
+        )
+
+    def _transaction(self, func: Callable[[sqlite3.Cursor, float], bool]) -> bool:
+        cursor = self._connection.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            res = func(cursor, time.time())
+            cursor.execute("COMMIT")
+            return res
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+
+    async def add_if_absent(self, namespace: str, key: str, value: Any, ttl: int = None) -> bool:
+        def _add(cursor: sqlite3.Cursor, now: float) -> bool:
+            cursor.execute(
+                "SELECT 1 FROM state WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, key, now),
+            )
+            if cursor.fetchone():
+                return False
+
+            self._write(cursor, namespace, key, value, ttl, now)
+            return True
+
+        return await self._call(self._transaction, _add)
+
+    async def acquire_lease(self, name: str, owner: str, ttl: int) -> bool:
+        def _acquire(cursor: sqlite3.Cursor, now: float) -> bool:
+            cursor.execute("SELECT owner, expires_at FROM leases WHERE name = ?", (name,))
+            if (row := cursor.fetchone()) is not None and row[0] != owner and row[1] > now:
+                return False
+
+            cursor.execute(
+                "INSERT OR REPLACE INTO leases (name, owner, expires_at) VALUES (?, ?, ?)", (name, owner, now + ttl)
+            )
+            return True
+
+        return await self._call(self._transaction, _acquire)
+
+    async def release_lease(self, name: str, owner: str):
+        await self._call(self._connection.execute, "DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+
+    def _get_lease_owner(self, name: str) -> str | None:
+        row = self._connection.execute(
+            "SELECT owner FROM leases WHERE name = ? AND expires_at > ?", (name, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    async def get_lease_owner(self, name: str) -> str | None:
+        return await self._call(self._get_lease_owner, name)
+
+
+_state_backend: StateBackend | None = None
+
+
+def get_state_backend() -> StateBackend:
+    """Get the process state backend, a SQLite file backend if a state store path is configured"""
+    global _state_backend
+    if _state_backend is None:
+        if consts.STATE_STORE_PATH:
+            logger.info(f"Using local state store {consts.STATE_STORE_PATH}")
+            _state_backend = SqliteStateBackend(consts.STATE_STORE_PATH)
+        else:
+            _state_backend = MemoryStateBackend()
+
+    return _state_backend
+
+
+def shared_cache(
+    namespace: str,
+    ttl: int,
+    key: Callable[..., str],
+    encode: Callable[[Any], Any] = None,
+    decode: Callable[[Any], Any] = None,
+):
+    """Cache the results of an async function in the state backend, so they are computed once for all the worker
+    processes. Does nothing when the backend is not shared, the process local caches are enough then.
+    :param key: Get the cache key from the function arguments
+    :param encode: Convert the result to a JSON serializable value
+    :param decode: Convert the cached value back to a result
+    """
+
+    def decorator(func: Callable[..., Awaitable]):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            backend = get_state_backend()
+            if not backend.is_shared:
+                return await func(*args, **kwargs)
+
+            cache_key = key(*args, **kwargs)
+            if (cached := await backend.get(namespace, cache_key)) is not None:
+                return decode(cached) if decode else cached
+
+            result = await func(*args, **kwargs)
+            await backend.set(namespace, cache_key, encode(result) if encode else result, ttl)
+            return result
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,19 @@
+class LatencyStats:
+    """Count, average and max of measured durations (seconds)"""
+
+    def __init__(self) -> None:
+        self._count = 0
+        self._total = 0.0
+        self._max = 0.0
+
+    def record(self, duration: float):
+        self._count += 1
+        self._total += duration
+        self._max = max(self._max, duration)
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self._count,
+            "avg": self._total / self._count if self._count else 0.0,
+            "max": self._max,
+        }
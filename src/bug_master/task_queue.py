@@ -0,0 +1,440 @@
+import asyncio
+import json
+import os
+import random
+import socket
+import sqlite3
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from bug_master.consts import logger
+from bug_master.stats import LatencyStats
+
+
+@dataclass
+class Task:
+    id: int
+    kind: str
+    payload: Any
+    attempts: int
+    max_attempts: int
+    available_at: float
+
+    @property
+    def is_last_attempt(self) -> bool:
+        return self.attempts >= self.max_attempts
+
+
+class TaskStore(ABC):
+    """Store of the submitted tasks. A task is pending until a worker leases it, the lease expires after the
+    visibility timeout unless it is extended, so tasks of a worker that died are leased again by another worker"""
+
+    def __init__(self, max_attempts: int) -> None:
+        self._max_attempts = max_attempts
+
+    @abstractmethod
+    def add(self, kind: str, payload: Any) -> int:
+        pass
+
+    @abstractmethod
+    def lease(self, kind: str, owner: str, visibility_timeout: int) -> Task | None:
+        """Lease the next available task of the given kind, counting it as a new attempt"""
+        pass
+
+    @abstractmethod
+    def extend(self, task_id: int, owner: str, visibility_timeout: int):
+        pass
+
+    @abstractmethod
+    def complete(self, task_id: int, owner: str):
+        pass
+
+    @abstractmethod
+    def retry(self, task_id: int, owner: str, available_at: float, error: str):
+        pass
+
+    @abstractmethod
+    def fail(self, task_id: int, owner: str, error: str):
+        """Give up on the task, it is kept for inspection but never leased again"""
+        pass
+
+    @abstractmethod
+    def release(self, task_id: int, owner: str):
+        """Return a leased task without counting the attempt, e.g. when the worker is stopped"""
+        pass
+
+    @abstractmethod
+    def count(self, kind: str) -> int:
+        """Number of pending and leased tasks of the given kind"""
+        pass
+
+    @abstractmethod
+    def prune(self, before: float) -> int:
+        """Delete the failed tasks that were given up on before the given time
+        :return: Number of deleted tasks
+        """
+        pass
+
+
+class MemoryTaskStore(TaskStore):
+    """Process local store, tasks don't survive a restart"""
+
+    def __init__(self, max_attempts: int) -> None:
+        super().__init__(max_attempts)
+        self._tasks: Dict[int, dict] = {}
+        self._next_id = 1
+
+    def add(self, kind: str, payload: Any) -> int:
+        task_id = self._next_id
+        self._next_id += 1
+        self._tasks[task_id] = {
+            "kind": kind,
+            "payload": payload,
+            "status": "pending",
+            "attempts": 0,
+            "available_at": time.time(),
+            "owner": None,
+            "lease_expires_at": None,
+        }
+        return task_id
+
+    def lease(self, kind: str, owner: str, visibility_timeout: int) -> Task | None:
+        now = time.time()
+        for task_id, task in self._tasks.items():
+            if task["kind"] != kind or not self._is_available(task, now):
+                continue
+
+            task.update(status="leased", owner=owner, lease_expires_at=now + visibility_timeout)
+            task["attempts"] += 1
+            return Task(task_id, kind, task["payload"], task["attempts"], self._max_attempts, task["available_at"])
+
+        return None
+
+    @classmethod
+    def _is_available(cls, task: dict, now: float) -> bool:
+        if task["status"] == "pending":
+            return task["available_at"] <= now
+        return task["status"] == "leased" and task["lease_expires_at"] <= now
+
+    def _leased(self, task_id: int, owner: str) -> dict | None:
+        if (task := self._tasks.get(task_id)) is not None and task["status"] == "leased" and task["owner"] == owner:
+            return task
+        return None
+
+    def extend(self, task_id: int, owner: str, visibility_timeout: int):
+        if (task := self._leased(task_id, owner)) is not None:
+            task["lease_expires_at"] = time.time() + visibility_timeout
+
+    def complete(self, task_id: int, owner: str):
+        if self._leased(task_id, owner) is not None:
+            del self._tasks[task_id]
+
+    def retry(self, task_id: int, owner: str, available_at: float, error: str):
+        if (task := self._leased(task_id, owner)) is not None:
+            task.update(status="pending", owner=None, available_at=available_at)
+
+    def fail(self, task_id: int, owner: str, error: str):
+        if self._leased(task_id, owner) is not None:
+            del self._tasks[task_id]
+
+    def release(self, task_id: int, owner: str):
+        if (task := self._leased(task_id, owner)) is not None:
+            task.update(status="pending", owner=None)
+            task["attempts"] -= 1
+
+    def count(self, kind: str) -> int:
+        return sum(1 for task in self._tasks.values() if task["kind"] == kind)
+
+    def prune(self, before: float) -> int:
+        return 0  # Failed tasks are not kept
+
+
+class SqliteTaskStore(TaskStore):
+    """Durable local SQLite file store, can be consumed by several processes on the same host"""
+
+    COLUMNS = "id, kind, payload, attempts, available_at"
+
+    def __init__(self, max_attempts: int, path: str) -> None:
+        super().__init__(max_attempts)
+        if directory := os.path.dirname(path):
+            os.makedirs(directory, exist_ok=True)
+
+        self._connection = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, payload TEXT NOT NULL, status TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, available_at REAL NOT NULL, owner TEXT, lease_expires_at REAL, "
+            "last_error TEXT, finished_at REAL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS tasks_available ON tasks (kind, status, available_at)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS tasks_finished ON tasks (status, finished_at)")
+
+    def add(self, kind: str, payload: Any) -> int:
+        cursor = self._connection.execute(
+            "INSERT INTO tasks (kind, payload, status, available_at) VALUES (?, ?, 'pending', ?)",
+            (kind, json.dumps(payload), time.time()),
+        )
+        return cursor.lastrowid
+
+    def lease(self, kind: str, owner: str, visibility_timeout: int) -> Task | None:
+        cursor = self._connection.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            cursor.execute(
+                f"SELECT {self.COLUMNS} FROM tasks WHERE kind = ? AND ("
+                "(status = 'pending' AND available_at <= ?) OR (status = 'leased' AND lease_expires_at <= ?)"
+                ") ORDER BY available_at, id LIMIT 1",
+                (kind, now, now),
+            )
+            if (row := cursor.fetchone()) is None:
+                cursor.execute("COMMIT")
+                return None
+
+            task_id, kind, payload, attempts, available_at = row
+            cursor.execute(
+                "UPDATE tasks SET status = 'leased', attempts = attempts + 1, owner = ?, lease_expires_at = ? "
+                "WHERE id = ?",
+                (owner, now + visibility_timeout, task_id),
+            )
+            cursor.execute("COMMIT")
+            return Task(task_id, kind, json.loads(payload), attempts + 1, self._max_attempts, available_at)
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+
+    def extend(self, task_id: int, owner: str, visibility_timeout: int):
+        self._connection.execute(
+            "UPDATE tasks SET lease_expires_at = ? WHERE id = ? AND owner = ? AND status = 'leased'",
+            (time.time() + visibility_timeout, task_id, owner),
+        )
+
+    def complete(self, task_id: int, owner: str):
+        self._connection.execute("DELETE FROM tasks WHERE id = ? AND owner = ? AND status = 'leased'", (task_id, owner))
+
+    def retry(self, task_id: int, owner: str, available_at: float, error: str):
+        self._connection.execute(
+            "UPDATE tasks SET status = 'pending', owner = NULL, available_at = ?, last_error = ? "
+            "WHERE id = ? AND owner = ? AND status = 'leased'",
+            (available_at, error, task_id, owner),
+        )
+
+    def fail(self, task_id: int, owner: str, error: str):
+        self._connection.execute(
+            "UPDATE tasks SET status = 'failed', owner = NULL, last_error = ?, finished_at = ? "
+            "WHERE id = ? AND owner = ? AND status = 'leased'",
+            (error, time.time(), task_id, owner),
+        )
+
+    def release(self, task_id: int, owner: str):
+        self._connection.execute(
+            "UPDATE tasks SET status = 'pending', owner = NULL, attempts = attempts - 1 "
+            "WHERE id = ? AND owner = ? AND status = 'leased'",
+            (task_id, owner),
+        )
+
+    def count(self, kind: str) -> int:
+        return self._connection.execute(
+            "SELECT COUNT(*) FROM tasks WHERE kind = ? AND status IN ('pending', 'leased')", (kind,)
+        ).fetchone()[0]
+
+    def prune(self, before: float) -> int:
+        return self._connection.execute(
+            "DELETE FROM tasks WHERE status = 'failed' AND finished_at < ?", (before,)
+        ).rowcount
+
+
+class TaskQueue:
+    """Queue of accepted work (events, long running commands), served by a fixed pool of workers per task kind.
+    Each task is leased by a worker, retried with exponential backoff if its handler raises and, when the store is
+    durable, resumed after a restart. Completed tasks are deleted and failed tasks are kept for failed_retention
+    seconds. The durable store calls might wait for the file lock of another process, so they run in a dedicated
+    thread instead of blocking the event loop"""
+
+    def __init__(
+        self,
+        store_path: str = None,
+        visibility_timeout: int = 300,
+        max_attempts: int = 5,
+        retry_backoff: int = 5,
+        max_retry_backoff: int = 300,
+        poll_interval: float = 1,
+        stats_interval: int = 60,
+        failed_retention: int = 7 * 24 * 60 * 60,
+        prune_interval: int = 60 * 60,
+    ) -> None:
+        self._executor: ThreadPoolExecutor | None = None
+        if store_path:
+            logger.info(f"Using durable task store {store_path}")
+            self._store = SqliteTaskStore(max_attempts, store_path)
+            # A single thread, the store connection is used by one call at a time
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="task-store")
+        else:
+            self._store = MemoryTaskStore(max_attempts)
+
+        self._owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._visibility_timeout = visibility_timeout
+        self._retry_backoff = retry_backoff
+        self._max_retry_backoff = max_retry_backoff
+        self._poll_interval = poll_interval
+        self._stats_interval = stats_interval
+        self._failed_retention = failed_retention
+        self._prune_interval = prune_interval
+        self._handlers: Dict[str, Tuple[Callable[[Task], Awaitable], int, int]] = {}
+        self._submitted: Dict[str, asyncio.Event] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._started_at = 0.0
+        self._depth: Counter = Counter()
+        self._busy_workers: Counter = Counter()
+        self._busy_time: Counter = Counter()
+        self._counters: Counter = Counter()
+        self._wait_time: Dict[str, LatencyStats] = {}
+
+    def register(self, kind: str, handler: Callable[[Task], Awaitable], workers: int, max_size: int):
+        """Register the handler of a task kind, served by its own pool of workers.
+        A task is retried if the handler raises, until its last attempt"""
+        self._handlers[kind] = (handler, workers, max_size)
+        self._submitted[kind] = asyncio.Event()
+        self._wait_time[kind] = LatencyStats()
+
+    def start(self):
+        self._started_at = time.monotonic()
+        loop = asyncio.get_event_loop()
+        for kind, (_handler, workers, _max_size) in self._handlers.items():
+            self._tasks += [loop.create_task(self._worker(kind, i)) for i in range(workers)]
+            logger.info(f"Task queue started with {workers} workers for {kind} tasks")
+        self._tasks.append(loop.create_task(self._report_stats()))
+        self._tasks.append(loop.create_task(self._prune_failed()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _call_store(self, method: Callable, *args):
+        if self._executor is None:
+            return method(*args)
+        return await asyncio.get_event_loop().run_in_executor(self._executor, method, *args)
+
+    async def submit(self, kind: str, payload: Any) -> bool:
+        """Store the task for handling, without waiting for it to be handled.
+        :return: False if there are already too many tasks of that kind and the task was rejected
+        """
+        _handler, _workers, max_size = self._handlers[kind]
+        if (depth := await self._call_store(self._store.count, kind)) >= max_size:
+            self._counters[(kind, "rejected")] += 1
+            logger.warning(f"Task queue is full ({depth} {kind} tasks), rejecting task")
+            return False
+
+        await self._call_store(self._store.add, kind, payload)
+        self._depth[kind] = depth + 1
+        self._submitted[kind].set()
+        return True
+
+    async def _next_task(self, kind: str) -> Task:
+        while True:
+            self._submitted[kind].clear()
+            if (
+                task := await self._call_store(self._store.lease, kind, self._owner, self._visibility_timeout)
+            ) is not None:
+                return task
+
+            # Tasks can also become available by retry backoff expiration or be submitted by other processes
+            try:
+                await asyncio.wait_for(self._submitted[kind].wait(), timeout=self._poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self, kind: str, worker_id: int):
+        handler, _workers, _max_size = self._handlers[kind]
+        while True:
+            task = await self._next_task(kind)
+            started_at = time.monotonic()
+            self._wait_time[kind].record(max(time.time() - task.available_at, 0))
+            self._busy_workers[kind] += 1
+            heartbeat = asyncio.get_event_loop().create_task(self._heartbeat(task))
+            try:
+                await handler(task)
+                await self._call_store(self._store.complete, task.id, self._owner)
+                self._depth[kind] = max(self._depth[kind] - 1, 0)
+                self._counters[(kind, "handled")] += 1
+            except asyncio.CancelledError:
+                await asyncio.shield(self._call_store(self._store.release, task.id, self._owner))
+                raise
+            except Exception as e:
+                await self._on_failure(task, worker_id, f"{e.__class__.__name__}: {e}")
+            finally:
+                heartbeat.cancel()
+                self._busy_workers[kind] -= 1
+                self._busy_time[kind] += time.monotonic() - started_at
+
+    async def _on_failure(self, task: Task, worker_id: int, error: str):
+        if task.is_last_attempt:
+            logger.error(f"Worker {worker_id} failed {task.kind} task {task.id} for the last time, {error}")
+            await self._call_store(self._store.fail, task.id, self._owner, error)
+            self._depth[task.kind] = max(self._depth[task.kind] - 1, 0)
+            self._counters[(task.kind, "failed")] += 1
+            return
+
+        backoff = min(self._retry_backoff * 2 ** (task.attempts - 1), self._max_retry_backoff)
+        backoff *= random.uniform(0.5, 1)
+        logger.warning(
+            f"Worker {worker_id} failed {task.kind} task {task.id} (attempt {task.attempts}/{task.max_attempts}), "
+            f"retrying in {backoff:.1f} seconds, {error}"
+        )
+        await self._call_store(self._store.retry, task.id, self._owner, time.time() + backoff, error)
+        self._counters[(task.kind, "retried")] += 1
+
+    async def _heartbeat(self, task: Task):
+        while True:
+            await asyncio.sleep(self._visibility_timeout / 3)
+            await self._call_store(self._store.extend, task.id, self._owner, self._visibility_timeout)
+
+    async def _report_stats(self):
+        while True:
+            await asyncio.sleep(self._stats_interval)
+            try:
+                # The store is shared with the other processes, the depth they changed is picked up here
+                for kind in self._handlers:
+                    self._depth[kind] = await self._call_store(self._store.count, kind)
+            except sqlite3.Error as e:
+                logger.error(f"Failed to count the queued tasks, {e.__class__.__name__}: {e}")
+
+            if any(self._busy_workers.values()):
+                logger.info(f"Task queue stats: {self.stats()}")
+
+    async def _prune_failed(self):
+        while True:
+            try:
+                if pruned := await self._call_store(self._store.prune, time.time() - self._failed_retention):
+                    logger.info(f"Pruned {pruned} failed tasks older than {self._failed_retention} seconds")
+            except sqlite3.Error as e:
+                logger.error(f"Failed to prune failed tasks, {e.__class__.__name__}: {e}")
+            await asyncio.sleep(self._prune_interval)
+
+    def stats(self) -> dict:
+        """Queue depth, tasks wait time (seconds) in the queue and workers utilization, per task kind.
+        The depth is the last one counted in the store, updated by the tasks this process submits and finishes"""
+        uptime = time.monotonic() - self._started_at if self._started_at else 0
+        stats = {}
+        for kind, (_handler, workers, max_size) in self._handlers.items():
+            stats[kind] = {
+                "depth": self._depth[kind],
+                "max_size": max_size,
+                "handled": self._counters[(kind, "handled")],
+                "retried": self._counters[(kind, "retried")],
+                "failed": self._counters[(kind, "failed")],
+                "rejected": self._counters[(kind, "rejected")],
+                "wait_time": self._wait_time[kind].as_dict(),
+                "workers": workers,
+                "busy_workers": self._busy_workers[kind],
+                "utilization": self._busy_time[kind] / (uptime * workers) if uptime else 0.0,
+            }
+        return stats
@@ -0,0 +1,189 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator, List
+
+from bug_master import consts
+from bug_master.consts import logger
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None = None
+    attributes: dict = field(default_factory=dict)
+    start: float = field(default_factory=time.time)
+    duration: float | None = None
+    error: str | None = None
+    children: List["Span"] = field(default_factory=list)
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def walk(self) -> Iterator["Span"]:
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def format_tree(self, depth: int = 0) -> str:
+        duration = f"{self.duration * 1000:.0f}ms" if self.duration is not None else "unfinished"
+        attributes = " ".join(f"{k}={v}" for k, v in self.attributes.items())
+        line = "  " * depth + f"{self.name} {duration}" + (f" {attributes}" if attributes else "")
+        if self.error:
+            line += f" error={self.error}"
+        return "\n".join([line] + [child.format_tree(depth + 1) for child in self.children])
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,  # Internal
+            "startTimeUnixNano": str(int(self.start * 1e9)),
+            "endTimeUnixNano": str(int((self.start + (self.duration or 0)) * 1e9)),
+            "attributes": [{"key": k, "value": {"stringValue": str(v)}} for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+_current_span: ContextVar[Span | None] = ContextVar("trace_span", default=None)
+
+
+class Tracer:
+    """In-process tracing of events and commands handling. The current span is carried by a context variable, so the
+    spans opened by the tasks created while handling an event belong to its trace. The trace id is added to the log
+    lines, traces slower than slow_threshold (seconds) are logged as a tree of spans and finished traces are appended
+    to export_path in the OTLP/JSON format, if given.
+    Finished traces are buffered (up to max_buffered, newer traces are dropped when it is full) and written to the
+    export file every export_interval seconds by a background task, the file is written by a dedicated thread so the
+    event loop doesn't wait for the disk"""
+
+    def __init__(
+        self, slow_threshold: float, export_path: str = None, export_interval: float = 5, max_buffered: int = 1000
+    ) -> None:
+        self._slow_threshold = slow_threshold
+        self._export_path = export_path
+        self._export_interval = export_interval
+        self._max_buffered = max_buffered
+        self._buffer: List[Span] = []
+        self._dropped = 0
+        self._export_task: asyncio.Task | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        if export_path:
+            if directory := os.path.dirname(export_path):
+                os.makedirs(directory, exist_ok=True)
+            # A single thread, the traces are appended to the file in order
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trace-export")
+
+    def start(self):
+        if self._export_path and self._export_task is None:
+            self._export_task = asyncio.get_event_loop().create_task(self._export_periodically())
+
+    async def stop(self):
+        if self._export_task is not None:
+            self._export_task.cancel()
+            await asyncio.gather(self._export_task, return_exceptions=True)
+            self._export_task = None
+        await self.flush()
+
+    @contextmanager
+    def _open(self, span: Span) -> Iterator[Span]:
+        token = _current_span.set(span)
+        started_at = time.monotonic()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{e.__class__.__name__}: {e}"
+            raise
+        finally:
+            span.duration = time.monotonic() - started_at
+            _current_span.reset(token)
+
+    @contextmanager
+    def trace(self, name: str, **attributes) -> Iterator[Span]:
+        """Start a new trace, or a span of the current one if there is already a trace in this context"""
+        if _current_span.get() is not None:
+            with self.span(name, **attributes) as span:
+                yield span
+            return
+
+        root = Span(name, trace_id=os.urandom(16).hex(), span_id=os.urandom(8).hex(), attributes=attributes)
+        try:
+            with logger.contextualize(trace_id=root.trace_id), self._open(root):
+                yield root
+        finally:
+            self._finish(root)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span | None]:
+        """Record a span of the current trace, nothing is recorded outside of a trace"""
+        if (parent := _current_span.get()) is None:
+            yield None
+            return
+
+        span = Span(name, parent.trace_id, os.urandom(8).hex(), parent.span_id, attributes)
+        parent.children.append(span)
+        with self._open(span):
+            yield span
+
+    def _finish(self, root: Span):
+        if root.duration >= self._slow_threshold:
+            logger.warning(f"Slow trace {root.trace_id} took {root.duration:.1f} seconds:\n{root.format_tree()}")
+
+        if self._export_path:
+            if len(self._buffer) < self._max_buffered:
+                self._buffer.append(root)
+            else:
+                self._dropped += 1
+
+    async def _export_periodically(self):
+        while True:
+            await asyncio.sleep(self._export_interval)
+            await self.flush()
+
+    async def flush(self):
+        """Write the buffered traces to the export file"""
+        if dropped := self._dropped:
+            self._dropped = 0
+            logger.warning(f"Dropped {dropped} traces, the traces export buffer is full")
+        if not self._buffer:
+            return
+
+        roots, self._buffer = self._buffer, []
+        try:
+            await asyncio.get_event_loop().run_in_executor(self._executor, self._export, roots)
+        except OSError as e:
+            logger.error(f"Failed to export {len(roots)} traces, {e.__class__.__name__}: {e}")
+
+    def _export(self, roots: List[Span]):
+        lines = []
+        for root in roots:
+            data = {
+                "resourceSpans": [
+                    {
+                        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "bug-master"}}]},
+                        "scopeSpans": [{"scope": {"name": "bug_master"}, "spans": [s.to_otlp() for s in root.walk()]}],
+                    }
+                ]
+            }
+            lines.append(json.dumps(data) + "\n")
+        with open(self._export_path, "a") as f:
+            f.writelines(lines)
+
+
+tracer = Tracer(
+    consts.TRACE_SLOW_THRESHOLD,
+    consts.TRACE_EXPORT_PATH,
+    export_interval=consts.TRACE_EXPORT_INTERVAL,
+    max_buffered=consts.TRACE_EXPORT_BUFFER_SIZE,
+)
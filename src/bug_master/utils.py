@@ -4,15 +4,25 @@ from abc import ABC
 from dataclasses import dataclass
 from datetime import datetime
 from typing import List, Union
+from urllib.parse import urlparse
 
 import aiohttp
 import yaml
 from aiohttp import ClientTimeout
 from bs4 import BeautifulSoup
-from cache import AsyncTTL
 from dateutil import parser
 
-from bug_master.consts import CI_BUCKET_NAME, DOWNLOAD_FILE_TIMEOUT, logger
+from bug_master.consts import (
+    CI_BUCKET_NAME,
+    DOWNLOAD_FILE_TIMEOUT,
+    JOB_HISTORY_CACHE_MAX_BYTES,
+    JOBS_CACHE_MAX_BYTES,
+    logger,
+)
+from bug_master.metrics import ARTIFACT_FETCH_BYTES, ARTIFACT_FETCH_LATENCY
+from bug_master.refresh import refreshing_cache
+from bug_master.state import shared_cache
+from bug_master.tracing import tracer
 
 
 @dataclass
@@ -21,6 +31,14 @@ class JobStatus:
     started: datetime
     succeeded: bool
 
+    def to_list(self) -> list:
+        return [self.job_id, self.started.isoformat(), self.succeeded]
+
+    @classmethod
+    def from_list(cls, data: list) -> "JobStatus":
+        job_id, started, succeeded = data
+        return cls(job_id, datetime.fromisoformat(started), succeeded)
+
 
 class Utils(ABC):
     GIT_API_FMT = "https://api.github.com/repos/{ORG}/{REPO}/contents/{PATH}"
@@ -34,18 +52,23 @@ class Utils(ABC):
         timeout: int = DOWNLOAD_FILE_TIMEOUT,
     ) -> str | None:
         logger.info(f"Getting file content {url}")
+        host = urlparse(url).hostname or ""
         async with aiohttp.ClientSession(headers=headers, timeout=ClientTimeout(total=timeout)) as session:
             try:
-                async with session.get(url) as resp:
-                    if not resp.status == 200:
-                        logger.error(
-                            f"Failed to load file data file is missing of invalid URL {url} with headers {headers}"
-                            f". Returned status {resp.status}"
-                        )
-                        return None
-
-                    logger.info(f"File content {url} download successfully")
-                    return await resp.text()
+                with ARTIFACT_FETCH_LATENCY.labels(host).time(), tracer.span("get_file_content", url=url) as span:
+                    async with session.get(url) as resp:
+                        if not resp.status == 200:
+                            logger.error(
+                                f"Failed to load file data file is missing of invalid URL {url} with headers {headers}"
+                                f". Returned status {resp.status}"
+                            )
+                            return None
+
+                        ARTIFACT_FETCH_BYTES.labels(host).inc(size := len(await resp.read()))
+                        if span is not None:
+                            span.set_attribute("bytes", size)
+                        logger.info(f"File content {url} download successfully")
+                        return await resp.text()
             except TimeoutError as e:
                 logger.error(f"Timeout Error: Failed to get {url}, {e}")
 
@@ -84,7 +107,14 @@ class Utils(ABC):
         return cls.SPYGLASS_JOB_HISTORY_URL_FMT.format(JOB_NAME=job_name, CI_BUCKET_NAME=CI_BUCKET_NAME)
 
     @classmethod
-    @AsyncTTL(time_to_live=360, maxsize=None)
+    @refreshing_cache(ttl=360, max_bytes=JOB_HISTORY_CACHE_MAX_BYTES)
+    @shared_cache(
+        "job_history",
+        ttl=360,
+        key=lambda cls, job_name: job_name,
+        encode=lambda history: [job.to_list() for job in history],
+        decode=lambda history: [JobStatus.from_list(job) for job in history],
+    )
     async def get_job_history(cls, job_name: str) -> List[JobStatus]:
         url = cls.get_job_history_link(job_name)
         text = await cls.get_file_content(url)
@@ -112,13 +142,16 @@ class Utils(ABC):
 
     @classmethod
     async def get_channel_config(cls, bot, channel_id: str, channel_name: str = ""):
-        if (config := bot.get_configuration(channel_id)) is None:
+        if (config := await bot.get_configuration(channel_id)) is None:
             config = await bot.get_channel_configuration(channel_id, channel_name)
 
         return config
 
     @classmethod
-    @AsyncTTL(time_to_live=3600, maxsize=None)
+    @refreshing_cache(ttl=3600, max_bytes=JOBS_CACHE_MAX_BYTES)
+    @shared_cache(
+        "jobs", ttl=3600, key=lambda cls, prow_configurations: json.dumps(prow_configurations, sort_keys=True)
+    )
     async def get_jobs(cls, prow_configurations: dict) -> List[str]:
         jobs = []
         repo = prow_configurations.get("repo")
@@ -0,0 +1,110 @@
+import asyncio
+from collections import Counter, OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, Tuple
+
+from bug_master.slack_scheduler import Priority, slack_priority
+
+
+class WorkScheduler:
+    """Run units of work (event handling, commands fan-out) fairly between channels and priority classes.
+    Waiting work is served by priority class (live events, then interactive requests, then bulk backfills), channels
+    of the same class are served round-robin and each channel can run up to its quota of units per class at once.
+    Bulk work is throttled while live work is waiting.
+    """
+
+    def __init__(self, concurrency: int, channel_quota: int, bulk_concurrency: int, throttled_bulk_concurrency: int):
+        self._concurrency = concurrency
+        self._channel_quota = channel_quota
+        self._bulk_concurrency = bulk_concurrency
+        self._throttled_bulk_concurrency = throttled_bulk_concurrency
+        self._waiting: Dict[Priority, OrderedDict[str, Deque[asyncio.Future]]] = {p: OrderedDict() for p in Priority}
+        self._queued: Counter = Counter()
+        self._running: Counter = Counter()
+        self._running_per_channel: Counter = Counter()
+
+    async def run(self, channel: str, priority: Priority, func: Callable[..., Awaitable], /, *args, **kwargs):
+        """Wait for a free slot for the channel on the given priority class and run func(*args, **kwargs) in it.
+        Slack calls made by func are sent with the same priority"""
+        key = (channel, priority)
+        await self._acquire(key)
+        try:
+            with slack_priority(priority):
+                return await func(*args, **kwargs)
+        finally:
+            self._release(key)
+
+    async def _acquire(self, key: Tuple[str, Priority]):
+        channel, priority = key
+        future = asyncio.get_event_loop().create_future()
+        self._waiting[priority].setdefault(channel, deque()).append(future)
+        self._queued[priority] += 1
+        self._dispatch()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release(key)  # The slot was granted just before the waiter was cancelled
+            else:
+                self._remove_waiter(key, future)
+            raise
+
+    def _remove_waiter(self, key: Tuple[str, Priority], future: asyncio.Future):
+        channel, priority = key
+        if (waiters := self._waiting[priority].get(channel)) is not None and future in waiters:
+            waiters.remove(future)
+            self._queued[priority] -= 1
+            if not waiters:
+                del self._waiting[priority][channel]
+
+    def _release(self, key: Tuple[str, Priority]):
+        _, priority = key
+        self._running[priority] -= 1
+        self._running_per_channel[key] -= 1
+        if not self._running_per_channel[key]:
+            del self._running_per_channel[key]
+        self._dispatch()
+
+    def _priority_limit(self, priority: Priority) -> int:
+        if priority != Priority.BULK:
+            return self._concurrency
+
+        if self._queued[Priority.LIVE]:
+            return self._throttled_bulk_concurrency
+        return self._bulk_concurrency
+
+    def _next(self) -> Tuple[str, Priority] | None:
+        for priority in sorted(Priority):
+            if self._running[priority] >= self._priority_limit(priority):
+                continue
+
+            channels = self._waiting[priority]
+            for channel in list(channels.keys()):
+                if self._running_per_channel[(channel, priority)] < self._channel_quota:
+                    channels.move_to_end(channel)  # Round-robin between the channels
+                    return channel, priority
+
+        return None
+
+    def _dispatch(self):
+        while sum(self._running.values()) < self._concurrency and (key := self._next()) is not None:
+            channel, priority = key
+            waiters = self._waiting[priority][channel]
+            future = waiters.popleft()
+            if not waiters:
+                del self._waiting[priority][channel]
+
+            self._queued[priority] -= 1
+            if future.done():  # Cancelled waiter
+                continue
+
+            self._running[priority] += 1
+            self._running_per_channel[key] += 1
+            future.set_result(None)
+
+    def stats(self) -> dict:
+        return {
+            "queued": {p.name.lower(): self._queued[p] for p in Priority},
+            "running": {p.name.lower(): self._running[p] for p in Priority},
+            "concurrency": self._concurrency,
+        }
@@ -0,0 +1,6 @@
+import os
+
+# The bot configuration is read from the environment when bug_master.consts is imported
+os.environ.setdefault("APP_TOKEN", "xapp-test")
+os.environ.setdefault("SIGNING_SECRET", "test-signing-secret")
+os.environ.setdefault("BOT_USER_TOKEN", "xoxb-test")
@@ -0,0 +1,139 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from bug_master import consts
+from bug_master.commands import apply_command
+from bug_master.commands.apply_command import ApplyCommand, HistoryMessageEvent
+from bug_master.dedup import DedupIndex
+
+BOT_USER = "UBOT"
+
+
+class FakeHistory:
+    def __init__(self, pages: list, log: list) -> None:
+        self.pages = pages
+        self.log = log
+        self.error: Exception | None = None
+
+    async def get_messages(self, channel: str, since: float, limit: int | None):
+        for i, page in enumerate(self.pages):
+            await asyncio.sleep(0.01)
+            self.log.append(f"page {i}")
+            yield page
+        if self.error is not None:
+            raise self.error
+
+
+class FakeWorkScheduler:
+    async def run(self, channel: str, priority, func, /, *args, **kwargs):
+        return await func(*args, **kwargs)
+
+
+class FakeBot:
+    def __init__(self, pages: list) -> None:
+        self.user_id = BOT_USER
+        self.log = []
+        self.history = FakeHistory(pages, self.log)
+        self.dedup = DedupIndex(60, 100)
+        self.work_scheduler = FakeWorkScheduler()
+        self.progress = []
+
+    async def get_channel_configuration(self, channel: str, channel_name: str):
+        return SimpleNamespace()
+
+    async def add_comment(self, channel: str, text: str) -> dict:
+        self.progress.append(text)
+        return {"channel": "D1", "ts": "1.0"}
+
+    async def update_comment(self, channel: str, text: str, ts: str):
+        self.progress.append(text)
+
+
+def failure_message(ts: int) -> dict:
+    return {"ts": f"{ts}.0", "text": f"{consts.EVENT_FAILURE_PREFIX} job {ts} failed"}
+
+
+@pytest.fixture
+def bot(monkeypatch):
+    pages = [
+        [failure_message(6), {"ts": "5.0", "text": "not a failure"}, failure_message(4)],
+        [failure_message(3), failure_message(2), failure_message(1)],
+    ]
+    bot = FakeBot(pages)
+    monkeypatch.setattr(apply_command.consts, "PROGRESS_UPDATE_INTERVAL", 0)
+
+    async def get_failure_actions(self, channel_config):
+        bot.log.append(f"analyze {self._ts}")
+        await asyncio.sleep(0)
+        return ["action"]
+
+    async def apply_actions(self, actions):
+        bot.log.append(f"apply {self._ts}")
+        # Mark the message as handled, as the bot reaction does
+        for page in bot.history.pages:
+            for message in page:
+                if message["ts"] == self._ts:
+                    message["reactions"] = [{"name": "done", "users": [BOT_USER]}]
+
+    monkeypatch.setattr(HistoryMessageEvent, "get_failure_actions", get_failure_actions)
+    monkeypatch.setattr(HistoryMessageEvent, "apply_actions", apply_actions)
+    return bot
+
+
+def make_command(bot: FakeBot) -> ApplyCommand:
+    return ApplyCommand(bot, channel_id="C1", user_id="U1", user_name="user", channel_name="chan", text="apply 10")
+
+
+def test_messages_are_handled_while_the_history_is_read(bot):
+    asyncio.run(make_command(bot).run_task(messages_count=10))
+
+    assert bot.log.index("analyze 6.0") < bot.log.index("page 1")
+    assert sorted(entry for entry in bot.log if entry.startswith("apply")) == [
+        f"apply {ts}.0" for ts in (1, 2, 3, 4, 6)
+    ]
+    for ts in ("1.0", "2.0", "3.0", "4.0", "6.0"):
+        assert bot.log.index(f"analyze {ts}") < bot.log.index(f"apply {ts}")
+
+
+def test_progress_is_reported_until_the_summary(bot):
+    asyncio.run(make_command(bot).run_task(messages_count=10))
+
+    assert bot.progress[0].endswith("Reading channel history...")
+    assert any(text.startswith("Read 3 messages") for text in bot.progress)
+    assert bot.progress[-1] == "Finished, read 6 messages, 5 needed handling, actions applied on 5 messages"
+
+
+def test_failed_messages_are_handled_again_on_retry(bot, monkeypatch):
+    apply_actions = HistoryMessageEvent.apply_actions
+    failures = ["3.0"]
+
+    async def fail_once(self, actions):
+        if self._ts in failures:
+            failures.remove(self._ts)
+            raise RuntimeError("Slack is down")
+        await apply_actions(self, actions)
+
+    monkeypatch.setattr(HistoryMessageEvent, "apply_actions", fail_once)
+
+    with pytest.raises(RuntimeError, match="Failed to handle 1/5 messages"):
+        asyncio.run(make_command(bot).run_task(messages_count=10))
+    assert bot.progress[-1].endswith(", 1 failed")
+
+    bot.log.clear()
+    asyncio.run(make_command(bot).run_task(messages_count=10))
+    assert [entry for entry in bot.log if entry.startswith("apply")] == ["apply 3.0"]
+
+
+def test_progress_is_finished_if_the_history_read_fails(bot):
+    bot.history.error = RuntimeError("History is down")
+
+    with pytest.raises(RuntimeError, match="History is down"):
+        asyncio.run(make_command(bot).run_task(messages_count=10))
+    assert bot.progress[-1].startswith("Failed after reading 6 messages")
+
+    # The messages are not left marked as being handled, so the retry handles the ones that were not applied yet
+    bot.history.error = None
+    asyncio.run(make_command(bot).run_task(messages_count=10))
+    assert bot.progress[-1] == "Finished, read 6 messages, 3 needed handling, actions applied on 3 messages"
@@ -0,0 +1,155 @@
+import asyncio
+import sys
+import time
+from array import array
+from dataclasses import dataclass
+
+import pytest
+
+from bug_master.async_cache import AsyncCache, async_cache, estimate_size, get_caches_stats, make_key
+
+
+@dataclass
+class Job:
+    name: str
+    steps: list
+
+
+class Link:
+    def __init__(self, url: str) -> None:
+        self.url = url
+
+    @property
+    def cache_key(self) -> str:
+        return self.url
+
+
+def test_estimate_size_includes_referenced_objects():
+    steps = ["x" * 1000, "y" * 1000]
+    assert estimate_size(steps) >= sys.getsizeof(steps) + 2000
+    assert estimate_size(Job("job", steps)) > estimate_size(steps)
+    assert estimate_size({"a": steps, "b": steps}) < 2 * estimate_size(steps)  # Shared objects are counted once
+    assert estimate_size(array("d", range(1000))) >= 8000
+
+
+def test_make_key():
+    assert make_key(Link("https://a"), "glob*") == make_key(Link("https://a"), "glob*")
+    assert make_key(Link("https://a")) != make_key(Link("https://b"))
+    assert make_key({"b": 1, "a": [1]}) == make_key({"a": [1], "b": 1})
+    assert make_key(1, flag=True) == (1, ("flag", True))
+    with pytest.raises(TypeError):
+        make_key(bytearray(b"unhashable"))
+
+
+def test_get_or_load_is_single_flight():
+    async def run():
+        cache = AsyncCache("test", ttl=60, max_bytes=10000)
+        calls = 0
+
+        async def load():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "value"
+
+        values = await asyncio.gather(*[cache.get_or_load("key", load) for _ in range(5)])
+        return values, await cache.get_or_load("key", load), calls, cache.stats()
+
+    values, cached, calls, stats = asyncio.run(run())
+    assert values == ["value"] * 5
+    assert cached == "value"
+    assert calls == 1
+    assert (stats["hits"], stats["misses"]) == (1, 5)
+
+
+def test_failed_load_is_not_cached():
+    async def run():
+        cache = AsyncCache("test", ttl=60, max_bytes=10000)
+
+        async def fail():
+            raise ValueError("Failed")
+
+        async def load():
+            return "value"
+
+        with pytest.raises(ValueError):
+            await cache.get_or_load("key", fail)
+        return await cache.get_or_load("key", load)
+
+    assert asyncio.run(run()) == "value"
+
+
+def test_cancelled_caller_doesnt_cancel_the_load_of_the_others():
+    async def run():
+        cache = AsyncCache("test", ttl=60, max_bytes=10000)
+
+        async def load():
+            await asyncio.sleep(0.02)
+            return "value"
+
+        loop = asyncio.get_event_loop()
+        first = loop.create_task(cache.get_or_load("key", load))
+        second = loop.create_task(cache.get_or_load("key", load))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        value = await second
+        return first.cancelled(), value, cache.get("key")
+
+    assert asyncio.run(run()) == (True, "value", (True, "value"))
+
+
+def test_byte_budget_evicts_least_recently_used():
+    cache = AsyncCache("test", ttl=60, max_bytes=2 * estimate_size("x" * 1000) + 10)
+    cache.set("a", "a" * 1000)
+    cache.set("b", "b" * 1000)
+    cache.get("a")
+    cache.set("c", "c" * 1000)
+
+    assert cache.get("b") == (False, None)
+    assert cache.get("a")[0] and cache.get("c")[0]
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] == 2 * estimate_size("x" * 1000)
+
+
+def test_values_larger_than_the_budget_are_not_cached():
+    cache = AsyncCache("test", ttl=60, max_bytes=100)
+    cache.set("big", "x" * 1000)
+    assert cache.stats()["entries"] == 0
+
+
+def test_max_entries_and_ttl():
+    cache = AsyncCache("test", ttl=0.05, max_bytes=10000, max_entries=2)
+    for key in "abc":
+        cache.set(key, key)
+    assert cache.stats()["entries"] == 2
+
+    time.sleep(0.06)
+    assert cache.get("c") == (False, None)
+    stats = cache.stats()
+    assert (stats["expirations"], stats["bytes"]) == (1, estimate_size("b"))
+
+
+def test_decorated_method_is_cached_per_instance():
+    class Artifacts:
+        def __init__(self, url: str) -> None:
+            self.url = url
+            self.calls = 0
+
+        @property
+        def cache_key(self) -> str:
+            return self.url
+
+        @async_cache(ttl=60, max_bytes=10000)
+        async def files(self, pattern: str) -> list:
+            self.calls += 1
+            return [f"{self.url}/{pattern}"]
+
+    async def run():
+        a, b = Artifacts("https://a"), Artifacts("https://b")
+        return [await a.files("*.log"), await a.files("*.log"), await b.files("*.log")], a.calls
+
+    results, calls = asyncio.run(run())
+    assert results == [["https://a/*.log"], ["https://a/*.log"], ["https://b/*.log"]]
+    assert calls == 1
+    assert any(name.endswith("Artifacts.files") for name in get_caches_stats())
@@ -0,0 +1,95 @@
+import asyncio
+from contextlib import aclosing
+
+import pytest
+
+from bug_master.async_pool import AsyncPool
+
+
+def test_concurrency_is_bounded():
+    async def run():
+        running = max_running = 0
+
+        async def task(item: int) -> int:
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return item * 2
+
+        results = await AsyncPool(3).run(task, range(10))
+        return max_running, sorted(r.result for r in results)
+
+    assert asyncio.run(run()) == (3, [i * 2 for i in range(10)])
+
+
+def test_results_are_streamed_in_completion_order():
+    async def run():
+        async def task(delay: float) -> float:
+            await asyncio.sleep(delay)
+            return delay
+
+        return [r.result async for r in AsyncPool(3).map(task, [0.05, 0.01, 0.03])]
+
+    assert asyncio.run(run()) == [0.01, 0.03, 0.05]
+
+
+def test_items_are_consumed_lazily():
+    async def run():
+        consumed = []
+
+        def items():
+            for i in range(100):
+                consumed.append(i)
+                yield i
+
+        async with aclosing(AsyncPool(2).map(lambda i: asyncio.sleep(0, i), items())) as results:
+            async for _ in results:
+                break
+        return len(consumed)
+
+    assert asyncio.run(run()) <= 3
+
+
+def test_failures_and_timeouts_dont_affect_other_tasks():
+    async def run():
+        async def task(item: str) -> str:
+            if item == "fail":
+                raise ValueError("Failed")
+            if item == "hang":
+                await asyncio.sleep(3600)
+            return item
+
+        return {r.item: r for r in await AsyncPool(3, timeout=0.05).run(task, ["ok", "fail", "hang"])}
+
+    results = asyncio.run(run())
+    assert results["ok"].ok and results["ok"].result == "ok"
+    assert not results["fail"].ok and results["fail"].error_message == "ValueError: Failed"
+    assert results["hang"].timed_out
+
+
+def test_leaving_the_stream_cancels_tasks_in_flight():
+    async def run():
+        cancelled = []
+
+        async def task(item: int) -> int:
+            try:
+                await asyncio.sleep(0 if item == 0 else 3600)
+            except asyncio.CancelledError:
+                cancelled.append(item)
+                raise
+            return item
+
+        async with aclosing(AsyncPool(3).map(task, range(10))) as results:
+            async for result in results:
+                assert result.item == 0
+                break
+        return sorted(cancelled)
+
+    assert asyncio.run(run()) == [1, 2]  # The next items were never started
+
+
+def test_pool_size_must_be_positive():
+    with pytest.raises(ValueError):
+        AsyncPool(0)
@@ -0,0 +1,63 @@
+import asyncio
+
+from bug_master.entities import Action, Comment, CommentType, Reaction
+from bug_master.events import message_channel_event
+from bug_master.events.message_channel_event import MessageChannelEvent
+from bug_master.prow_job import ProwJobFailure
+
+
+def test_comments_are_joined_by_type_order_and_parse_mode():
+    comments = [
+        Comment("default", CommentType.DEFAULT_COMMENT),
+        Comment("error", CommentType.ERROR_INFO),
+        Comment("<@U1>", CommentType.ASSIGNEE, parse="full"),
+        Comment("more", CommentType.MORE_INFO),
+        Comment("default", CommentType.DEFAULT_COMMENT),  # Duplicated by another action
+    ]
+
+    joined = ProwJobFailure.join_comments(comments)
+
+    assert [(c.text, c.type, c.parse) for c in joined] == [
+        ("default\nmore", CommentType.DEFAULT_COMMENT, "none"),
+        ("<@U1>", CommentType.ASSIGNEE, "full"),
+        ("error", CommentType.ERROR_INFO, "none"),
+    ]
+
+
+def test_comments_sharing_the_parse_mode_are_joined_into_one():
+    comments = [Comment(f"comment {i}", CommentType(str(i))) for i in range(4)]
+
+    assert [c.text for c in ProwJobFailure.join_comments(comments)] == ["comment 3\ncomment 2\ncomment 1\ncomment 0"]
+    assert ProwJobFailure.join_comments([]) == []
+
+
+class FakeBot:
+    def __init__(self) -> None:
+        self.reactions = []
+        self.comments = []
+
+    async def add_reaction(self, channel: str, emoji: str, ts: str):
+        self.reactions.append((channel, emoji, ts))
+
+    async def add_comment(self, channel: str, text: str, ts: str = None, parse: str = "none"):
+        self.comments.append((channel, text, ts, parse))
+
+
+def test_coalesced_actions_are_posted_as_a_single_reply_per_parse_mode(monkeypatch):
+    monkeypatch.setattr(message_channel_event.consts, "COALESCE_COMMENTS", True)
+    bot = FakeBot()
+    event = MessageChannelEvent({"event": {"type": "message", "channel": "C1", "ts": "1.0", "text": ""}}, bot)
+    actions = [
+        Action("a1", "", "1.0", comment=Comment("error", CommentType.ERROR_INFO), reaction=Reaction("x")),
+        Action("a2", "", "1.0", comment=Comment("<@U1>", CommentType.ASSIGNEE, parse="full"), reaction=Reaction("x")),
+        Action("a3", "", "1.0", comment=Comment("more", CommentType.MORE_INFO), reaction=Reaction("y")),
+    ]
+
+    asyncio.run(event.apply_actions(actions))
+
+    assert sorted(bot.reactions) == [("C1", "x", "1.0"), ("C1", "y", "1.0")]
+    assert bot.comments == [
+        ("C1", "more", "1.0", "none"),
+        ("C1", "<@U1>", "1.0", "full"),
+        ("C1", "error", "1.0", "none"),
+    ]
@@ -0,0 +1,114 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import pytest
+
+from bug_master.bug_master_bot import BugMasterBot
+
+CHANNEL = "C1"
+
+
+class FakeLoad:
+    """Channel configuration load that blocks until released"""
+
+    def __init__(self, bot: BugMasterBot, config: object = "config", error: Exception = None) -> None:
+        self._bot = bot
+        self._config = config
+        self._error = error
+        self.released = asyncio.Event()
+        self.calls = 0
+        self.cancelled = 0
+
+    async def __call__(self, channel: str, *args, **kwargs) -> bool:
+        self.calls += 1
+        try:
+            await self.released.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self._error is not None:
+            raise self._error
+        self._bot._config[channel] = self._config
+        return True
+
+
+@asynccontextmanager
+async def make_bot() -> AsyncIterator[BugMasterBot]:
+    bot = BugMasterBot("xoxb-test", "xapp-test", "test-signing-secret")
+    try:
+        yield bot
+    finally:
+        await bot._sm_client.close()
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_concurrent_callers_share_a_single_load():
+    async def run():
+        async with make_bot() as bot:
+            bot._load_channel_configuration = load = FakeLoad(bot)
+            waiters = [asyncio.create_task(bot.get_channel_configuration(CHANNEL, "chan")) for _ in range(10)]
+            await settle()
+            load.released.set()
+            return load.calls, await asyncio.gather(*waiters)
+
+    calls, configs = asyncio.run(run())
+    assert calls == 1
+    assert configs == ["config"] * 10
+
+
+def test_cancelled_waiter_doesnt_cancel_the_load():
+    async def run():
+        async with make_bot() as bot:
+            bot._load_channel_configuration = load = FakeLoad(bot)
+            first = asyncio.create_task(bot.get_channel_configuration(CHANNEL, "chan"))
+            second = asyncio.create_task(bot.get_channel_configuration(CHANNEL, "chan"))
+            await settle()
+            first.cancel()
+            await settle()
+            load.released.set()
+            with pytest.raises(asyncio.CancelledError):
+                await first
+            return load, await second
+
+    load, config = asyncio.run(run())
+    assert (load.calls, load.cancelled) == (1, 0)
+    assert config == "config"
+
+
+def test_configuration_change_supersedes_the_load_in_flight():
+    async def run():
+        async with make_bot() as bot:
+            bot._load_channel_configuration = load = FakeLoad(bot, "stale")
+            bot._refresh_file_configuration = refresh = FakeLoad(bot, "changed")
+            waiters = [asyncio.create_task(bot.get_channel_configuration(CHANNEL, "chan")) for _ in range(3)]
+            await settle()
+            change = asyncio.create_task(bot.refresh_file_configuration(CHANNEL, []))
+            await settle()
+            refresh.released.set()
+            return load, await change, await asyncio.gather(*waiters)
+
+    load, changed, configs = asyncio.run(run())
+    assert (load.calls, load.cancelled) == (1, 1)
+    assert changed is True
+    assert configs == ["changed"] * 3
+
+
+def test_load_failure_is_raised_to_all_waiters():
+    async def run():
+        async with make_bot() as bot:
+            bot._load_channel_configuration = load = FakeLoad(bot, error=RuntimeError("Slack is down"))
+            waiters = [asyncio.create_task(bot.get_channel_configuration(CHANNEL, "chan")) for _ in range(3)]
+            await settle()
+            load.released.set()
+            results = await asyncio.gather(*waiters, return_exceptions=True)
+            return results, bot._config_loads
+
+    results, loads = asyncio.run(run())
+    assert [str(r) for r in results] == ["Slack is down"] * 3
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert loads == {}  # The next caller starts a new load
@@ -0,0 +1,140 @@
+import asyncio
+import sqlite3
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from bug_master import routes
+from bug_master.commands.apply_command import HistoryMessageEvent
+from bug_master.dedup import DedupIndex
+from bug_master.events.message_channel_event import MessageChannelEvent
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_index(request, tmp_path):
+    def make(ttl: int = 60, max_keys: int = 100) -> DedupIndex:
+        return DedupIndex(ttl, max_keys, str(tmp_path / "dedup.db") if request.param == "sqlite" else None)
+
+    return make
+
+
+def test_is_duplicate(make_index):
+    async def run():
+        index = make_index()
+        return [
+            await index.is_duplicate("event:1", "message:C1:1.0"),
+            await index.is_duplicate("event:1"),
+            await index.is_duplicate("event:2", "message:C1:1.0"),  # Same message delivered by another event
+            await index.is_duplicate("event:3"),
+            await index.is_duplicate(),
+        ]
+
+    assert asyncio.run(run()) == [False, True, True, False, False]
+
+
+def test_rejected_keys_are_not_added(make_index):
+    async def run():
+        index = make_index()
+        return [
+            await index.is_duplicate("event:1"),
+            await index.is_duplicate("event:1", "event:2"),
+            await index.is_duplicate("event:2"),
+        ]
+
+    assert asyncio.run(run()) == [False, True, False]
+
+
+def test_forget(make_index):
+    async def run():
+        index = make_index()
+        await index.is_duplicate("event:1", "message:C1:1.0")
+        await index.forget("message:C1:1.0")
+        return await index.is_duplicate("message:C1:1.0"), await index.is_duplicate("event:1")
+
+    assert asyncio.run(run()) == (False, True)
+
+
+def test_keys_expire(make_index):
+    async def run():
+        index = make_index(ttl=0.1)
+        await index.is_duplicate("event:1")
+        time.sleep(0.15)
+        return await index.is_duplicate("event:1")
+
+    assert not asyncio.run(run())
+
+
+def test_memory_index_is_bounded():
+    async def run():
+        index = DedupIndex(ttl=60, max_keys=2)
+        for i in range(3):
+            await index.is_duplicate(f"event:{i}")
+
+        # The oldest key was evicted
+        return await index.is_duplicate("event:0"), await index.is_duplicate("event:2")
+
+    assert asyncio.run(run()) == (False, True)
+
+
+def _message_event(event_class, bot, event_id: str = "Ev1") -> MessageChannelEvent:
+    body = {"event_id": event_id, "event": {"type": "message", "channel": "C1", "ts": "1700000000.0001", "text": ""}}
+    return event_class(body, bot)
+
+
+def test_apply_is_deduplicated_apart_from_live_messages():
+    async def run():
+        bot = SimpleNamespace(dedup=DedupIndex(ttl=60, max_keys=100))
+        live = _message_event(MessageChannelEvent, bot)
+        history = _message_event(HistoryMessageEvent, bot, event_id=None)
+        return (
+            await bot.dedup.is_duplicate(*live.dedup_keys),
+            history.dedup_keys,
+            await bot.dedup.is_duplicate(*history.dedup_keys),
+            await bot.dedup.is_duplicate(*history.dedup_keys),
+        )
+
+    assert asyncio.run(run()) == (False, ["apply:C1:1700000000.0001"], False, True)
+
+
+def test_forget_message_keeps_the_event_id():
+    async def run():
+        bot = SimpleNamespace(dedup=DedupIndex(ttl=60, max_keys=100))
+        event = _message_event(MessageChannelEvent, bot)
+        await bot.dedup.is_duplicate(*event.dedup_keys)
+
+        await event.forget_message()
+        return await bot.dedup.is_duplicate("event:Ev1"), await bot.dedup.is_duplicate(event.message_dedup_key)
+
+    assert asyncio.run(run()) == (True, False)
+
+
+def test_event_is_acknowledged_while_the_dedup_store_is_locked(tmp_path, monkeypatch):
+    path = str(tmp_path / "dedup.db")
+    monkeypatch.setattr(routes.bot, "_dedup", DedupIndex(ttl=60, max_keys=100, store_path=path))
+    monkeypatch.setattr(routes.consts, "DEDUP_ACK_TIMEOUT", 0.2)
+    body = {"event_id": "Ev1", "event": {"type": "message", "channel": "C1", "ts": "1700000000.0001", "text": "hi"}}
+    locker = sqlite3.connect(path, isolation_level=None)
+
+    async def ticker(ticks: list):
+        while True:
+            await asyncio.sleep(0.01)
+            ticks.append(time.monotonic())
+
+    async def run():
+        ticks = []
+        task = asyncio.get_event_loop().create_task(ticker(ticks))
+        locker.execute("BEGIN IMMEDIATE")  # Another process holds the write lock
+        started_at = time.monotonic()
+        try:
+            event, response = await routes.RouteValidator.validate_event_body(body, is_retry=False)
+            elapsed = time.monotonic() - started_at
+        finally:
+            locker.execute("COMMIT")
+            task.cancel()
+        return event, response, elapsed, len(ticks)
+
+    event, response, elapsed, ticks = asyncio.run(run())
+    assert event is not None and response is None  # Accepted as a new event
+    assert elapsed < 1
+    assert ticks >= 10  # The event loop kept running meanwhile
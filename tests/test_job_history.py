@@ -0,0 +1,76 @@
+import random
+from datetime import datetime, timezone
+
+from bug_master.job_history import JobHistories, JobHistory, WindowStats
+from bug_master.utils import JobStatus
+
+# (build id, start time, succeeded), unordered
+RUNS = [("4", 400.0, False), ("1", 100.0, True), ("3", 300.0, False), ("2", 200.0, True), ("5", 500.0, False)]
+
+
+def _brute_force_stats(runs, since: float = None, last: int = None) -> WindowStats:
+    window = sorted(runs, key=lambda run: run[1])
+    if since is not None:
+        window = [run for run in window if run[1] >= since]
+    if last is not None:
+        window = window[-last:] if last else []
+    if not window:
+        return WindowStats(0, 0, None, 0)
+
+    streak = 0
+    for run in reversed(window):
+        if run[2] != window[-1][2]:
+            break
+        streak += 1
+    return WindowStats(len(window), sum(run[2] for run in window), window[-1][2], streak)
+
+
+def test_window_stats():
+    history = JobHistory(RUNS)
+    assert history.stats() == WindowStats(total=5, succeeded=2, last_succeeded=False, streak=3)
+    assert history.stats(since=250) == WindowStats(total=3, succeeded=0, last_succeeded=False, streak=3)
+    assert history.stats(runs=4) == WindowStats(total=4, succeeded=1, last_succeeded=False, streak=3)
+    assert history.stats(since=150, runs=2) == WindowStats(total=2, succeeded=0, last_succeeded=False, streak=2)
+    assert history.stats(since=600) == WindowStats(0, 0, None, 0)
+    assert history.failures(runs=2) == 2
+
+
+def test_window_stats_properties():
+    stats = WindowStats(total=4, succeeded=1, last_succeeded=False, streak=2)
+    assert (stats.failed, stats.success_rate, stats.last_failed) == (3, 25.0, True)
+    assert WindowStats(0, 0, None, 0).success_rate == 0.0
+    assert not WindowStats(0, 0, None, 0).last_failed
+
+
+def test_stats_match_filtering_the_runs():
+    rng = random.Random(0)
+    runs = [(str(i), rng.uniform(0, 1000), rng.random() < 0.7) for i in range(200)]
+    history = JobHistory(runs)
+    for _ in range(200):
+        since = rng.choice([None, rng.uniform(0, 1100)])
+        last = rng.choice([None, rng.randint(0, 250)])
+        assert history.stats(since, last) == _brute_force_stats(runs, since, last)
+
+
+def test_statuses_round_trip():
+    statuses = JobHistory(RUNS).to_statuses()
+    assert [status.job_id for status in statuses] == ["5", "4", "3", "2", "1"]
+
+    history = JobHistory.from_statuses(statuses)
+    assert history.stats() == JobHistory(RUNS).stats()
+    assert history.oldest == 100.0
+
+
+def test_non_numeric_build_ids():
+    history = JobHistory.from_statuses([JobStatus("build-a", datetime.fromtimestamp(1, timezone.utc), True)])
+    assert history.to_statuses()[0].job_id == "build-a"
+
+
+def test_empty_history():
+    history = JobHistory()
+    assert (len(history), history.oldest, history.stats()) == (0, None, WindowStats(0, 0, None, 0))
+
+
+def test_histories_stats():
+    histories = JobHistories(a=JobHistory(RUNS), b=JobHistory())
+    assert histories.stats(runs=1) == {"a": WindowStats(1, 0, False, 1), "b": WindowStats(0, 0, None, 0)}
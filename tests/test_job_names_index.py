@@ -0,0 +1,120 @@
+import asyncio
+import random
+
+from bug_master.interactive import JobsDropDown
+from bug_master.job_names_index import ChannelJobsIndexes, JobNamesIndex, get_channel_jobs_indexes
+from bug_master.utils import Utils
+
+JOBS = [
+    "periodic-ci-openshift-release-master-nightly-4.16-e2e-aws",
+    "periodic-ci-openshift-release-master-nightly-4.16-e2e-metal-ipi",
+    "periodic-ci-openshift-assisted-test-infra-master-e2e-metal-assisted",
+    "periodic-ci-openshift-release-master-ci-4.16-upgrade-from-stable-4.15-e2e-aws",
+]
+
+
+def _brute_force(jobs, query: str) -> set:
+    return {job for job in jobs if query.lower() in job.lower()}
+
+
+def test_prefix_matches_come_first():
+    index = JobNamesIndex(JOBS)
+    results = index.search("metal", limit=10)
+    assert set(results) == _brute_force(JOBS, "metal")
+    assert index.search("assisted", limit=10) == [JOBS[2]]
+    assert index.search("upgrade", limit=1) == [JOBS[3]]
+
+
+def test_substring_matches():
+    index = JobNamesIndex(JOBS)
+    assert set(index.search("etal-ip", limit=10)) == {JOBS[1]}
+    assert index.search("4.16-e2e", limit=10) == sorted(JOBS[:2])
+    assert index.search("no-such-job", limit=10) == []
+
+
+def test_empty_query_and_limit():
+    index = JobNamesIndex(JOBS + JOBS)
+    assert len(index) == len(JOBS)
+    assert index.search("  ", limit=2) == sorted(JOBS)[:2]
+    assert len(index.search("e2e", limit=2)) == 2
+
+
+def test_search_matches_filtering_the_jobs():
+    rng = random.Random(0)
+    words = ["aws", "gcp", "metal", "e2e", "upgrade", "serial", "ipi", "ovn", "4.15", "4.16"]
+    jobs = {"periodic-" + "-".join(rng.sample(words, 4)) for _ in range(500)}
+    index = JobNamesIndex(jobs)
+    for query in ["aws", "e2e-ovn", "4.1", "l-ip", "OVN", "up"]:
+        assert set(index.search(query, limit=len(jobs))) == _brute_force(jobs, query)
+
+
+def test_channel_index_is_rebuilt_only_when_jobs_change(monkeypatch):
+    jobs = {"prow": list(JOBS)}
+
+    async def get_jobs(_prow_configurations):
+        return jobs["prow"]
+
+    monkeypatch.setattr(Utils, "get_jobs", get_jobs)
+
+    async def run():
+        indexes = ChannelJobsIndexes()
+        first = await indexes.get_index("C1", {})
+        same = await indexes.get_index("C1", {})
+        jobs["prow"] = JOBS[:1]
+        changed = await indexes.get_index("C1", {})
+        indexes.drop("C1")
+        return first, same, changed, indexes.get_loaded_index("C1")
+
+    first, same, changed, dropped = asyncio.run(run())
+    assert first is same
+    assert changed is not first and len(changed) == 1
+    assert dropped is None
+
+
+def test_index_is_loaded_in_background_once(monkeypatch):
+    async def get_jobs(_prow_configurations):
+        return JOBS
+
+    monkeypatch.setattr(Utils, "get_jobs", get_jobs)
+
+    async def run():
+        indexes = ChannelJobsIndexes()
+        loads = 0
+
+        async def get_prow_configurations():
+            nonlocal loads
+            loads += 1
+            await asyncio.sleep(0.01)
+            return {"prow": "config"}
+
+        indexes.load_in_background("C1", get_prow_configurations)
+        indexes.load_in_background("C1", get_prow_configurations)
+        before = indexes.get_loaded_index("C1")
+        await asyncio.sleep(0.05)
+        return before, indexes.get_loaded_index("C1"), loads
+
+    before, after, loads = asyncio.run(run())
+    assert before is None
+    assert len(after) == len(JOBS)
+    assert loads == 1
+
+
+def test_drop_down_options_are_answered_from_the_loaded_index(monkeypatch):
+    async def get_jobs(_prow_configurations):
+        return JOBS
+
+    monkeypatch.setattr(Utils, "get_jobs", get_jobs)
+
+    async def run():
+        not_loaded = await JobsDropDown.get_options(channel_id="C-options", query="metal")
+        await get_channel_jobs_indexes().get_index("C-options", {})
+        try:
+            return not_loaded, await JobsDropDown.get_options(channel_id="C-options", query="assisted")
+        finally:
+            get_channel_jobs_indexes().drop("C-options")
+
+    not_loaded, options = asyncio.run(run())
+    assert not_loaded == []
+    assert [option["value"] for option in options] == [JOBS[2]]
+    assert JobsDropDown.get_channel_id("jobs_list|C-options") == "C-options"
+    assert JobsDropDown.get_channel_id("other_list|C-options") is None
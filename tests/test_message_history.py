@@ -0,0 +1,158 @@
+import asyncio
+import time
+
+import pytest
+
+from bug_master.message_history import MessageHistory
+
+BASE = int(time.time()) - 10000  # Messages timestamps are relative to it, within the history retention
+
+
+class FakeChannel:
+    """A channel history served like conversations.history, newest first and paginated by cursor"""
+
+    def __init__(self, timestamps) -> None:
+        self.messages = [_message(ts) for ts in sorted(timestamps, reverse=True)]
+        self.calls = []
+
+    async def fetch(self, channel: str, limit: int, cursor: str | None, oldest: float, latest: float | None):
+        self.calls.append((oldest, latest))
+        in_range = [m for m in self.messages if float(m["ts"]) > oldest and (latest is None or float(m["ts"]) < latest)]
+        start = int(cursor or 0)
+        page = in_range[start : start + limit]
+        return page, str(start + limit) if start + limit < len(in_range) else None
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store_path(request, tmp_path):
+    return str(tmp_path / "messages.db") if request.param == "sqlite" else None
+
+
+def _message(ts: float) -> dict:
+    return {"ts": f"{BASE + ts:.6f}", "text": f"message {ts}"}
+
+
+def _timestamps(messages) -> list:
+    return [float(m["ts"]) - BASE for m in messages]
+
+
+async def _read(history: MessageHistory, channel: str, since: float = 0, limit: int = None) -> list:
+    return [message async for page in history.get_messages(channel, since, limit) for message in page]
+
+
+def test_history_is_mirrored_once(store_path):
+    async def run():
+        channel = FakeChannel(range(1, 26))
+        history = MessageHistory(channel.fetch, store_path, page_size=10, max_staleness=60)
+        first = await _read(history, "C1", since=BASE + 10)
+        calls = len(channel.calls)
+        second = await _read(history, "C1", since=BASE + 20)
+        return first, second, calls, len(channel.calls)
+
+    first, second, first_calls, calls = asyncio.run(run())
+    assert _timestamps(first) == list(range(25, 10, -1))
+    assert _timestamps(second) == list(range(25, 20, -1))
+    assert first_calls == 2  # Two pages
+    assert calls == first_calls
+
+
+def test_only_new_messages_are_fetched_once_stale(store_path):
+    async def run():
+        channel = FakeChannel(range(1, 11))
+        history = MessageHistory(channel.fetch, store_path, page_size=100, max_staleness=0)
+        await _read(history, "C1", since=BASE)
+        channel.messages.insert(0, _message(11))
+        messages = await _read(history, "C1", since=BASE)
+        return messages, channel.calls
+
+    messages, calls = asyncio.run(run())
+    assert _timestamps(messages) == list(range(11, 0, -1))
+    assert calls[-1] == (BASE + 10, None)
+
+
+def test_older_messages_are_backfilled(store_path):
+    async def run():
+        channel = FakeChannel(range(1, 21))
+        history = MessageHistory(channel.fetch, store_path, page_size=5, max_staleness=60)
+        await _read(history, "C1", since=BASE + 15.5)
+        calls = len(channel.calls)
+        messages = await _read(history, "C1", since=BASE + 5.5)
+        return messages, channel.calls[calls:]
+
+    messages, calls = asyncio.run(run())
+    assert _timestamps(messages) == list(range(20, 5, -1))
+    assert calls == [(BASE + 5.5, BASE + 15.5), (BASE + 5.5, BASE + 11)]
+
+
+def test_pages_are_read_as_the_iteration_reaches_them(store_path):
+    async def run():
+        channel = FakeChannel(range(1, 101))
+        history = MessageHistory(channel.fetch, store_path, page_size=10, max_staleness=60)
+        pages = history.get_messages("C1")
+        first = await anext(pages)
+        calls = len(channel.calls)
+        second = await anext(pages)
+        await pages.aclose()
+        return first, second, calls, len(channel.calls)
+
+    first, second, first_calls, calls = asyncio.run(run())
+    assert _timestamps(first) == list(range(100, 90, -1))
+    assert _timestamps(second) == list(range(90, 80, -1))
+    assert (first_calls, calls) == (1, 2)
+
+
+def test_limit(store_path):
+    async def run():
+        channel = FakeChannel(range(1, 101))
+        history = MessageHistory(channel.fetch, store_path, page_size=10, max_staleness=60)
+        return await _read(history, "C1", limit=15), len(channel.calls)
+
+    messages, calls = asyncio.run(run())
+    assert _timestamps(messages) == list(range(100, 85, -1))
+    assert calls == 2
+
+
+def test_live_updates(store_path):
+    async def run():
+        channel = FakeChannel([1, 2])
+        history = MessageHistory(channel.fetch, store_path, page_size=10, max_staleness=60)
+        history.add_message("C1", _message(3))  # Not mirrored yet, ignored
+        await _read(history, "C1")
+
+        history.add_message("C1", _message(4))
+        history.delete_message("C1", _message(1)["ts"])
+        history.add_reaction("C1", _message(2)["ts"], "fire", "U1")
+        history.add_reaction("C1", _message(2)["ts"], "fire", "U1")
+        history.add_reply("C1", _message(2)["ts"], "U2")
+        return await _read(history, "C1")
+
+    messages = asyncio.run(run())
+    assert _timestamps(messages) == [4, 2]
+    assert messages[1]["reactions"] == [{"name": "fire", "users": ["U1"], "count": 1}]
+    assert (messages[1]["reply_count"], messages[1]["reply_users"]) == (1, ["U2"])
+
+
+def test_messages_older_than_the_retention_are_pruned(store_path):
+    async def run():
+        channel = FakeChannel([9900, 9990])
+        history = MessageHistory(channel.fetch, store_path, page_size=10, max_staleness=60, retention=50)
+        return await _read(history, "C1")
+
+    assert len(asyncio.run(run())) == 1
+
+
+def test_memory_store_keeps_the_newest_messages_of_each_channel():
+    async def run():
+        channel = FakeChannel(range(1, 11))
+        history = MessageHistory(channel.fetch, page_size=100, max_staleness=60, max_messages=5)
+        first = await _read(history, "C1")
+        history.add_message("C1", _message(11))
+        calls = len(channel.calls)
+        second = await _read(history, "C1", since=BASE + 3.5)
+        return first, second, channel.calls[calls:]
+
+    first, second, calls = asyncio.run(run())
+    assert _timestamps(first) == list(range(10, 0, -1))
+    # The dropped messages are fetched again when they are read
+    assert _timestamps(second) == [11] + list(range(10, 3, -1))
+    assert calls == [(BASE + 3.5, BASE + 7)]
@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+from bug_master.async_cache import get_caches_stats
+from bug_master.events.event_handler import EventHandler
+from bug_master.metadata_cache import MetadataCache
+
+
+def test_get_set_and_invalidate():
+    cache = MetadataCache("test_metadata", ttl=60, max_size=10)
+    assert cache.get(("channel", "C1")) is None
+    cache.set(("channel", "C1"), {"name": "ci"})
+    assert cache.get(("channel", "C1")) == {"name": "ci"}
+
+    cache.invalidate(("channel", "C1"))
+    assert cache.get(("channel", "C1")) is None
+    assert cache.stats() == {"entries": 0, "hits": 1, "misses": 2, "evictions": 0, "expirations": 0}
+
+
+def test_entries_expire():
+    cache = MetadataCache("test_metadata", ttl=0.05, max_size=10)
+    cache.set("key", "value")
+    time.sleep(0.06)
+    assert cache.get("key") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = MetadataCache("test_metadata", ttl=60, max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_stats_are_exported():
+    cache = MetadataCache("test_exported_metadata", ttl=60, max_size=10)
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("b")
+
+    assert get_caches_stats()["test_exported_metadata"] == {
+        "entries": 1,
+        "hits": 1,
+        "misses": 1,
+        "evictions": 0,
+        "expirations": 0,
+    }
+
+
+def test_member_and_im_events_invalidate_the_user_direct_message_channels():
+    class FakeBot:
+        def __init__(self) -> None:
+            self.invalidated = []
+
+        def invalidate_im_channels(self, user: str):
+            self.invalidated.append(("im", user))
+
+        def invalidate_channel_info(self, channel: str):
+            self.invalidated.append(("channel", channel))
+
+        async def get_channel_info(self, channel: str) -> dict:
+            return {"id": channel}
+
+    async def run():
+        bot = FakeBot()
+        for body in (
+            {"event": {"type": "im_created", "user": "U1", "channel": {"id": "D1"}}},
+            {"event": {"type": "member_left_channel", "user": "U2", "channel": "C1"}},
+        ):
+            factory = EventHandler.get_event_factory(body["event"]["type"], "")
+            await factory(body, bot).get_channel_info()
+        return bot.invalidated
+
+    assert asyncio.run(run()) == [("im", "U1"), ("channel", "D1"), ("im", "U2"), ("channel", "C1")]
@@ -0,0 +1,99 @@
+import asyncio
+import time
+
+from prometheus_client import CollectorRegistry, generate_latest
+from starlette.applications import Starlette
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from bug_master import middleware, routes
+from bug_master.async_cache import AsyncCache, register_cache
+from bug_master.metrics import EVENT_ACK_LATENCY, StatsCollector
+
+
+def _registry() -> CollectorRegistry:
+    registry = CollectorRegistry()
+    registry.register(
+        StatsCollector(
+            lambda: {"event": {"depth": 3, "busy_workers": 2}},
+            lambda: {"queued": {"live": 1, "bulk": 4}, "running": {"live": 2, "bulk": 1}},
+            lambda: {"queued": {"live": 0, "bulk": 7}},
+        )
+    )
+    return registry
+
+
+def test_queues_are_exported():
+    registry = _registry()
+    assert registry.get_sample_value("bugmaster_task_queue_depth", {"kind": "event"}) == 3
+    assert registry.get_sample_value("bugmaster_task_queue_in_flight", {"kind": "event"}) == 2
+    assert registry.get_sample_value("bugmaster_work_queued", {"priority": "bulk"}) == 4
+    assert registry.get_sample_value("bugmaster_work_in_flight", {"priority": "live"}) == 2
+    assert registry.get_sample_value("bugmaster_slack_api_queued", {"priority": "bulk"}) == 7
+
+
+def test_caches_are_exported():
+    cache = AsyncCache("test_metrics_cache", ttl=60, max_bytes=10000)
+    register_cache(cache)
+
+    async def load():
+        return "value"
+
+    async def run():
+        for _ in range(4):
+            await cache.get_or_load("key", load)
+
+    asyncio.run(run())  # A miss and 3 hits
+
+    registry = _registry()
+    labels = {"cache": "test_metrics_cache"}
+    assert registry.get_sample_value("bugmaster_cache_entries", labels) == 1
+    assert registry.get_sample_value("bugmaster_cache_max_bytes", labels) == 10000
+    assert registry.get_sample_value("bugmaster_cache_hits_total", labels) == 3
+    assert registry.get_sample_value("bugmaster_cache_hit_ratio", labels) == 0.75
+    assert b"bugmaster_cache_bytes" in generate_latest(registry)
+
+
+def test_event_ack_latency_includes_the_signature_verification(monkeypatch):
+    def slow_verification(body: bytes, headers: dict) -> bool:
+        time.sleep(0.1)
+        return True
+
+    async def accept_event(body: dict, is_retry: bool, forwarded: bool = False) -> Response:
+        return JSONResponse({"msg": "Success", "Code": 200})
+
+    monkeypatch.setattr(middleware._signature_verifier, "is_valid_request", slow_verification)
+    monkeypatch.setattr(routes, "accept_event", accept_event)
+    latency = EVENT_ACK_LATENCY.labels("webhook")
+    before = latency._sum.get()
+
+    async def run():
+        sent = []
+        received = [{"type": "http.request", "body": b'{"type": "event_callback"}', "more_body": False}]
+        scope = {
+            "type": "http",
+            "method": "POST",
+            "path": "/slack/events",
+            "raw_path": b"/slack/events",
+            "query_string": b"",
+            "headers": [(b"content-type", b"application/json")],
+            "server": ("testserver", 80),
+            "scheme": "http",
+            "root_path": "",
+            "http_version": "1.1",
+        }
+
+        async def receive():
+            return received.pop(0) if received else {"type": "http.disconnect"}
+
+        async def send(message: dict):
+            sent.append(message)
+
+        app = Starlette(routes=[Route("/slack/events", routes.events, methods=["POST"])])
+        app.add_middleware(BaseHTTPMiddleware, dispatch=middleware.exceptions_middleware)
+        await app(scope, receive, send)
+        return sent[0]["status"]
+
+    assert asyncio.run(run()) == 200
+    assert latency._sum.get() - before >= 0.1
@@ -0,0 +1,69 @@
+import asyncio
+
+from bug_master.progress import ProgressReporter
+
+
+class FakeBot:
+    def __init__(self) -> None:
+        self.comments = []
+        self.updates = []
+
+    async def add_comment(self, channel: str, text: str) -> dict:
+        self.comments.append((channel, text))
+        return {"channel": "D1", "ts": "1.0"}
+
+    async def update_comment(self, channel: str, text: str, ts: str):
+        self.updates.append((channel, text, ts))
+
+
+def test_updates_are_throttled_to_the_latest_progress():
+    async def run():
+        bot = FakeBot()
+        reporter = ProgressReporter(bot, "U1", interval=0.05)
+        await reporter.start("Starting")
+        for i in range(10):
+            reporter.update(lambda i=i: f"{i + 1}/10")
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.06)
+        await reporter.finish("Done")
+        return bot
+
+    bot = asyncio.run(run())
+    assert bot.comments == [("U1", "Starting")]
+    texts = [text for _, text, _ in bot.updates]
+    assert 2 <= len(texts) <= 4
+    assert texts[-2:] == ["10/10", "Done"]
+    assert all(channel == "D1" and ts == "1.0" for channel, _, ts in bot.updates)
+
+
+def test_pending_update_is_dropped_on_finish():
+    async def run():
+        bot = FakeBot()
+        reporter = ProgressReporter(bot, "U1", interval=60)
+        await reporter.start("Starting")
+        reporter.update(lambda: "1/10")
+        await reporter.finish("Done")
+        await asyncio.sleep(0)
+        return bot.updates
+
+    assert asyncio.run(run()) == [("D1", "Done", "1.0")]
+
+
+def test_finish_posts_a_message_if_the_progress_message_failed():
+    class FailingBot(FakeBot):
+        async def add_comment(self, channel: str, text: str) -> dict:
+            if text == "Starting":
+                raise RuntimeError("Slack is down")
+            return await super().add_comment(channel, text)
+
+    async def run():
+        bot = FailingBot()
+        reporter = ProgressReporter(bot, "U1")
+        await reporter.start("Starting")
+        reporter.update(lambda: "1/10")  # Nothing to update
+        await reporter.finish("Done")
+        return bot
+
+    bot = asyncio.run(run())
+    assert bot.comments == [("U1", "Done")]
+    assert bot.updates == []
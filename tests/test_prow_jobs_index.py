@@ -0,0 +1,58 @@
+import json
+from datetime import datetime
+
+from bug_master.prow_jobs_index import ProwJobsIndex, ProwJobsSnapshot
+
+
+def _prow_job(job: str, build_id: str, start_time: str, state: str, type_: str = "periodic") -> dict:
+    return {
+        "spec": {"type": type_, "job": job},
+        "status": {"startTime": start_time, "state": state, "build_id": build_id},
+    }
+
+
+def _timestamp(value: str) -> float:
+    return datetime.fromisoformat(value).timestamp()
+
+
+LISTING = {
+    "items": [
+        _prow_job("periodic-e2e", "3", "2026-10-19T10:00:00Z", "failure"),
+        _prow_job("periodic-e2e", "1", "2026-10-19T08:00:00Z", "success"),
+        _prow_job("periodic-e2e", "2", "2026-10-19T09:00:00Z", "failure"),
+        _prow_job("periodic-e2e", "4", "2026-10-19T11:00:00Z", "pending"),
+        _prow_job("periodic-upgrade", "5", "2026-10-19T07:00:00Z", "success"),
+        _prow_job("pull-e2e", "6", "2026-10-19T06:00:00Z", "failure", type_="presubmit"),
+    ]
+}
+
+
+def test_load_listing():
+    snapshot = ProwJobsIndex._load(json.dumps(LISTING).encode())
+    assert set(snapshot.jobs) == {"periodic-e2e", "periodic-upgrade"}
+    assert snapshot.oldest == _timestamp("2026-10-19T07:00:00Z")
+
+    statuses = snapshot.jobs["periodic-e2e"].to_statuses()
+    assert [(s.job_id, s.succeeded) for s in statuses] == [("3", False), ("2", False), ("1", True)]
+    assert statuses[0].started.timestamp() == _timestamp("2026-10-19T10:00:00Z")
+
+
+def test_snapshot_covers_windows_after_its_oldest_run():
+    snapshot = ProwJobsIndex._parse(LISTING)
+    assert snapshot.get_history("periodic-e2e", since=_timestamp("2026-10-19T08:30:00Z")) is not None
+    assert snapshot.get_history("periodic-e2e", since=_timestamp("2026-10-19T06:00:00Z")) is None
+    assert len(snapshot.get_history("periodic-new", since=_timestamp("2026-10-19T08:30:00Z"))) == 0
+
+    assert snapshot.get_history("periodic-e2e", runs=3) is not None
+    assert snapshot.get_history("periodic-e2e", runs=4) is None
+
+
+def test_get_histories_splits_the_uncovered_jobs():
+    snapshot = ProwJobsIndex._parse(LISTING)
+    histories, uncovered = snapshot.get_histories(["periodic-e2e", "periodic-upgrade"], runs=2)
+    assert list(histories) == ["periodic-e2e"]
+    assert uncovered == ["periodic-upgrade"]
+
+
+def test_empty_snapshot_covers_nothing():
+    assert ProwJobsSnapshot().get_history("periodic-e2e") is None
@@ -0,0 +1,129 @@
+import asyncio
+import time
+
+import pytest
+
+from bug_master.refresh import RefreshingCache, RefreshScheduler
+
+
+class Loader:
+    def __init__(self, delay: float = 0) -> None:
+        self.delay = delay
+        self.calls = 0
+        self.error: Exception | None = None
+
+    async def __call__(self, key: str) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return f"{key}:{self.calls}"
+
+
+def test_concurrent_misses_share_a_load():
+    async def run():
+        loader = Loader(delay=0.01)
+        cache = RefreshingCache("test", loader, ttl=60)
+        values = await asyncio.gather(*[cache.get("a") for _ in range(5)])
+        return values, await cache.get("a"), loader.calls, cache.stats()
+
+    values, cached, calls, stats = asyncio.run(run())
+    assert values == ["a:1"] * 5
+    assert cached == "a:1"
+    assert calls == 1
+    assert (stats["hits"], stats["misses"]) == (1, 5)
+
+
+def test_stale_value_is_returned_while_reloading():
+    async def run():
+        loader = Loader(delay=0.01)
+        cache = RefreshingCache("test", loader, ttl=0.05, max_stale=10)
+        await cache.get("a")
+        await asyncio.sleep(0.06)
+        stale = await cache.get("a")
+        await asyncio.sleep(0.02)
+        return stale, await cache.get("a"), cache.stats()["stale_hits"]
+
+    assert asyncio.run(run()) == ("a:1", "a:2", 1)
+
+
+def test_value_older_than_max_stale_is_reloaded_before_returning():
+    async def run():
+        cache = RefreshingCache("test", Loader(), ttl=0.01, max_stale=0.05)
+        await cache.get("a")
+        await asyncio.sleep(0.06)
+        return await cache.get("a")
+
+    assert asyncio.run(run()) == "a:2"
+
+
+def test_failed_load_keeps_the_last_good_value():
+    async def run():
+        loader = Loader()
+        cache = RefreshingCache("test", loader, ttl=0.01, max_stale=10, retry_interval=60)
+        await cache.get("a")
+        loader.error = ValueError("Unavailable")
+        await asyncio.sleep(0.02)
+        await cache.get("a")  # Reloads in the background, and fails
+        await asyncio.sleep(0)
+        values = [await cache.get("a") for _ in range(3)]
+        return values, loader.calls
+
+    values, calls = asyncio.run(run())
+    assert values == ["a:1"] * 3
+    assert calls == 2  # Not retried before the retry interval
+
+
+def test_failed_load_without_a_value_raises():
+    async def run():
+        loader = Loader()
+        loader.error = ValueError("Unavailable")
+        cache = RefreshingCache("test", loader, ttl=60, retry_interval=60)
+        with pytest.raises(ValueError):
+            await cache.get("a")
+        with pytest.raises(ValueError):
+            await cache.get("a")
+        return loader.calls
+
+    assert asyncio.run(run()) == 1
+
+
+def test_least_recently_read_values_are_evicted():
+    async def run():
+        async def load(key: str) -> str:
+            return key * 1000
+
+        cache = RefreshingCache("test", load, ttl=60, max_bytes=2500)
+        await cache.get("a")
+        await cache.get("b")
+        await cache.get("a")
+        await cache.get("c")
+        return cache, cache.stats()
+
+    cache, stats = asyncio.run(run())
+    assert set(cache._entries) == {("a",), ("c",)}
+    assert stats["evictions"] == 1
+    assert stats["bytes"] <= 2500
+
+
+def test_scheduler_refreshes_due_values_and_drops_idle_ones():
+    async def run():
+        loader = Loader()
+        cache = RefreshingCache("test", loader, ttl=0.05, max_stale=10)
+        scheduler = RefreshScheduler(interval=60, concurrency=2, jitter=0, idle_ttl=0.1)
+        scheduler.register(cache)
+
+        await cache.get("a")
+        await cache.get("b")
+        await asyncio.sleep(0.06)
+        await cache.get("a")  # Stale hit, starts its own reload
+        await asyncio.sleep(0)
+        await scheduler.refresh_due()
+        refreshed = await cache.get("b")
+
+        await asyncio.sleep(0.1)
+        cache._entries[("a",)].accessed_at = time.monotonic()
+        await scheduler.refresh_due()
+        return refreshed, set(cache._entries), cache.stats()["expirations"]
+
+    assert asyncio.run(run()) == ("b:4", {("a",)}, 1)
@@ -0,0 +1,45 @@
+import asyncio
+
+import aiohttp
+from aiohttp import web
+from starlette.responses import JSONResponse, Response
+
+from bug_master.response_url import respond
+
+
+async def _start_response_url() -> tuple:
+    received = []
+
+    async def response_url(request):
+        received.append(await request.json())
+        return web.Response(text="ok")
+
+    app = web.Application()
+    app.router.add_post("/response", response_url)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/response", received
+
+
+def test_respond_delivers_the_response_body():
+    async def run():
+        runner, url, received = await _start_response_url()
+        session = aiohttp.ClientSession()
+        try:
+            await respond(session, url, JSONResponse({"response_type": "ephemeral", "text": "Done"}))
+            await respond(session, url, JSONResponse({"text": "Next step"}), replace_original=True)
+            await respond(session, url, Response(status_code=200))  # Empty, nothing to deliver
+            await respond(session, "", JSONResponse({"text": "No url"}))
+            return received, session.closed
+        finally:
+            await session.close()
+            await runner.cleanup()
+
+    received, closed = asyncio.run(run())
+    assert received == [
+        {"response_type": "ephemeral", "text": "Done"},
+        {"text": "Next step", "replace_original": True},
+    ]
+    assert not closed  # The shared session is kept open for the next responses
@@ -0,0 +1,95 @@
+import asyncio
+from collections import Counter
+
+from aiohttp import web
+
+from bug_master.sharding import FORWARDED_HEADER, HashRing, ShardRouter
+
+CHANNELS = [f"C{i:04d}" for i in range(2000)]
+
+
+def test_ring_spreads_keys_evenly():
+    ring = HashRing({"http://a", "http://b", "http://c"})
+    counts = Counter(ring.owner(channel) for channel in CHANNELS)
+    assert set(counts) == {"http://a", "http://b", "http://c"}
+    assert min(counts.values()) > len(CHANNELS) / 3 * 0.7
+
+
+def test_ring_is_stable():
+    first, second = HashRing({"http://a", "http://b", "http://c"}), HashRing({"http://c", "http://b", "http://a"})
+    assert [first.owner(c) for c in CHANNELS] == [second.owner(c) for c in CHANNELS]
+
+
+def test_only_the_keys_of_a_leaving_member_move():
+    before = HashRing({"http://a", "http://b", "http://c"})
+    after = HashRing({"http://a", "http://b"})
+    for channel in CHANNELS:
+        if before.owner(channel) != "http://c":
+            assert after.owner(channel) == before.owner(channel)
+
+
+def test_empty_ring():
+    assert HashRing(set()).owner("C1") is None
+
+
+def test_router_without_replicas_owns_all_channels():
+    router = ShardRouter("http://self", [], "secret")
+    assert not router.is_sharded
+    assert all(router.is_owner(channel) for channel in CHANNELS[:10])
+
+
+async def _start_replica(forward_delay: float = 0) -> tuple:
+    received = []
+
+    async def live(_request):
+        return web.json_response({"msg": "Alive"})
+
+    async def events(request):
+        received.append((request.headers.get(FORWARDED_HEADER), await request.read()))
+        await asyncio.sleep(forward_delay)
+        return web.json_response({"msg": "Success"})
+
+    app = web.Application()
+    app.router.add_get("/live", live)
+    app.router.add_post("/slack/events", events)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}", received
+
+
+def test_forward_to_the_live_owner():
+    async def run():
+        runner, url, received = await _start_replica()
+        router = ShardRouter("http://127.0.0.1:1", [url, "http://127.0.0.1:2"], "secret")
+        try:
+            await router.start()  # The replica on port 2 isn't reachable
+            channel = next(c for c in CHANNELS if not router.is_owner(c))
+            response = await router.forward(channel, "/slack/events", b"{}", "application/json")
+            return router.owner(channel), url, response.status_code, received
+        finally:
+            await router.stop()
+            await runner.cleanup()
+
+    owner, url, status, received = asyncio.run(run())
+    assert owner == url
+    assert status == 200
+    assert received == [("http://127.0.0.1:1", b"{}")]
+
+
+def test_slow_owner_falls_back_to_local_handling():
+    async def run():
+        runner, url, _received = await _start_replica(forward_delay=0.5)
+        router = ShardRouter("http://127.0.0.1:1", [url], "secret", forward_timeout=0.1)
+        try:
+            await router.start()
+            channel = next(c for c in CHANNELS if not router.is_owner(c))
+            return await router.forward(channel, "/slack/events", b"{}", "application/json"), router.stats()
+        finally:
+            await router.stop()
+            await runner.cleanup()
+
+    response, stats = asyncio.run(run())
+    assert response is None
+    assert stats["forward_failures"] == 1
@@ -0,0 +1,120 @@
+import asyncio
+import time
+
+from slack_sdk.errors import SlackApiError
+from slack_sdk.web.slack_response import SlackResponse
+
+from bug_master.slack_scheduler import Priority, SlackScheduler, TokenBucket, slack_priority
+
+
+def test_token_bucket_serves_burst_then_rate():
+    async def run():
+        bucket = TokenBucket(rate_per_minute=600, burst=2)  # A token every 0.1 seconds
+        start = time.monotonic()
+        for _ in range(4):
+            await bucket.acquire(Priority.LIVE)
+        return time.monotonic() - start
+
+    assert 0.15 <= asyncio.run(run()) < 0.5
+
+
+def test_token_bucket_serves_by_priority():
+    async def run():
+        bucket = TokenBucket(rate_per_minute=600, burst=1)
+        await bucket.acquire(Priority.LIVE)  # Empty the bucket so the next waiters queue
+
+        order = []
+
+        async def acquire(name: str, priority: Priority):
+            await bucket.acquire(priority)
+            order.append(name)
+
+        await asyncio.gather(
+            acquire("bulk", Priority.BULK),
+            acquire("interactive", Priority.INTERACTIVE),
+            acquire("live-1", Priority.LIVE),
+            acquire("live-2", Priority.LIVE),
+        )
+        return order
+
+    assert asyncio.run(run()) == ["live-1", "live-2", "interactive", "bulk"]
+
+
+def test_token_bucket_pause():
+    async def run():
+        bucket = TokenBucket(rate_per_minute=6000, burst=10)
+        bucket.pause(0.2)
+        start = time.monotonic()
+        await bucket.acquire(Priority.LIVE)
+        return time.monotonic() - start
+
+    assert asyncio.run(run()) >= 0.19
+
+
+def test_token_bucket_skips_cancelled_waiters():
+    async def run():
+        bucket = TokenBucket(rate_per_minute=600, burst=1)
+        await bucket.acquire(Priority.LIVE)
+        cancelled = asyncio.ensure_future(bucket.acquire(Priority.LIVE))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.wait_for(bucket.acquire(Priority.BULK), timeout=1)
+
+    asyncio.run(run())
+
+
+def test_buckets_are_per_method_and_per_channel_for_special_tier():
+    scheduler = SlackScheduler()
+    assert scheduler._get_bucket("reactions.add", "C1") is scheduler._get_bucket("reactions.add", "C2")
+    assert scheduler._get_bucket("reactions.add") is not scheduler._get_bucket("conversations.info")
+    assert scheduler._get_bucket("chat.postMessage", "C1") is not scheduler._get_bucket("chat.postMessage", "C2")
+    assert scheduler._get_bucket("chat.postMessage", "C1") is scheduler._get_bucket("chat.postMessage", "C1")
+
+
+def test_call_keeps_order_of_calls_with_the_same_ordering_key():
+    async def run():
+        scheduler = SlackScheduler()
+        calls = []
+
+        async def post(text: str, delay: float):
+            await asyncio.sleep(delay)
+            calls.append(text)
+
+        await asyncio.gather(
+            scheduler.call("chat.update", post, ordering_key="thread", text="first", delay=0.05),
+            scheduler.call("chat.update", post, ordering_key="thread", text="second", delay=0),
+        )
+        return calls
+
+    assert asyncio.run(run()) == ["first", "second"]
+
+
+def test_call_retries_rate_limited_calls():
+    async def run():
+        scheduler = SlackScheduler()
+        attempts = []
+
+        async def react(**_kwargs):
+            attempts.append(time.monotonic())
+            if len(attempts) == 1:
+                response = SlackResponse(
+                    client=None,
+                    http_verb="POST",
+                    api_url="",
+                    req_args={},
+                    data={"ok": False, "error": "ratelimited"},
+                    headers={"Retry-After": "0.1"},
+                    status_code=429,
+                )
+                raise SlackApiError("ratelimited", response)
+            return "ok"
+
+        with slack_priority(Priority.BULK):
+            result = await scheduler.call("reactions.add", react, channel="C1")
+        return result, attempts, scheduler.stats()
+
+    result, attempts, stats = asyncio.run(run())
+    assert result == "ok"
+    assert attempts[1] - attempts[0] >= 0.09  # Retry-After
+    assert stats["rate_limited"] == {"reactions.add": 1}
+    assert stats["queued"]["bulk"] == 0
@@ -0,0 +1,47 @@
+import asyncio
+
+from aiohttp import web
+
+from bug_master.bug_master_bot import BugMasterBot
+
+
+async def start_fake_slack(connections: list) -> web.AppRunner:
+    async def conversations_info(request: web.Request) -> web.Response:
+        connections.append(request.transport.get_extra_info("peername"))
+        return web.json_response({"ok": True, "channel": {"id": "C1", "name": "chan"}})
+
+    app = web.Application()
+    app.router.add_route("*", "/api/conversations.info", conversations_info)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    return runner
+
+
+def test_slack_calls_reuse_the_shared_session():
+    async def run():
+        connections = []
+        runner = await start_fake_slack(connections)
+        port = runner.addresses[0][1]
+        bot = BugMasterBot("xoxb-test", "xapp-test", "test-signing-secret")
+        bot._web_client.base_url = f"http://127.0.0.1:{port}/api/"
+        try:
+            await bot.open_session()
+            session = bot._session
+            await bot.open_session()  # Already open, kept as is
+            for _ in range(3):
+                await bot._web_client.conversations_info(channel="C1")
+            reused = bot._session is session and bot._web_client.session is session
+
+            await bot.close_session()
+            return connections, reused, session.closed, bot._session, bot._web_client.session
+        finally:
+            await bot._sm_client.close()
+            await runner.cleanup()
+
+    connections, reused, closed, session, web_client_session = asyncio.run(run())
+    assert len(connections) == 3
+    assert len(set(connections)) == 1  # A single keep-alive connection
+    assert reused
+    assert closed
+    assert session is None and web_client_session is None
@@ -0,0 +1,58 @@
+import asyncio
+
+from slack_sdk.socket_mode.request import SocketModeRequest
+from starlette.responses import JSONResponse, Response
+
+from bug_master.socket_mode import SocketModeIngestion
+
+
+class FakeClient:
+    def __init__(self, calls: list) -> None:
+        self._calls = calls
+
+    async def send_socket_mode_response(self, response):
+        self._calls.append(("ack", response.envelope_id, response.payload))
+
+
+def create_ingestion(calls: list) -> SocketModeIngestion:
+    async def on_event(payload: dict, is_retry: bool) -> Response:
+        calls.append(("event", payload["event_id"], is_retry))
+        return Response()
+
+    async def on_options(payload: dict) -> Response:
+        calls.append(("options", payload["value"]))
+        return JSONResponse({"options": [{"text": {"type": "plain_text", "text": "job"}, "value": "job"}]})
+
+    async def unexpected(payload: dict) -> Response:
+        raise AssertionError("Unexpected handler call")
+
+    return SocketModeIngestion("xapp-fake", 1, on_event, unexpected, unexpected, on_options, session=None)
+
+
+def test_is_options_request():
+    options = SocketModeRequest("interactive", "e1", {"type": "block_suggestion", "value": "jo"})
+    action = SocketModeRequest("interactive", "e2", {"type": "block_actions", "actions": [{"value": "jo"}]})
+    event = SocketModeRequest("events_api", "e3", {"value": "jo"})
+
+    assert SocketModeIngestion._is_options_request(options)
+    assert not SocketModeIngestion._is_options_request(action)
+    assert not SocketModeIngestion._is_options_request(event)
+
+
+def test_events_are_acknowledged_before_being_handled():
+    calls = []
+    request = SocketModeRequest("events_api", "e1", {"event_id": "Ev1"}, retry_attempt=1)
+    asyncio.run(create_ingestion(calls)._handle_request(FakeClient(calls), request))
+
+    assert calls == [("ack", "e1", None), ("event", "Ev1", True)]
+
+
+def test_options_are_sent_with_the_acknowledgement():
+    calls = []
+    request = SocketModeRequest("interactive", "e1", {"type": "block_suggestion", "value": "jo"})
+    asyncio.run(create_ingestion(calls)._handle_request(FakeClient(calls), request))
+
+    assert calls[0] == ("options", "jo")
+    assert calls[1][:2] == ("ack", "e1")
+    assert calls[1][2]["options"][0]["value"] == "job"
+    assert len(calls) == 2
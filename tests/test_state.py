@@ -0,0 +1,138 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from bug_master.bug_master_bot import BugMasterBot
+from bug_master.leader_election import LeaderElection
+from bug_master.state import MemoryStateBackend, SqliteStateBackend, get_state_backend
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "sqlite":
+        return SqliteStateBackend(str(tmp_path / "state.db"))
+    return MemoryStateBackend()
+
+
+def test_get_set_delete(backend):
+    async def run():
+        assert await backend.get("ns", "key") is None
+        await backend.set("ns", "key", {"value": [1, 2]})
+        assert await backend.get("ns", "key") == {"value": [1, 2]}
+        assert await backend.get("other", "key") is None
+
+        await backend.delete("ns", "key")
+        assert await backend.get("ns", "key") is None
+
+    asyncio.run(run())
+
+
+def test_values_expire(backend):
+    async def run():
+        await backend.set("ns", "key", True, ttl=0.05)
+        await asyncio.sleep(0.06)
+        return await backend.get("ns", "key")
+
+    assert asyncio.run(run()) is None
+
+
+def test_add_if_absent(backend):
+    async def run():
+        return [await backend.add_if_absent("notices", "C1", True, ttl=60) for _ in range(2)]
+
+    assert asyncio.run(run()) == [True, False]
+
+
+def test_leases(backend):
+    async def run():
+        assert await backend.get_lease_owner("leader") is None
+        assert await backend.acquire_lease("leader", "a", ttl=60)
+        assert not await backend.acquire_lease("leader", "b", ttl=60)
+        assert await backend.acquire_lease("leader", "a", ttl=60)  # Renewed
+        assert await backend.get_lease_owner("leader") == "a"
+
+        await backend.release_lease("leader", "b")
+        assert await backend.get_lease_owner("leader") == "a"
+        await backend.release_lease("leader", "a")
+        assert await backend.acquire_lease("leader", "b", ttl=0.05)
+        await asyncio.sleep(0.06)
+        assert await backend.get_lease_owner("leader") is None
+        assert await backend.acquire_lease("leader", "a", ttl=60)
+
+    asyncio.run(run())
+
+
+def test_sqlite_backend_is_shared_between_connections(tmp_path):
+    async def run():
+        path = str(tmp_path / "state.db")
+        first, second = SqliteStateBackend(path), SqliteStateBackend(path)
+        await first.set("ns", "key", "value")
+        assert await second.get("ns", "key") == "value"
+        assert await first.acquire_lease("leader", "a", ttl=60)
+        assert not await second.acquire_lease("leader", "b", ttl=60)
+
+    asyncio.run(run())
+
+
+def test_sqlite_backend_doesnt_block_the_event_loop_while_locked(tmp_path):
+    path = str(tmp_path / "state.db")
+    locker = sqlite3.connect(path, isolation_level=None)
+
+    async def run():
+        backend = SqliteStateBackend(path)
+        locker.execute("BEGIN IMMEDIATE")  # Another process holds the write lock
+        write = asyncio.get_event_loop().create_task(backend.set("ns", "key", "value"))
+        ticks = 0
+        while ticks < 10:
+            await asyncio.sleep(0.01)
+            ticks += 1
+        done_while_locked = write.done()
+        locker.execute("COMMIT")
+        await write
+        return ticks, done_while_locked, await backend.get("ns", "key")
+
+    assert asyncio.run(run()) == (10, False, "value")
+
+
+def test_single_leader_runs_the_jobs():
+    async def run():
+        backend = MemoryStateBackend()
+        runs = []
+        elections = [LeaderElection(backend, lease_ttl=0.3) for _ in range(2)]
+        for election in elections:
+
+            async def job(owner: str = election.owner):
+                runs.append(owner)
+
+            election.add_job(job)
+            election.start()
+
+        await asyncio.sleep(0.05)
+        leaders = [e.owner for e in elections if e.is_leader]
+        await elections[0].stop()
+        await elections[1].stop()
+        return leaders, runs
+
+    leaders, runs = asyncio.run(run())
+    assert len(leaders) == 1
+    assert runs == leaders
+
+
+def test_warmed_up_flag_of_a_previous_leader_is_ignored():
+    async def run():
+        bot = BugMasterBot("xoxb-test", "xapp-test", "test-signing-secret")
+        state = get_state_backend()
+        try:
+            await state.set("bot", "warmed_up", "previous-deployment-leader")
+            await state.acquire_lease(LeaderElection.LEASE_NAME, "current-leader", ttl=60)
+            stale = await bot.is_ready()
+
+            await state.set("bot", "warmed_up", "current-leader")
+            return stale, await bot.is_ready()
+        finally:
+            await state.delete("bot", "warmed_up")
+            await state.release_lease(LeaderElection.LEASE_NAME, "current-leader")
+            await bot._sm_client.close()
+
+    assert asyncio.run(run()) == (False, True)
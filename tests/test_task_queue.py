@@ -0,0 +1,186 @@
+import asyncio
+import time
+
+import pytest
+
+from bug_master.task_queue import MemoryTaskStore, SqliteTaskStore, TaskQueue
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SqliteTaskStore(max_attempts=3, path=str(tmp_path / "tasks.db"))
+    return MemoryTaskStore(max_attempts=3)
+
+
+def test_lease_counts_attempts(store):
+    task_id = store.add("event", {"id": 1})
+    task = store.lease("event", "worker-1", visibility_timeout=60)
+    assert (task.id, task.payload, task.attempts) == (task_id, {"id": 1}, 1)
+    assert store.lease("event", "worker-2", visibility_timeout=60) is None
+    assert store.lease("command", "worker-1", visibility_timeout=60) is None
+    assert store.count("event") == 1
+
+    store.complete(task_id, "worker-1")
+    assert store.count("event") == 0
+
+
+def test_expired_lease_is_leased_again(store):
+    store.add("event", {})
+    store.lease("event", "worker-1", visibility_timeout=0.05)
+    time.sleep(0.06)
+
+    task = store.lease("event", "worker-2", visibility_timeout=60)
+    assert task.attempts == 2
+    store.complete(task.id, "worker-1")  # The first worker doesn't own the task anymore
+    assert store.count("event") == 1
+
+
+def test_extended_lease_is_kept(store):
+    store.add("event", {})
+    task = store.lease("event", "worker-1", visibility_timeout=0.05)
+    store.extend(task.id, "worker-1", visibility_timeout=60)
+    time.sleep(0.06)
+    assert store.lease("event", "worker-2", visibility_timeout=60) is None
+
+
+def test_retry_and_release(store):
+    store.add("event", {})
+    task = store.lease("event", "worker-1", visibility_timeout=60)
+    store.retry(task.id, "worker-1", available_at=time.time() + 60, error="ValueError: x")
+    assert store.lease("event", "worker-1", visibility_timeout=60) is None
+
+    store.retry(task.id, "worker-1", available_at=0, error="")  # Not leased anymore, ignored
+    store.add("command", {})
+    task = store.lease("command", "worker-1", visibility_timeout=60)
+    store.release(task.id, "worker-1")
+    assert store.lease("command", "worker-1", visibility_timeout=60).attempts == 1
+
+
+def test_failed_tasks_are_pruned(tmp_path):
+    store = SqliteTaskStore(max_attempts=1, path=str(tmp_path / "tasks.db"))
+    store.add("event", {})
+    task = store.lease("event", "worker-1", visibility_timeout=60)
+    store.fail(task.id, "worker-1", "ValueError: x")
+    assert store.count("event") == 0
+
+    assert store.prune(before=time.time() - 60) == 0
+    assert store.prune(before=time.time() + 1) == 1
+
+
+@pytest.mark.parametrize("durable", [False, True])
+def test_failed_task_is_retried_until_its_last_attempt(tmp_path, durable):
+    async def run():
+        queue = TaskQueue(
+            str(tmp_path / "tasks.db") if durable else None,
+            max_attempts=3,
+            retry_backoff=0.01,
+            poll_interval=0.01,
+        )
+        attempts = []
+
+        async def handler(task):
+            attempts.append(task.attempts)
+            if task.payload["fail"]:
+                raise ValueError("Failed")
+
+        queue.register("event", handler, workers=2, max_size=10)
+        queue.start()
+        assert await queue.submit("event", {"fail": True})
+        assert await queue.submit("event", {"fail": False})
+        await asyncio.sleep(0.3)
+        await queue.stop()
+        return attempts, queue.stats()["event"]
+
+    attempts, stats = asyncio.run(run())
+    assert sorted(attempts) == [1, 1, 2, 3]
+    assert (stats["depth"], stats["handled"], stats["retried"], stats["failed"]) == (0, 1, 2, 1)
+
+
+def test_full_queue_rejects_tasks():
+    async def run():
+        queue = TaskQueue(max_attempts=1)
+        queue.register("event", lambda task: asyncio.sleep(0), workers=1, max_size=1)
+        return [await queue.submit("event", {}) for _ in range(2)], queue.stats()["event"]["rejected"]
+
+    assert asyncio.run(run()) == ([True, False], 1)
+
+
+def test_stats_depth_is_kept_without_querying_the_store(tmp_path):
+    path = str(tmp_path / "tasks.db")
+
+    async def run():
+        producer = TaskQueue(path, stats_interval=0.05)
+        consumer = TaskQueue(path, stats_interval=0.05)
+        for queue in (producer, consumer):
+            queue.register("event", lambda task: asyncio.sleep(10), workers=1, max_size=10)
+
+        consumer.start()
+        await producer.submit("event", {})
+        await producer.submit("event", {})
+
+        def count(kind: str):
+            raise AssertionError("The store is queried by stats")
+
+        producer._store.count = count
+        depths = [producer.stats()["event"]["depth"], consumer.stats()["event"]["depth"]]
+        await asyncio.sleep(0.1)  # The consumer picks up the tasks submitted by the other process
+        depths.append(consumer.stats()["event"]["depth"])
+        await consumer.stop()
+        return depths
+
+    assert asyncio.run(run()) == [2, 0, 2]
+
+
+def test_stats_report_the_wait_time_and_the_workers_utilization():
+    async def run():
+        queue = TaskQueue(max_attempts=1, poll_interval=0.01)
+        queue.register("event", lambda task: asyncio.sleep(0.1), workers=1, max_size=10)
+        queue.start()
+        await queue.submit("event", {})
+        await queue.submit("event", {})
+        await asyncio.sleep(0.05)
+        busy = queue.stats()["event"]
+        await asyncio.sleep(0.2)
+        idle = queue.stats()["event"]
+        await queue.stop()
+        return busy, idle
+
+    busy, idle = asyncio.run(run())
+    assert (busy["busy_workers"], busy["depth"], busy["handled"]) == (1, 2, 0)
+    assert (idle["busy_workers"], idle["depth"], idle["handled"]) == (0, 0, 2)
+    # The second task waited for the single worker to handle the first one
+    assert idle["wait_time"]["count"] == 2
+    assert idle["wait_time"]["max"] >= 0.08
+    assert 0.6 < idle["utilization"] <= 1
+
+
+def test_durable_tasks_are_resumed_after_restart(tmp_path):
+    path = str(tmp_path / "tasks.db")
+
+    async def run():
+        started = asyncio.Event()
+        handled = []
+
+        async def hanging_handler(task):
+            started.set()
+            await asyncio.sleep(3600)
+
+        queue = TaskQueue(path, poll_interval=0.01)
+        queue.register("command", hanging_handler, workers=1, max_size=10)
+        queue.start()
+        await queue.submit("command", {"text": "apply"})
+        await started.wait()
+        await queue.stop()  # The leased task is released
+
+        async def handler(task):
+            handled.append((task.payload, task.attempts))
+
+        queue = TaskQueue(path, poll_interval=0.01)
+        queue.register("command", handler, workers=1, max_size=10)
+        queue.start()
+        await asyncio.sleep(0.1)
+        await queue.stop()
+        return handled
+
+    assert asyncio.run(run()) == [({"text": "apply"}, 1)]
@@ -0,0 +1,106 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from bug_master.tracing import Tracer
+
+
+def test_spans_of_created_tasks_belong_to_the_trace():
+    async def run():
+        tracer = Tracer(slow_threshold=60)
+
+        async def fetch(name: str):
+            with tracer.span("fetch", file=name):
+                await asyncio.sleep(0)
+
+        with tracer.trace("event", channel="C1") as root:
+            with tracer.span("load"):
+                await asyncio.gather(fetch("a"), fetch("b"))
+            with tracer.span("report") as report:
+                report.set_attribute("actions", 2)
+        return root
+
+    root = asyncio.run(run())
+    spans = list(root.walk())
+    assert [span.name for span in spans] == ["event", "load", "fetch", "fetch", "report"]
+    assert {span.trace_id for span in spans} == {root.trace_id}
+    assert spans[2].parent_id == spans[1].span_id
+    assert spans[4].attributes == {"actions": 2}
+    assert all(span.duration is not None for span in spans)
+
+
+def test_span_outside_of_a_trace_is_not_recorded():
+    with Tracer(slow_threshold=60).span("orphan") as span:
+        assert span is None
+
+
+def test_nested_trace_is_a_span():
+    tracer = Tracer(slow_threshold=60)
+    with tracer.trace("command") as root:
+        with tracer.trace("event") as nested:
+            pass
+    assert nested.trace_id == root.trace_id
+    assert root.children == [nested]
+
+
+def test_errors_are_recorded_and_traces_exported(tmp_path):
+    export_path = tmp_path / "traces" / "traces.jsonl"
+    tracer = Tracer(slow_threshold=0, export_path=str(export_path))
+    with pytest.raises(ValueError):
+        with tracer.trace("event"):
+            with tracer.span("rules"):
+                raise ValueError("Invalid rule")
+
+    assert not export_path.exists()  # Buffered until flushed
+    asyncio.run(tracer.flush())
+
+    data = json.loads(export_path.read_text().splitlines()[0])
+    spans = data["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert [span["name"] for span in spans] == ["event", "rules"]
+    assert spans[1]["parentSpanId"] == spans[0]["spanId"]
+    assert spans[1]["status"] == {"code": 2, "message": "ValueError: Invalid rule"}
+
+
+def test_traces_are_exported_in_the_background(tmp_path, monkeypatch):
+    export_path = tmp_path / "traces.jsonl"
+    tracer = Tracer(slow_threshold=60, export_path=str(export_path), export_interval=0.05, max_buffered=2)
+    main_thread = threading.get_ident()
+    writers = set()
+    export = tracer._export
+
+    def record_writer(roots: list):
+        writers.add(threading.get_ident())
+        export(roots)
+
+    monkeypatch.setattr(tracer, "_export", record_writer)
+
+    async def run():
+        tracer.start()
+        for name in ("first", "second", "dropped"):
+            with tracer.trace(name):
+                pass
+        await asyncio.sleep(0.1)
+        exported = export_path.read_text().splitlines()
+        with tracer.trace("last"):
+            pass
+        await tracer.stop()
+        return exported
+
+    exported = asyncio.run(run())
+    names = [json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"][0]["name"] for line in exported]
+    assert names == ["first", "second"]
+    assert len(export_path.read_text().splitlines()) == 3  # The last trace is flushed on stop
+    assert writers and main_thread not in writers
+
+
+def test_format_tree():
+    tracer = Tracer(slow_threshold=60)
+    with tracer.trace("event") as root:
+        with tracer.span("load", bytes=10):
+            pass
+
+    lines = root.format_tree().splitlines()
+    assert lines[0].startswith("event ")
+    assert lines[1].startswith("  load ") and lines[1].endswith("bytes=10")
@@ -0,0 +1,99 @@
+import asyncio
+from types import SimpleNamespace
+
+from bug_master import bug_master_bot, routes
+from bug_master.bug_master_bot import BugMasterBot
+
+
+class FakeSnapshot:
+    def __init__(self) -> None:
+        self.jobs = set()
+
+    def get_histories(self, jobs: set, since: float):
+        self.jobs |= jobs
+        return {}, []
+
+
+def make_bot(monkeypatch, channels: list, failing: set = ()) -> BugMasterBot:
+    bot = BugMasterBot("xoxb-test", "xapp-test", "test-signing-secret")
+    bot.loads = []
+    bot.snapshot = snapshot = FakeSnapshot()
+    bot.concurrency = {"current": 0, "max": 0}
+    monkeypatch.setattr(bug_master_bot.consts, "ENABLE_WARM_UP", True)
+    monkeypatch.setattr(bug_master_bot.consts, "WARM_UP_CONCURRENCY", 2)
+
+    async def get_member_channels():
+        if isinstance(channels, Exception):
+            raise channels
+        return channels
+
+    async def load(channel: str, *args, **kwargs):
+        bot.concurrency["current"] += 1
+        bot.concurrency["max"] = max(bot.concurrency["max"], bot.concurrency["current"])
+        try:
+            await asyncio.sleep(0.01)
+            if channel in failing:
+                raise RuntimeError(f"Failed to load {channel}")
+            bot.loads.append(channel)
+            bot._config[channel] = SimpleNamespace(prow_configurations=[f"{channel}-job"])
+        finally:
+            bot.concurrency["current"] -= 1
+
+    async def get_jobs(prow_configurations: list):
+        return prow_configurations
+
+    async def get_snapshot():
+        return snapshot
+
+    bot.get_member_channels = get_member_channels
+    bot._load_channel_configuration = load
+    monkeypatch.setattr(bug_master_bot.Utils, "get_jobs", get_jobs)
+    monkeypatch.setattr(bug_master_bot, "get_prow_jobs_index", lambda: SimpleNamespace(get_snapshot=get_snapshot))
+    return bot
+
+
+def test_member_channels_are_warmed_up_before_the_bot_is_ready(monkeypatch):
+    async def run():
+        bot = make_bot(monkeypatch, ["C1", "C2", "C3", "C4", "C5"])
+        monkeypatch.setattr(routes, "bot", bot)
+        try:
+            warm_up = asyncio.create_task(bot.warm_up())
+            await asyncio.sleep(0)
+            warming = (await bot.is_ready(), (await routes.ready()).status_code)
+            await warm_up
+            return bot, warming, (await bot.is_ready(), (await routes.ready()).status_code)
+        finally:
+            await bot._sm_client.close()
+
+    bot, warming, ready = asyncio.run(run())
+    assert warming == (False, 503)
+    assert ready == (True, 200)
+    assert sorted(bot.loads) == ["C1", "C2", "C3", "C4", "C5"]
+    assert bot.concurrency["max"] == 2
+    assert bot.snapshot.jobs == {f"C{i}-job" for i in range(1, 6)}
+
+
+def test_bot_is_ready_even_if_the_warm_up_fails(monkeypatch):
+    async def run(channels: list, failing: set = ()):
+        bot = make_bot(monkeypatch, channels, failing)
+        try:
+            await bot.warm_up()
+            return bot.loads, await bot.is_ready()
+        finally:
+            await bot._sm_client.close()
+
+    assert asyncio.run(run(["C1", "C2", "C3"], failing={"C2"})) == (["C1", "C3"], True)
+    assert asyncio.run(run(RuntimeError("Slack is down"))) == ([], True)
+
+
+def test_warm_up_can_be_disabled(monkeypatch):
+    async def run():
+        bot = make_bot(monkeypatch, ["C1"])
+        monkeypatch.setattr(bug_master_bot.consts, "ENABLE_WARM_UP", False)
+        try:
+            await bot.warm_up()
+            return bot.loads, await bot.is_ready()
+        finally:
+            await bot._sm_client.close()
+
+    assert asyncio.run(run()) == ([], True)
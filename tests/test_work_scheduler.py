@@ -0,0 +1,115 @@
+import asyncio
+
+from bug_master.slack_scheduler import Priority, _priority
+from bug_master.work_scheduler import WorkScheduler
+
+
+async def _run_all(scheduler: WorkScheduler, work: list) -> list:
+    """Run the (channel, priority, name) units of work while the scheduler is busy, return their start order"""
+    started = []
+    gate = asyncio.Event()
+
+    async def unit(name: str):
+        started.append(name)
+        await asyncio.sleep(0.01)
+
+    async def blocker():
+        await gate.wait()
+
+    blocking = asyncio.ensure_future(scheduler.run("blocker", Priority.LIVE, blocker))
+    await asyncio.sleep(0)
+    tasks = [asyncio.ensure_future(scheduler.run(channel, priority, unit, name)) for channel, priority, name in work]
+    await asyncio.sleep(0)
+    gate.set()
+    await asyncio.gather(blocking, *tasks)
+    return started
+
+
+def test_waiting_work_is_served_by_priority():
+    scheduler = WorkScheduler(concurrency=1, channel_quota=1, bulk_concurrency=1, throttled_bulk_concurrency=1)
+    work = [("C1", Priority.BULK, "bulk"), ("C2", Priority.INTERACTIVE, "interactive"), ("C3", Priority.LIVE, "live")]
+    assert asyncio.run(_run_all(scheduler, work)) == ["live", "interactive", "bulk"]
+
+
+def test_channels_are_served_round_robin():
+    scheduler = WorkScheduler(concurrency=1, channel_quota=1, bulk_concurrency=1, throttled_bulk_concurrency=1)
+    work = [("C1", Priority.LIVE, "C1-1"), ("C1", Priority.LIVE, "C1-2"), ("C2", Priority.LIVE, "C2-1")]
+    assert asyncio.run(_run_all(scheduler, work)) == ["C1-1", "C2-1", "C1-2"]
+
+
+def test_channel_quota():
+    async def run():
+        scheduler = WorkScheduler(concurrency=10, channel_quota=2, bulk_concurrency=10, throttled_bulk_concurrency=1)
+        running = max_running = 0
+
+        async def unit():
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        await asyncio.gather(*[scheduler.run("C1", Priority.LIVE, unit) for _ in range(6)])
+        return max_running
+
+    assert asyncio.run(run()) == 2
+
+
+def test_bulk_is_throttled_while_live_work_waits():
+    async def run():
+        scheduler = WorkScheduler(concurrency=2, channel_quota=10, bulk_concurrency=2, throttled_bulk_concurrency=1)
+        gate = asyncio.Event()
+
+        async def blocker():
+            await gate.wait()
+
+        live = [asyncio.ensure_future(scheduler.run("C1", Priority.LIVE, blocker)) for _ in range(3)]
+        await asyncio.sleep(0)
+        bulk = asyncio.ensure_future(scheduler.run("C2", Priority.BULK, blocker))
+        await asyncio.sleep(0)
+        limit = scheduler._priority_limit(Priority.BULK)
+        gate.set()
+        await asyncio.gather(*live, bulk)
+        return limit, scheduler.stats()
+
+    limit, stats = asyncio.run(run())
+    assert limit == 1
+    assert stats["queued"] == {"live": 0, "interactive": 0, "bulk": 0}
+    assert stats["running"] == {"live": 0, "interactive": 0, "bulk": 0}
+
+
+def test_cancelled_waiter_frees_its_place():
+    async def run():
+        scheduler = WorkScheduler(concurrency=1, channel_quota=1, bulk_concurrency=1, throttled_bulk_concurrency=1)
+        gate = asyncio.Event()
+
+        async def blocker():
+            await gate.wait()
+
+        async def unit():
+            return "done"
+
+        blocking = asyncio.ensure_future(scheduler.run("C1", Priority.LIVE, blocker))
+        await asyncio.sleep(0)
+        cancelled = asyncio.ensure_future(scheduler.run("C1", Priority.LIVE, unit))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        gate.set()
+        await blocking
+        return await asyncio.wait_for(scheduler.run("C1", Priority.LIVE, unit), timeout=1), scheduler.stats()
+
+    result, stats = asyncio.run(run())
+    assert result == "done"
+    assert stats["queued"]["live"] == 0
+
+
+def test_work_runs_with_its_slack_priority():
+    async def run():
+        scheduler = WorkScheduler(concurrency=1, channel_quota=1, bulk_concurrency=1, throttled_bulk_concurrency=1)
+
+        async def unit():
+            return _priority.get()
+
+        return await scheduler.run("C1", Priority.BULK, unit)
+
+    assert asyncio.run(run()) == Priority.BULK